@@ -1,13 +1,44 @@
 import { ref } from 'vue';
 import axios from 'axios';
 import { v4 as uuidv4 } from 'uuid';
-import type { Message, ChatResponse, ApiRequest, Itinerary } from '../types';
+import type { Message, ChatResponse, ApiRequest, Itinerary, PatchOperation } from '../types';
 
-const API_BASE_URL = 'http://localhost:8000';
+export const API_BASE_URL = 'http://localhost:8000';
+
+// Apply a JSON Patch from the server (add / remove / replace only) to `doc` in place; returns the new root
+function applyPatch(doc: any, ops: PatchOperation[]): any {
+  for (const op of ops) {
+    const parts = op.path.split('/').slice(1).map(p => p.replace(/~1/g, '/').replace(/~0/g, '~'));
+    if (parts.length === 0) {
+      doc = op.value;
+      continue;
+    }
+    let parent = doc;
+    for (const part of parts.slice(0, -1)) {
+      parent = Array.isArray(parent) ? parent[Number(part)] : parent[part];
+    }
+    const last = parts[parts.length - 1];
+    if (Array.isArray(parent)) {
+      const index = Number(last);
+      if (op.op === 'remove') parent.splice(index, 1);
+      else if (op.op === 'add') parent.splice(index, 0, op.value);
+      else parent[index] = op.value;
+    } else if (op.op === 'remove') {
+      delete parent[last];
+    } else {
+      parent[last] = op.value;
+    }
+  }
+  return doc;
+}
 
 export function useChat() {
   const messages = ref<Message[]>([]);
   const currentItinerary = ref<Itinerary | null>(null);
+  // Last itinerary confirmed by the server and its version; patches apply to this copy,
+  // since streamed progress events and local edits change currentItinerary
+  let confirmedItinerary: Itinerary | null = null;
+  let itineraryVersion: number | undefined;
   const sessionId = ref<string | null>(null);
   const isLoading = ref(false);
   const error = ref<string | null>(null);
@@ -17,6 +48,8 @@ export function useChat() {
     let message = "Choose your trip type:";
     const {session_id, reply, options} = await axios.post<ChatResponse>(`${API_BASE_URL}/chat`, {message: message}).then(r=>r.data);
     sessionId.value = session_id;
+    confirmedItinerary = null;
+    itineraryVersion = undefined;
     console.log(message, reply, options);
     addMessage(message , 'bot', options);
   }
@@ -44,6 +77,46 @@ export function useChat() {
     return message;
   };
 
+  // Apply a progress event from /chat/stream so the map fills in before the turn finishes
+  const applyEvent = (event: string, data: any) => {
+    if (event === 'stops') {
+      currentItinerary.value = { legs: [], ordered_places: data.ordered_places };
+    } else if (event === 'legs' && currentItinerary.value) {
+      currentItinerary.value = { ...currentItinerary.value, legs: data.legs, summary: data.summary };
+    }
+  };
+
+  // POST /chat/stream and read server-sent events until the final "reply"
+  const streamChat = async (request: ApiRequest): Promise<ChatResponse> => {
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request)
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Chat stream failed: ${response.status}`);
+    }
+
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += value;
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = block.match(/^event: (.*)$/m)?.[1] ?? 'message';
+        const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] ?? '{}');
+        if (event === 'reply') return data as ChatResponse;
+        if (event === 'error') throw new Error(data.detail);
+        applyEvent(event, data);
+      }
+    }
+    throw new Error('Chat stream ended without a reply');
+  };
+
   const sendMessage = async (content: string): Promise<void> => {
     if (!content.trim() || !sessionId.value) return;
 
@@ -56,14 +129,18 @@ export function useChat() {
     // Set loading state
     isLoading.value = true;
 
+    // Progress events of a regenerate redraw the map before the turn is confirmed;
+    // if the turn fails or confirms no itinerary, this is put back
+    const previousItinerary = currentItinerary.value;
+
     try {
       const request: ApiRequest = {
         session_id: sessionId.value,
-        message: content
+        message: content,
+        known_version: itineraryVersion
       };
 
-      const response = await axios.post<ChatResponse>(`${API_BASE_URL}/chat`, request);
-      const data = response.data;
+      const data = await streamChat(request);
       console.log(data);
 
       // Add bot response
@@ -71,12 +148,30 @@ export function useChat() {
         addMessage(data.reply, 'bot', data.options);
       }
 
-      // Update itinerary if provided (but don't display in chat)
+      // A reset starts a new session with no itinerary
+      if (data.session_id !== sessionId.value) {
+        sessionId.value = data.session_id;
+        confirmedItinerary = null;
+        itineraryVersion = undefined;
+      }
+
+      // Update itinerary if provided (but don't display in chat): in full, as a
+      // patch against our version, or not at all when ours is current
       if (data.itinerary) {
-        currentItinerary.value = data.itinerary;
+        confirmedItinerary = data.itinerary;
+      } else if (data.itinerary_patch && confirmedItinerary) {
+        confirmedItinerary = applyPatch(confirmedItinerary, data.itinerary_patch);
+      }
+      if (data.itinerary_version !== undefined && confirmedItinerary) {
+        itineraryVersion = data.itinerary_version;
+        currentItinerary.value = structuredClone(confirmedItinerary);
+      } else {
+        currentItinerary.value = previousItinerary;
       }
 
     } catch (err) {
+      // An "error" event or a stream ending without its reply: drop the partial stops
+      currentItinerary.value = previousItinerary;
       console.error('Chat API error:', err);
       error.value = 'Failed to send message. Please check if the server is running.';
       addMessage('Sorry, I encountered an error. Please try again.', 'bot');
@@ -0,0 +1,48 @@
+import axios from 'axios';
+import { API_BASE_URL } from './useChat';
+import type { RouteGeometry } from '../types';
+
+// Decode a Google encoded polyline (5 decimal places) into [lat, lng] pairs
+export function decodePolyline(encoded: string): [number, number][] {
+  const points: [number, number][] = [];
+  let index = 0, lat = 0, lng = 0;
+  while (index < encoded.length) {
+    const deltas: number[] = [];
+    for (let k = 0; k < 2; k++) {
+      let shift = 0, result = 0, byte: number;
+      do {
+        byte = encoded.charCodeAt(index++) - 63;
+        result |= (byte & 0x1f) << shift;
+        shift += 5;
+      } while (byte >= 0x20);
+      deltas.push(result & 1 ? ~(result >> 1) : result >> 1);
+    }
+    lat += deltas[0];
+    lng += deltas[1];
+    points.push([lat / 1e5, lng / 1e5]);
+  }
+  return points;
+}
+
+export function useRouteGeometry() {
+  // Route ids are content hashes, so fetched geometry never goes stale
+  const cache = new Map<string, Promise<RouteGeometry>>();
+
+  // Leg paths of a route at the simplification level the server picks for this map zoom
+  const fetchRouteGeometry = (routeId: string, zoom: number): Promise<RouteGeometry> => {
+    const key = `${routeId}@${Math.round(zoom)}`;
+    let pending = cache.get(key);
+    if (!pending) {
+      pending = axios.get<RouteGeometry>(`${API_BASE_URL}/routes/${routeId}/geometry`, {
+        params: { zoom: Math.round(zoom) }
+      }).then(r => r.data);
+      pending.catch(() => cache.delete(key));
+      cache.set(key, pending);
+    }
+    return pending;
+  };
+
+  return {
+    fetchRouteGeometry
+  };
+}
@@ -32,10 +32,28 @@ export interface Place {
   rating?: number;
 }
 
+export interface RouteRef {
+  id: string;
+  levels_m: number[];
+}
+
+export interface RouteGeometry {
+  route_id: string;
+  level_m: number;
+  legs: string[];
+}
+
 export interface Itinerary {
   legs: Leg[];
   ordered_places: Place[];
   summary?: string;
+  route?: RouteRef;
+}
+
+export interface PatchOperation {
+  op: 'add' | 'remove' | 'replace';
+  path: string;
+  value?: any;
 }
 
 export interface ChatResponse {
@@ -43,11 +61,14 @@ export interface ChatResponse {
   reply?: string;
   options?: string[];
   itinerary?: Itinerary;
+  itinerary_version?: number;
+  itinerary_patch?: PatchOperation[];
 }
 
 export interface ApiRequest {
   session_id: string;
   message: string;
+  known_version?: number;
 }
 
 export type ViewMode = 'map' | 'list';
\ No newline at end of file
@@ -0,0 +1,243 @@
+# server/batch.py
+"""
+Precompute starter itineraries for many hotels at once.
+
+Reads hotels as JSONL, one object per line, with an "address" or "lat"/"lng"
+and optional preferences:
+
+    {"id": "h1", "address": "Hotel Ritz, Paris"}
+    {"id": "h2", "lat": 48.85, "lng": 2.35, "mode": "driving", "place_types": ["museum"],
+     "keywords": ["italian"], "radius_m": 3000, "max_distance_km": 2.5, "start_time": "10:00", "day": 6}
+
+Each hotel goes through the same pipeline as GET /itinerary (geocode, search,
+rank, route) in-process, so every cache is shared across the run. Geocodes are
+deduplicated up front, hotels run on a bounded pool of workers at "batch"
+upstream priority, and results are appended to the output JSONL as they finish.
+Re-running with the same output file resumes: hotels already written are
+skipped (failed ones too, unless --retry-errors; a retried hotel's newer line
+supersedes its earlier error line).
+
+    python batch.py hotels.jsonl itineraries.jsonl --concurrency 16
+
+Run from the server/ directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from services.geocode_cache import normalize_address
+from services.geocode_services import geocode_address_async
+from services.google_client import REQUEST_PRIORITY, aclose
+from services.itinerary_service import generate_itinerary_async
+from services.logs import configure_logging, get_logger
+from services.places_service import search_nearby_places_async
+from services.ranking import rank_places
+
+logger = get_logger("batch")
+
+TRAVEL_MODES = {"walking", "driving", "transit", "bicycling"}
+
+
+def hotel_id(hotel):
+    """Stable id used to resume: the explicit "id", else the address or coordinates."""
+    if hotel.get("id") is not None:
+        return str(hotel["id"])
+    if hotel.get("address"):
+        return normalize_address(hotel["address"])
+    return f"{hotel.get('lat')},{hotel.get('lng')}"
+
+
+def read_hotels(path):
+    hotels = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                hotel = json.loads(line)
+            except ValueError as e:
+                raise SystemExit(f"{path}:{lineno}: invalid JSON ({e})")
+            if not hotel.get("address") and (hotel.get("lat") is None or hotel.get("lng") is None):
+                raise SystemExit(f"{path}:{lineno}: needs an address or lat/lng")
+            hotels.append(hotel)
+    return hotels
+
+
+def completed_ids(path, retry_errors=False):
+    """
+    Ids already present in an existing output file. A torn last line left by a
+    crash is cut off so appended results start on a fresh line.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+    done = set()
+    for line in data.splitlines():
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if retry_errors and "error" in result:
+            continue
+        done.add(result["id"])
+    return done
+
+
+class Progress:
+    """Counts finished hotels and reports throughput in hotels per minute."""
+
+    def __init__(self, total, report_every_s):
+        self.total = total
+        self.report_every_s = report_every_s
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.done = 0
+        self.failed = 0
+
+    def record(self, ok):
+        self.done += 1
+        self.failed += not ok
+        now = time.perf_counter()
+        if now - self.last_report >= self.report_every_s:
+            self.last_report = now
+            print(self.line(), file=sys.stderr)
+
+    @property
+    def hotels_per_minute(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed * 60 if elapsed else 0.0
+
+    def line(self):
+        return (f"{self.done}/{self.total} hotels, {self.failed} failed, "
+                f"{self.hotels_per_minute:.1f} hotels/min, {time.perf_counter() - self.started:.1f}s")
+
+
+async def geocode_all(hotels, concurrency):
+    """Geocode each distinct address once. Returns normalized address -> geocode result (or None)."""
+    addresses = {}
+    for hotel in hotels:
+        if hotel.get("address"):
+            addresses.setdefault(normalize_address(hotel["address"]), hotel["address"])
+    slots = asyncio.Semaphore(concurrency)
+
+    async def geocode(address):
+        async with slots:
+            return await geocode_address_async(address)
+
+    results = await asyncio.gather(*(geocode(a) for a in addresses.values()))
+    return dict(zip(addresses, results))
+
+
+async def build_itinerary(hotel, geocodes, defaults):
+    """Search, rank and route for one hotel; returns the output record."""
+    if hotel.get("address"):
+        location = geocodes.get(normalize_address(hotel["address"]))
+        if not location:
+            return {"error": "Could not geocode address"}
+    else:
+        location = {"latitude": float(hotel["lat"]), "longitude": float(hotel["lng"])}
+    lat, lng = location["latitude"], location["longitude"]
+
+    mode = hotel.get("mode", defaults.mode)
+    if mode not in TRAVEL_MODES:
+        return {"hotel": location, "error": f"Unknown travel mode: {mode}"}
+    start_time = None
+    if hotel.get("start_time"):
+        try:
+            start_time = datetime.strptime(hotel["start_time"], "%H:%M").time()
+        except ValueError:
+            return {"hotel": location, "error": "Invalid start_time. Use HH:MM, e.g., 14:30."}
+
+    places = await search_nearby_places_async(
+        lat, lng,
+        place_types=hotel.get("place_types"),
+        keywords=hotel.get("keywords"),
+        radius=int(hotel.get("radius_m", defaults.radius)),
+        with_hours=start_time is not None,
+    )
+    places = rank_places(places, lat, lng, max_distance_km=hotel.get("max_distance_km"))
+    itinerary = await generate_itinerary_async(lat, lng, places, mode=mode,
+                                               start_time=start_time, start_day=hotel.get("day"))
+    record = {"hotel": location, "itinerary": itinerary}
+    if "error" in itinerary:
+        record["error"] = itinerary["error"]
+    return record
+
+
+async def run(hotels, out_path, args):
+    REQUEST_PRIORITY.set("batch")
+    progress = Progress(len(hotels), args.report_every)
+    geocodes = await geocode_all(hotels, args.concurrency)
+    queue = asyncio.Queue()
+    for hotel in hotels:
+        queue.put_nowait(hotel)
+
+    with open(out_path, "a") as out:
+        async def worker():
+            while True:
+                try:
+                    hotel = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    record = await build_itinerary(hotel, geocodes, args)
+                except Exception as e:
+                    logger.exception("batch hotel failed", extra={"hotel_id": hotel_id(hotel)})
+                    record = {"error": f"{type(e).__name__}: {e}"}
+                record = {"id": hotel_id(hotel), "input": hotel, **record,
+                          "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+                # One write per record keeps lines whole; flush so a crash loses at most in-flight hotels
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                progress.record("error" not in record)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        finally:
+            await aclose()
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="hotels JSONL")
+    parser.add_argument("output", help="results JSONL (appended to; existing results are skipped)")
+    parser.add_argument("--concurrency", type=int, default=8, help="hotels processed at once")
+    parser.add_argument("--mode", default="walking", help="default travel mode")
+    parser.add_argument("--radius", type=int, default=5000, help="default search radius in meters")
+    parser.add_argument("--retry-errors", action="store_true", help="redo hotels whose earlier result was an error")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args()
+    configure_logging()
+
+    hotels = read_hotels(args.input)
+    done = completed_ids(args.output, args.retry_errors)
+    seen = set(done)
+    pending = []
+    for hotel in hotels:
+        # Duplicate input lines are precomputed once
+        key = hotel_id(hotel)
+        if key not in seen:
+            seen.add(key)
+            pending.append(hotel)
+    print(f"{len(hotels)} hotels, {len(hotels) - len(pending)} already done or duplicate, "
+          f"{len(pending)} to go", file=sys.stderr)
+    if not pending:
+        return
+
+    progress = asyncio.run(run(pending, args.output, args))
+    print(f"Done: {progress.line()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+# server/bench/fake_google.py
+"""
+Local stand-in for the Google Maps Platform endpoints the services call:
+Geocoding, Places searchNearby (v1), legacy Places nearbysearch, Distance
+Matrix and Directions. Responses are synthetic but deterministic: POIs live on
+a fixed pseudo-random grid, so overlapping searches see the same places and
+route durations follow straight-line distance.
+
+Every API can be given a latency distribution and an error rate:
+
+    python -m bench.fake_google --port 8765 --latency lognormal:80:0.4 \\
+        --latency directions=lognormal:150:0.5 --error-rate places=0.01
+
+Latency specs: "0", "fixed:MS", "uniform:LO_MS:HI_MS", "lognormal:MEDIAN_MS:SIGMA".
+GET /_stats returns per-API call and error counts, POST /_reset zeroes them.
+Run from the server/ directory.
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+from collections import Counter
+from functools import lru_cache
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+APIS = ["geocoding", "places", "places_legacy", "distance_matrix", "directions"]
+
+EARTH_RADIUS_M = 6371000.0
+# Straight-line speeds (m/s) used to turn distances into durations
+SPEEDS = {"walking": 1.4, "bicycling": 4.5, "driving": 9.0, "transit": 6.0}
+# Routes are longer than straight lines
+DETOUR_FACTOR = 1.3
+
+# POI types handed out on the grid; cuisine subtypes ride along with restaurants
+POI_TYPES = [
+    "restaurant", "cafe", "bar", "tourist_attraction", "museum", "park", "art_gallery",
+    "historical_place", "cultural_landmark", "historical_landmark", "amusement_park",
+    "bowling_alley", "zoo", "aquarium", "church", "library", "night_club",
+]
+CUISINE_TYPES = [
+    "italian_restaurant", "chinese_restaurant", "japanese_restaurant", "mexican_restaurant",
+    "indian_restaurant", "thai_restaurant", "french_restaurant", "spanish_restaurant",
+    "korean_restaurant",
+]
+# Grid cell edge in degrees at the finest level; coarser levels keep a wide
+# search to at most GRID_MAX_CELLS cells per side
+GRID_CELL_DEG = 0.005
+GRID_MAX_CELLS = 16
+POIS_PER_CELL_TYPE = 2
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a function returning a delay in seconds."""
+    kind, *args = spec.split(":")
+    args = [float(a) for a in args]
+    if kind in ("0", "none"):
+        return lambda: 0.0
+    if kind == "fixed":
+        return lambda: args[0] / 1000
+    if kind == "uniform":
+        return lambda: random.uniform(args[0], args[1]) / 1000
+    if kind == "lognormal":
+        median, sigma = args
+        return lambda: random.lognormvariate(math.log(median), sigma) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+
+def _per_api(values, parse, default):
+    """Resolve "SPEC" / "api=SPEC" options into one setting per API."""
+    settings = {api: default for api in APIS}
+    for value in values or []:
+        api, _, spec = value.rpartition("=")
+        if api and api not in APIS:
+            raise ValueError(f"Unknown API {api!r}; expected one of {APIS}")
+        for name in ([api] if api else APIS):
+            settings[name] = parse(spec)
+    return settings
+
+
+def _rng(*parts):
+    seed = hashlib.blake2b(repr(parts).encode(), digest_size=8).digest()
+    return random.Random(int.from_bytes(seed, "big"))
+
+
+@lru_cache(maxsize=200000)
+def _grid_pois(level, i, j, place_type):
+    """The POIs of one type in one grid cell, as (id, name, lat, lng, rating, subtype, open_hour, close_hour)."""
+    rnd = _rng(level, i, j, place_type)
+    cell = GRID_CELL_DEG * 2 ** level
+    return tuple(
+        (f"fake_{level}_{i}_{j}_{place_type}_{k}", f"{place_type.replace('_', ' ').title()} {i % 1000}-{j % 1000}-{k}",
+         (i + rnd.random()) * cell, (j + rnd.random()) * cell,
+         round(2.5 + rnd.random() * 2.5, 1), rnd.choice(CUISINE_TYPES), 7 + rnd.randrange(5), 17 + rnd.randrange(7))
+        for k in range(POIS_PER_CELL_TYPE)
+    )
+
+
+def _distance_m(a, b):
+    p1, p2 = math.radians(a[0]), math.radians(b[0])
+    dp, dl = p2 - p1, math.radians(b[1] - a[1])
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(h)))
+
+
+def _encode_polyline(points):
+    out, prev = [], (0, 0)
+    for lat, lng in points:
+        cur = (round(lat * 1e5), round(lng * 1e5))
+        for delta in (cur[0] - prev[0], cur[1] - prev[1]):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev = cur
+    return "".join(out)
+
+
+def _parse_point(text):
+    lat, lng = text.split(",")
+    return float(lat), float(lng)
+
+
+class FakeGoogle:
+    """Synthetic data plus per-API latency, error injection and call counters."""
+
+    def __init__(self, latency=None, error_rate=None, error_status=503,
+                 center=(48.8566, 2.3522), spread_km=4.0):
+        self.latency = latency or {api: parse_latency("0") for api in APIS}
+        self.error_rate = error_rate or {api: 0.0 for api in APIS}
+        self.error_status = error_status
+        self.center = center
+        self.spread_km = spread_km
+        self.calls = Counter()
+        self.errors = Counter()
+
+    async def enter(self, api):
+        """Count the call, sleep its latency and decide whether it fails."""
+        self.calls[api] += 1
+        await asyncio.sleep(self.latency[api]())
+        if random.random() < self.error_rate[api]:
+            self.errors[api] += 1
+            return True
+        return False
+
+    def legacy_error(self):
+        status = "OVER_QUERY_LIMIT" if self.error_status == 429 else "UNKNOWN_ERROR"
+        return JSONResponse({"status": status, "error_message": "injected error"})
+
+    def geocode(self, address):
+        rnd = _rng("geocode", address.strip().lower())
+        d = math.sqrt(rnd.random()) * self.spread_km * 1000 / 111000
+        a = rnd.random() * 2 * math.pi
+        lat = self.center[0] + d * math.cos(a)
+        lng = self.center[1] + d * math.sin(a) / math.cos(math.radians(self.center[0]))
+        return {
+            "formatted_address": f"{address.strip()}, Bench City",
+            "geometry": {"location": {"lat": lat, "lng": lng}},
+            "place_id": "geo_" + hashlib.md5(address.strip().lower().encode()).hexdigest()[:16],
+        }
+
+    def pois(self, lat, lng, radius, types, limit=20):
+        """The `limit` best rated grid POIs of the given types inside the circle."""
+        dlat = math.degrees(radius / EARTH_RADIUS_M)
+        level = 0
+        while 2 * dlat / (GRID_CELL_DEG * 2 ** level) > GRID_MAX_CELLS:
+            level += 1
+        cell = GRID_CELL_DEG * 2 ** level
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+
+        found = []
+        for i in range(math.floor((lat - dlat) / cell), math.floor((lat + dlat) / cell) + 1):
+            for j in range(math.floor((lng - dlng) / cell), math.floor((lng + dlng) / cell) + 1):
+                for place_type in types or POI_TYPES:
+                    for poi in _grid_pois(level, i, j, place_type):
+                        if _distance_m((lat, lng), (poi[2], poi[3])) <= radius:
+                            found.append((place_type, poi))
+        found.sort(key=lambda item: item[1][4], reverse=True)
+
+        return [{
+            "id": pid, "name": name, "lat": p_lat, "lng": p_lng, "rating": rating,
+            "types": [place_type] + ([subtype] if place_type == "restaurant" else [])
+                     + ["point_of_interest", "establishment"],
+            "open_hour": open_hour, "close_hour": close_hour,
+        } for place_type, (pid, name, p_lat, p_lng, rating, subtype, open_hour, close_hour) in found[:limit]]
+
+    @staticmethod
+    def v1_place(poi, field_mask):
+        place = {
+            "id": poi["id"],
+            "displayName": {"text": poi["name"], "languageCode": "en"},
+            "formattedAddress": f"{poi['id'][-6:]} Bench Street",
+            "location": {"latitude": poi["lat"], "longitude": poi["lng"]},
+            "rating": poi["rating"],
+            "types": poi["types"],
+        }
+        if "regularOpeningHours" in field_mask or field_mask == "*":
+            place["regularOpeningHours"] = {"periods": [
+                {"open": {"day": d, "hour": poi["open_hour"], "minute": 0},
+                 "close": {"day": d, "hour": poi["close_hour"], "minute": 0}}
+                for d in range(7)
+            ]}
+        return place
+
+    @staticmethod
+    def leg(a, b, mode):
+        meters = int(_distance_m(a, b) * DETOUR_FACTOR)
+        seconds = int(meters / SPEEDS.get(mode, SPEEDS["driving"]))
+        return {
+            "distance": {"value": meters, "text": f"{meters / 1000:.1f} km"},
+            "duration": {"value": seconds, "text": f"{max(1, seconds // 60)} mins"},
+        }
+
+
+def create_app(fake):
+    app = FastAPI(title="Fake Google Maps Platform")
+
+    @app.get("/maps/api/geocode/json")
+    async def geocode(address: str = ""):
+        if await fake.enter("geocoding"):
+            return fake.legacy_error()
+        if not address.strip():
+            return {"status": "ZERO_RESULTS", "results": []}
+        return {"status": "OK", "results": [fake.geocode(address)]}
+
+    @app.post("/v1/places:searchNearby")
+    async def search_nearby(request: Request):
+        if await fake.enter("places"):
+            return JSONResponse({"error": {"code": fake.error_status, "message": "injected error"}},
+                                status_code=fake.error_status)
+        body = await request.json()
+        circle = body["locationRestriction"]["circle"]
+        pois = fake.pois(circle["center"]["latitude"], circle["center"]["longitude"],
+                         circle["radius"], body.get("includedTypes"), body.get("maxResultCount", 20))
+        field_mask = request.headers.get("X-Goog-FieldMask", "*")
+        return {"places": [fake.v1_place(p, field_mask) for p in pois]}
+
+    @app.get("/maps/api/place/nearbysearch/json")
+    async def nearby_legacy(location: str, radius: float = 1500, type: str = None):
+        if await fake.enter("places_legacy"):
+            return fake.legacy_error()
+        lat, lng = _parse_point(location)
+        pois = fake.pois(lat, lng, radius, [type] if type else None)
+        return {"status": "OK" if pois else "ZERO_RESULTS", "results": [{
+            "place_id": p["id"], "name": p["name"], "rating": p["rating"], "types": p["types"],
+            "geometry": {"location": {"lat": p["lat"], "lng": p["lng"]}},
+            "vicinity": f"{p['id'][-6:]} Bench Street",
+        } for p in pois]}
+
+    @app.get("/maps/api/distancematrix/json")
+    async def distance_matrix(origins: str, destinations: str, mode: str = "driving"):
+        if await fake.enter("distance_matrix"):
+            return fake.legacy_error()
+        origin_points = [_parse_point(o) for o in origins.split("|")]
+        destination_points = [_parse_point(d) for d in destinations.split("|")]
+        return {
+            "status": "OK",
+            "origin_addresses": [f"{o[0]:.5f},{o[1]:.5f}" for o in origin_points],
+            "destination_addresses": [f"{d[0]:.5f},{d[1]:.5f}" for d in destination_points],
+            "rows": [{"elements": [{"status": "OK", **fake.leg(o, d, mode)} for d in destination_points]}
+                     for o in origin_points],
+        }
+
+    @app.get("/maps/api/directions/json")
+    async def directions(origin: str, destination: str, waypoints: str = "", mode: str = "driving"):
+        if await fake.enter("directions"):
+            return fake.legacy_error()
+        stops = [w for w in waypoints.removeprefix("optimize:true|").split("|") if w]
+        points = [_parse_point(p) for p in [origin] + stops + [destination]]
+        legs = [{
+            "start_address": f"{a[0]:.5f},{a[1]:.5f}",
+            "end_address": f"{b[0]:.5f},{b[1]:.5f}",
+            "start_location": {"lat": a[0], "lng": a[1]},
+            "end_location": {"lat": b[0], "lng": b[1]},
+            "steps": [{"polyline": {"points": _encode_polyline([a, b])}}],
+            **fake.leg(a, b, mode),
+        } for a, b in zip(points, points[1:])]
+        return {"status": "OK", "routes": [{
+            "summary": "Bench route",
+            "legs": legs,
+            "waypoint_order": list(range(len(stops))),
+            "overview_polyline": {"points": _encode_polyline(points)},
+        }]}
+
+    @app.get("/_stats")
+    async def stats():
+        return {"calls": dict(fake.calls), "errors": dict(fake.errors)}
+
+    @app.post("/_reset")
+    async def reset():
+        fake.calls.clear()
+        fake.errors.clear()
+        return {"ok": True}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", metavar="[API=]SPEC",
+                        help="latency distribution, for all APIs or one (repeatable)")
+    parser.add_argument("--error-rate", action="append", metavar="[API=]RATE",
+                        help="fraction of calls that fail, for all APIs or one (repeatable)")
+    parser.add_argument("--error-status", type=int, default=503,
+                        help="HTTP status of injected Places errors; 429 also makes the "
+                             "legacy APIs answer OVER_QUERY_LIMIT")
+    parser.add_argument("--center", default="48.8566,2.3522", help="lat,lng that geocoded addresses cluster around")
+    parser.add_argument("--spread-km", type=float, default=4.0)
+    parser.add_argument("--seed", type=int, default=None, help="seed for latency and error draws")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    fake = FakeGoogle(
+        latency=_per_api(args.latency, parse_latency, parse_latency("0")),
+        error_rate=_per_api(args.error_rate, float, 0.0),
+        error_status=args.error_status,
+        center=_parse_point(args.center),
+        spread_km=args.spread_km,
+    )
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+# server/bench/run.py
+"""
+Load test and latency benchmark for the API, run against the fake Google
+server (bench/fake_google.py) so no quota is spent.
+
+Scenarios:
+  chat       a full /chat conversation: steps 0-5, then remove / add more /
+             change mode / show itinerary edits
+  places     GET /places for a hotel
+  itinerary  GET /itinerary for a hotel
+
+Each scenario runs at every concurrency level. The report gives per-step
+p50/p95/p99 latency, throughput and upstream calls per session; results are
+written as JSON and can be compared with an earlier run:
+
+    python -m bench.run --spawn --concurrency 1,8,32 --sessions 64
+    python -m bench.run --spawn --compare bench/results/<baseline>.json
+
+With --spawn the fake server and the app are started as subprocesses (the
+app is restarted for each run with --cold); otherwise --target and --fake
+name servers that are already running. Run from the server/ directory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(SERVER_DIR, "bench", "results")
+SCENARIOS = ["chat", "places", "itinerary"]
+
+# Edits made after the itinerary is generated, as (step label, message)
+CHAT_EDITS = [
+    ("remove", "remove 2nd stop"),
+    ("add_more", "add more museum"),
+    ("change_mode", "let's driving instead"),
+    ("show", "show itinerary"),
+]
+ITINERARY_TYPES = ["tourist", "activities", "foodie"]
+
+
+class Recorder:
+    """Latencies per step label plus error counts for one run."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.requests = 0
+
+    async def request(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.errors[label] += 1
+            print(f"  {label}: {e!r}", file=sys.stderr)
+            return None
+        finally:
+            self.latencies[label].append((time.perf_counter() - started) * 1000)
+            self.requests += 1
+        if response.status_code != 200:
+            self.errors[label] += 1
+            return None
+        data = response.json()
+        # The chat endpoint reports handled failures in its reply
+        if isinstance(data, dict) and "something went wrong" in (data.get("reply") or ""):
+            self.errors[label] += 1
+        return data
+
+
+async def chat_session(client, rec, n, hotel):
+    data = await rec.request(client, "chat:start", "POST", "/chat", json={"message": "hi"})
+    if data is None:
+        return
+    sid = data["session_id"]
+    steps = [
+        ("chat:type", ITINERARY_TYPES[n % len(ITINERARY_TYPES)]),
+        ("chat:mode", "walking"),
+        ("chat:distance", "2"),
+        ("chat:hotel", hotel),
+    ]
+    for label, message in steps:
+        data = await rec.request(client, label, "POST", "/chat", json={"session_id": sid, "message": message})
+        if data is None:
+            return
+    # Every other session picks the first cuisine offered
+    options = data.get("options") or []
+    cuisine = options[0] if n % 2 and options and options[0] != "Any Restaurant" else "none"
+    data = await rec.request(client, "chat:cuisine", "POST", "/chat", json={"session_id": sid, "message": cuisine})
+    if data is None:
+        return
+    for label, message in CHAT_EDITS:
+        await rec.request(client, f"chat:{label}", "POST", "/chat", json={"session_id": sid, "message": message})
+
+
+async def places_session(client, rec, n, hotel):
+    await rec.request(client, "places", "GET", "/places", params={"hotel_address": hotel, "time_str": "12:00"})
+
+
+async def itinerary_session(client, rec, n, hotel):
+    await rec.request(client, "itinerary", "GET", "/itinerary", params={"hotel_address": hotel})
+
+
+SESSIONS = {"chat": chat_session, "places": places_session, "itinerary": itinerary_session}
+
+
+def summarize(values):
+    arr = np.asarray(values)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {"count": len(values), "mean": round(float(arr.mean()), 2), "p50": round(float(p50), 2),
+            "p95": round(float(p95), 2), "p99": round(float(p99), 2), "max": round(float(arr.max()), 2)}
+
+
+async def upstream_calls(fake_url):
+    async with httpx.AsyncClient() as client:
+        return (await client.get(f"{fake_url}/_stats")).json()["calls"]
+
+
+async def run_level(target, fake_url, scenario, concurrency, sessions, hotels, timeout_s):
+    rec = Recorder()
+    session_fn = SESSIONS[scenario]
+    queue = asyncio.Queue()
+    for n in range(sessions):
+        queue.put_nowait(n)
+
+    async def worker(client):
+        while True:
+            try:
+                n = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await session_fn(client, rec, n, hotels[n % len(hotels)])
+
+    before = await upstream_calls(fake_url)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, timeout=timeout_s, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall_s = time.perf_counter() - started
+    after = await upstream_calls(fake_url)
+
+    all_latencies = [v for values in rec.latencies.values() for v in values]
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "wall_s": round(wall_s, 3),
+        "requests": rec.requests,
+        "requests_per_s": round(rec.requests / wall_s, 2),
+        "sessions_per_s": round(sessions / wall_s, 2),
+        "errors": dict(rec.errors),
+        "latency_ms": {"all": summarize(all_latencies),
+                       **{label: summarize(values) for label, values in sorted(rec.latencies.items())}},
+        "upstream_per_session": {api: round((after.get(api, 0) - before.get(api, 0)) / sessions, 2)
+                                 for api in sorted(after) if after.get(api, 0) != before.get(api, 0)},
+    }
+
+
+class Servers:
+    """Fake Google server and app under test, started as subprocesses."""
+
+    def __init__(self, args):
+        self.args = args
+        self.fake = None
+        self.app = None
+        self.fake_url = f"http://127.0.0.1:{args.fake_port}"
+        self.target = f"http://127.0.0.1:{args.app_port}"
+
+    def start_fake(self):
+        cmd = [sys.executable, "-m", "bench.fake_google", "--port", str(self.args.fake_port)]
+        for spec in self.args.latency or []:
+            cmd += ["--latency", spec]
+        for spec in self.args.error_rate or []:
+            cmd += ["--error-rate", spec]
+        if self.args.seed is not None:
+            cmd += ["--seed", str(self.args.seed)]
+        self.fake = subprocess.Popen(cmd, cwd=SERVER_DIR)
+        _wait_ready(f"{self.fake_url}/_stats")
+
+    def start_app(self):
+        env = dict(os.environ,
+                   GOOGLE_MAPS_BASE_URL=self.fake_url,
+                   PLACES_API_BASE_URL=self.fake_url,
+                   GOOGLE_MAPS_API_KEY="bench",
+                   GEOCODE_CACHE_PATH="",
+                   # Sessions must be shared once there is more than one worker
+                   SESSION_BACKEND="memory" if self.args.workers == 1 else "sqlite")
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.args.app_port),
+               "--log-level", "warning", "--workers", str(self.args.workers)]
+        log = open(os.devnull, "w") if self.args.quiet_app else None
+        self.app = subprocess.Popen(cmd, cwd=SERVER_DIR, env=env, stdout=log)
+        _wait_ready(f"{self.target}/cache/stats")
+
+    def restart_app(self):
+        self.stop(self.app)
+        self.start_app()
+
+    @staticmethod
+    def stop(process):
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def close(self):
+        self.stop(self.app)
+        self.stop(self.fake)
+
+
+def _wait_ready(url, timeout_s=30):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout_s}s")
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(result):
+    print(f"\n{result['scenario']} @ concurrency {result['concurrency']}: {result['sessions']} sessions "
+          f"in {result['wall_s']}s, {result['requests_per_s']} req/s, {result['sessions_per_s']} sessions/s"
+          + (f", errors {result['errors']}" if result["errors"] else ""))
+    print(f"  {'step':<16}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for label, s in result["latency_ms"].items():
+        print(f"  {label:<16}{s['count']:>6}{s['p50']:>10.1f}{s['p95']:>10.1f}{s['p99']:>10.1f}")
+    print(f"  upstream calls/session: {result['upstream_per_session']}")
+
+
+def compare(baseline, current, threshold):
+    """Print latency and upstream-call deltas against a baseline; returns the regressions found."""
+    base_runs = {(r["scenario"], r["concurrency"]): r for r in baseline["runs"]}
+    regressions = []
+    print(f"\nCompared with {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')}), "
+          f"threshold {threshold:.0%}:")
+    for run in current["runs"]:
+        base = base_runs.get((run["scenario"], run["concurrency"]))
+        if base is None:
+            continue
+        print(f"  {run['scenario']} @ {run['concurrency']}")
+        for label, stats in run["latency_ms"].items():
+            base_stats = base["latency_ms"].get(label)
+            if not base_stats:
+                continue
+            deltas = []
+            for q in ("p50", "p95", "p99"):
+                change = (stats[q] - base_stats[q]) / base_stats[q] if base_stats[q] else 0.0
+                deltas.append(f"{q} {base_stats[q]:.1f}->{stats[q]:.1f} ({change:+.0%})")
+                if q == "p95" and change > threshold:
+                    regressions.append(f"{run['scenario']}@{run['concurrency']} {label} p95 {change:+.0%}")
+            print(f"    {label:<16}" + "  ".join(deltas))
+        for api, calls in run["upstream_per_session"].items():
+            base_calls = base["upstream_per_session"].get(api, 0)
+            if calls > base_calls * (1 + threshold):
+                regressions.append(f"{run['scenario']}@{run['concurrency']} {api} calls/session "
+                                   f"{base_calls}->{calls}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--sessions", type=int, default=32, help="sessions per scenario and level")
+    parser.add_argument("--hotels", type=int, default=16, help="distinct hotel addresses sessions cycle through")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="app under test (without --spawn)")
+    parser.add_argument("--fake", default="http://127.0.0.1:8765", help="fake Google server (without --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="start the fake server and the app as subprocesses")
+    parser.add_argument("--cold", action="store_true", help="with --spawn, restart the app (empty caches) for each run")
+    parser.add_argument("--app-port", type=int, default=8100)
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned app")
+    parser.add_argument("--quiet-app", action="store_true", help="discard the spawned app's stdout")
+    parser.add_argument("--latency", action="append", metavar="[API=]SPEC",
+                        help="fake server latency (see bench.fake_google), repeatable")
+    parser.add_argument("--error-rate", action="append", metavar="[API=]RATE",
+                        help="fake server error rate, repeatable")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", default=None, help="result file (default bench/results/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="baseline result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative p95 / upstream-call increase reported as a regression")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    hotels = [f"Bench Hotel {i}, 1 Bench Street" for i in range(args.hotels)]
+
+    servers = Servers(args) if args.spawn else None
+    target, fake_url = (servers.target, servers.fake_url) if servers else (args.target, args.fake)
+    runs = []
+    try:
+        if servers:
+            servers.start_fake()
+            servers.start_app()
+        for scenario in scenarios:
+            for concurrency in levels:
+                if servers and args.cold and runs:
+                    servers.restart_app()
+                result = asyncio.run(run_level(target, fake_url, scenario, concurrency,
+                                               args.sessions, hotels, args.timeout))
+                print_run(result)
+                runs.append(result)
+    finally:
+        if servers:
+            servers.close()
+
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {
+        "meta": {
+            "timestamp": timestamp,
+            "revision": _git_revision(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "runs": runs,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{timestamp}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,9 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables once for the whole server
+load_dotenv()
+
 # Map each itinerary_type string to the list of Google Places place types you want to query
 ITINERARY_TYPE_MAP = {
     "activities":       ["bowling_alley", "amusement_park", "park","cultural_landmark"],
@@ -6,4 +12,172 @@ ITINERARY_TYPE_MAP = {
     "custom":           []  # you’ll fill this from explicit food_keywords etc.
 }
 
-CUISINES = ["italian","chinese","japanese","mexican","indian","thai","french","spanish","korean"]
\ No newline at end of file
+CUISINES = ["italian","chinese","japanese","mexican","indian","thai","french","spanish","korean"]
+
+# Logging: level gate, "json" or "text" lines, and the fraction of
+# below-WARNING records kept (warnings and errors are never sampled out)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+# Local cache directory (SQLite stores etc.), relative to the server package
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+# Geocode cache: in-process LRU in front of an on-disk SQLite store.
+# Set GEOCODE_CACHE_PATH to an empty string to keep the cache in memory only.
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", os.path.join(CACHE_DIR, "geocode.sqlite3"))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "4096"))
+GEOCODE_CACHE_TTL_S = int(os.getenv("GEOCODE_CACHE_TTL_S", str(30 * 24 * 3600)))
+GEOCODE_CACHE_NEGATIVE_TTL_S = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL_S", "600"))
+
+# HTTP responses: gzip bodies of at least GZIP_MIN_BYTES (itineraries, place
+# lists) at a level that favours CPU over the last few percent of size
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1000"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))
+
+# Upstream endpoints. Point these at server/bench/fake_google.py to run
+# load tests without spending quota.
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
+PLACES_API_BASE_URL = os.getenv("PLACES_API_BASE_URL", "https://places.googleapis.com").rstrip("/")
+
+# Shared upstream HTTP client (services/google_client.py)
+UPSTREAM_TIMEOUT_S = float(os.getenv("UPSTREAM_TIMEOUT_S", "10"))
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY_S = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY_S", "60"))
+
+# Concurrent place searches: per-query timeout and sync-path worker pool size
+PLACES_QUERY_TIMEOUT_S = float(os.getenv("PLACES_QUERY_TIMEOUT_S", "8"))
+PLACES_FANOUT_WORKERS = int(os.getenv("PLACES_FANOUT_WORKERS", "16"))
+
+# Geohash-tiled searchNearby cache. POI names, ratings and hours change over
+# days rather than minutes, so tiles live for half a day by default.
+PLACE_CACHE_MAX_TILES = int(os.getenv("PLACE_CACHE_MAX_TILES", "100000"))
+PLACE_CACHE_TTL_S = int(os.getenv("PLACE_CACHE_TTL_S", str(12 * 3600)))
+PLACE_TILE_RESULT_COUNT = int(os.getenv("PLACE_TILE_RESULT_COUNT", "20"))  # searchNearby maximum
+PLACE_TILE_MAX_RADIUS_M = 50000  # searchNearby maximum
+# One query is taken to cover a circle up to PLACE_QUERY_COVER_RADIUS_M: a
+# full result over a larger circle is split into overlapping quadrant queries,
+# recursively, until results drop below the maximum or the quadrant circles
+# are small enough. A search (per place-type query, the initial call included)
+# may spend about one call per cover-sized area of its circle, at most
+# PLACE_SEARCH_MAX_CALLS.
+PLACE_QUERY_COVER_RADIUS_M = int(os.getenv("PLACE_QUERY_COVER_RADIUS_M", "1000"))
+PLACE_SEARCH_MAX_CALLS = int(os.getenv("PLACE_SEARCH_MAX_CALLS", "16"))
+
+# Where place searches come from: "google" (Places API behind the tile cache),
+# "offline" (the local POI index only) or "hybrid" (the local index, topped up
+# from Google where it has fewer places than a search asks for). Build the
+# index with tools/build_poi_index.py.
+PLACES_BACKEND = os.getenv("PLACES_BACKEND", "google")
+POI_INDEX_PATH = os.getenv("POI_INDEX_PATH", os.path.join(CACHE_DIR, "poi_index"))
+POI_INDEX_CELL_DEG = 0.01  # grid cells ~1.1 km north-south
+# In hybrid mode a Google place with the same normalized name as a local one
+# within this distance is taken to be the same venue
+HYBRID_DUPLICATE_RADIUS_M = int(os.getenv("HYBRID_DUPLICATE_RADIUS_M", "50"))
+
+# Itinerary routing: stops are ordered locally from one batched Distance Matrix
+# fetch; Held-Karp is exact up to HELD_KARP_MAX_STOPS, local search beyond.
+MAX_ITINERARY_STOPS = int(os.getenv("MAX_ITINERARY_STOPS", "50"))
+HELD_KARP_MAX_STOPS = int(os.getenv("HELD_KARP_MAX_STOPS", "10"))
+ROUTE_OPTIMIZER_TIME_BUDGET_S = float(os.getenv("ROUTE_OPTIMIZER_TIME_BUDGET_S", "0.25"))
+DISTANCE_MATRIX_MAX_ELEMENTS = 100  # per request, also at most 25 origins / 25 destinations
+DIRECTIONS_MAX_WAYPOINTS = 25
+
+# Leg cache: Directions legs and Distance Matrix elements per travel mode.
+# Transit depends on departure time, so its entries are short-lived and also
+# keyed by departure bucket.
+LEG_CACHE_MAX_ENTRIES = int(os.getenv("LEG_CACHE_MAX_ENTRIES", "200000"))
+LEG_CACHE_TTL_S = {
+    "walking": 7 * 24 * 3600,
+    "bicycling": 7 * 24 * 3600,
+    "driving": 3600,
+    "transit": 900,
+}
+LEG_CACHE_TRANSIT_BUCKET_S = 900
+LEG_CACHE_COORD_DECIMALS = 5  # ~1 m
+
+# Route geometry: legs keep their path at the finest Douglas-Peucker level
+# (meters); each itinerary route also stores the coarser levels, served by
+# GET /routes/{route_id}/geometry according to the map zoom.
+ROUTE_GEOMETRY_LEVELS_M = (2, 10, 40, 160)
+ROUTE_GEOMETRY_MAX_ENTRIES = int(os.getenv("ROUTE_GEOMETRY_MAX_ENTRIES", "20000"))
+ROUTE_GEOMETRY_TTL_S = int(os.getenv("ROUTE_GEOMETRY_TTL_S", str(24 * 3600)))
+
+# Session store: "memory" (single worker) or "sqlite" (shared by several
+# workers on one host, WAL mode). Idle sessions expire after SESSION_TTL_S.
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(CACHE_DIR, "sessions.sqlite3"))
+SESSION_TTL_S = int(os.getenv("SESSION_TTL_S", str(2 * 3600)))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "50000"))
+# Byte bound of the memory backend; measuring serializes each session on every
+# write, so it is off (0) unless set. Sessions are bounded by count and places.
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", "0"))
+# Candidate places kept per session ("add more" / "replace" stop adding past it)
+SESSION_MAX_PLACES = int(os.getenv("SESSION_MAX_PLACES", "24"))
+
+# Multi-day planning (services/multiday.py): candidates are clustered into
+# day-sized groups and each day is routed as its own loop
+MULTIDAY_MAX_DAYS = int(os.getenv("MULTIDAY_MAX_DAYS", "7"))
+MULTIDAY_STOPS_PER_DAY = int(os.getenv("MULTIDAY_STOPS_PER_DAY", "6"))
+MULTIDAY_KMEANS_ITERATIONS = 20
+
+# Time spent at each stop when estimating arrival times
+STOP_DWELL_MINUTES = int(os.getenv("STOP_DWELL_MINUTES", "45"))
+
+# Candidate ranking before routing: weighted score over rating, distance from
+# the hotel and cuisine-keyword match, with a per-category share cap so one
+# category can't take every stop.
+ITINERARY_TOP_K = int(os.getenv("ITINERARY_TOP_K", "8"))
+ADD_MORE_TOP_K = int(os.getenv("ADD_MORE_TOP_K", "3"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "20"))
+RANKING_WEIGHTS = {"rating": 1.0, "distance": 0.6, "keyword": 0.5}
+RANKING_MAX_CATEGORY_SHARE = float(os.getenv("RANKING_MAX_CATEGORY_SHARE", "0.6"))
+
+# Cuisine options per area, built from the same restaurant fetch step 4 uses
+CUISINE_SAMPLE_SIZE = int(os.getenv("CUISINE_SAMPLE_SIZE", "60"))
+CUISINE_CATALOG_TTL_S = int(os.getenv("CUISINE_CATALOG_TTL_S", str(12 * 3600)))
+CUISINE_CATALOG_MAX_AREAS = int(os.getenv("CUISINE_CATALOG_MAX_AREAS", "5000"))
+CUISINE_RADIUS_BUCKET_M = 500
+
+# Speculative step-4 prefetch started right after the hotel is geocoded
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_MAX_CONCURRENCY = int(os.getenv("PREFETCH_MAX_CONCURRENCY", "8"))
+PREFETCH_TTL_S = int(os.getenv("PREFETCH_TTL_S", "600"))
+
+# Rendered GET /places and /itinerary responses, keyed by normalized hotel and
+# parameters. Fresh for RESPONSE_CACHE_TTL_S, then served stale for up to
+# RESPONSE_CACHE_STALE_S more while one background request refreshes them.
+# Start times are rounded down to RESPONSE_CACHE_TIME_BUCKET_MIN minutes in the
+# key so nearby times share an entry; the body is computed for the exact time
+# of the request that filled it, and says which ("at").
+RESPONSE_CACHE_TTL_S = int(os.getenv("RESPONSE_CACHE_TTL_S", "900"))
+RESPONSE_CACHE_STALE_S = int(os.getenv("RESPONSE_CACHE_STALE_S", str(6 * 3600)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_TIME_BUCKET_MIN = int(os.getenv("RESPONSE_CACHE_TIME_BUCKET_MIN", "15"))
+
+
+def _rate_limit(api, rate, burst):
+    """(rate per second, burst) for an API, overridable as UPSTREAM_RATE_<API>="rate:burst"."""
+    value = os.getenv(f"UPSTREAM_RATE_{api.upper()}")
+    if value:
+        rate, _, burst = value.partition(":")
+        return float(rate), float(burst or rate)
+    return rate, burst
+
+
+# Upstream scheduler (services/scheduler.py): token buckets per API, sized to
+# the default per-second quotas. Distance Matrix is metered in elements, so its
+# calls cost origins x destinations tokens.
+UPSTREAM_RATE_LIMITS = {
+    "geocoding": _rate_limit("geocoding", 50, 50),
+    "places": _rate_limit("places", 10, 20),
+    "directions": _rate_limit("directions", 50, 50),
+    "distance_matrix": _rate_limit("distance_matrix", 1000, 1000),
+}
+# Share of each bucket's burst that lower priority classes leave for interactive turns
+UPSTREAM_PRIORITY_RESERVE = {"interactive": 0.0, "background": 0.25, "batch": 0.5}
+# Retries on 429 / 5xx / OVER_QUERY_LIMIT with full-jitter exponential backoff
+UPSTREAM_MAX_RETRIES = {"interactive": 2, "background": 3, "batch": 5}
+UPSTREAM_RETRY_BASE_S = float(os.getenv("UPSTREAM_RETRY_BASE_S", "0.2"))
+UPSTREAM_RETRY_MAX_S = float(os.getenv("UPSTREAM_RETRY_MAX_S", "5"))
@@ -1,21 +1,82 @@
-import os
-import googlemaps
+import asyncio
 import re
-from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import orjson
+from fastapi import FastAPI, Header, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from datetime import datetime
-from services.geocode_services import geocode_address
-from services.places_service import search_nearby_places, get_available_cuisines
-from services.itinerary_service import generate_itinerary
-from state import new_session, get_session, clear_session
+from services import google_client, json_patch
+from services.geocode_services import geocode_address_async
+from services.geocode_cache import geocode_cache, normalize_address
+from services.place_cache import place_cache
+from services.leg_cache import leg_cache
+from services.route_geometry import route_geometry
+from services.cuisine_catalog import cuisine_catalog
+from services.places_service import (
+    search_nearby_places_async, search_nearby_places_checked_async, get_available_cuisines_async, apply_keywords,
+)
+from services.itinerary_service import generate_itinerary_async, iter_itinerary_async, prefetch_matrix_async
+from services.multiday import plan_multiday_async
+from services.opening_hours import google_weekday
+from services.poi_index import poi_index
+from services.place_record import places_to_dicts
+from services.prefetch import prefetcher
+from services.response_cache import response_cache
+from services.singleflight import upstream_flights
+from services.scheduler import scheduler
+from services.keyword_matcher import KeywordMatcher
+from services.ranking import rank_places
+from services.logs import configure_logging, get_logger
+from services.metrics import registry, CHAT_STEP_LATENCY, HTTP_LATENCY, CACHE_HIT_RATIO, CACHE_ENTRIES, ACTIVE_SESSIONS
+from state import (new_session_async, get_session_async, save_session_async, clear_session_async,
+                   session_stats_async)
 from schemas import ChatRequest, ChatResponse
-from config import ITINERARY_TYPE_MAP
+from config import (
+    ITINERARY_TYPE_MAP, ADD_MORE_TOP_K, PREFETCH_ENABLED, MULTIDAY_MAX_DAYS, MULTIDAY_STOPS_PER_DAY, PLACES_BACKEND,
+    GZIP_MIN_BYTES, GZIP_LEVEL, ITINERARY_TOP_K, SESSION_MAX_PLACES, RESPONSE_CACHE_TIME_BUCKET_MIN,
+)
+
+configure_logging()
+logger = get_logger("api")
+
+# Conversation step names, for per-step latency
+CHAT_STEPS = {0: "itinerary_type", 1: "travel_mode", 2: "max_distance", 3: "hotel", 4: "cuisine"}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if PLACES_BACKEND != "google":
+        # Open the offline POI index up front so a missing index fails startup, not the first search
+        index = poi_index()
+        logger.info("poi index loaded", extra={"backend": PLACES_BACKEND, "places": len(index), "path": index.path})
+    yield
+    # Release pooled upstream connections
+    await google_client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
-load_dotenv()
+class FastJSONResponse(Response):
+    """
+    orjson-encoded JSON. Endpoints returning large dicts (places, itineraries)
+    return it directly, skipping FastAPI's jsonable_encoder pass; /chat gets the
+    same from its response model, which Pydantic serializes straight to bytes.
+    """
+    media_type = "application/json"
+
+    def render(self, content):
+        return _dump_json(content)
+
+
+def _dump_json(content):
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
 
-app = FastAPI()
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,23 +90,229 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Age", "X-Cache"],
 )
+# Server-sent events are left uncompressed by the middleware, so streams are not buffered
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_LATENCY.observe(time.perf_counter() - started, method=request.method,
+                         route=getattr(route, "path", "unmatched"), status=response.status_code)
+    return response
+
+
+async def _emit(emit, event, data):
+    if emit is not None:
+        await emit(event, data)
+
+
+async def _route(hotel, places, mode, emit=None):
+    """Generate the itinerary, emitting the ordered stops and then the legs as they are ready."""
+    itinerary = None
+    async for stage, data in iter_itinerary_async(hotel["latitude"], hotel["longitude"], places, mode=mode):
+        if stage == "stops":
+            await _emit(emit, "stops", data)
+        else:
+            itinerary = data
+    if "legs" in itinerary:
+        await _emit(emit, "legs", {"legs": itinerary["legs"], "summary": itinerary["summary"]})
+    return itinerary
+
+
+async def _regenerate(session, emit=None):
+    return await _route(session["hotel"], session["places"], session["prefs"]["travel_mode"], emit)
+
+
+def _set_itinerary(session, itinerary):
+    """Store a new itinerary version, keeping the patch from the version before it."""
+    previous, version = session["itinerary"], session.get("itinerary_version", 0)
+    session["itinerary_patch"] = [version, json_patch.diff(previous, itinerary)] if previous is not None else None
+    session["itinerary_version"] = version + 1
+    session["itinerary"] = itinerary
+
+
+def _itinerary_fields(session, known_version=None):
+    """
+    Itinerary part of a ChatResponse. A client sending the version it holds
+    gets nothing when it is current and a patch when it holds the previous
+    version (if the patch is the smaller payload); anyone else gets the whole
+    itinerary.
+    """
+    itinerary = session["itinerary"]
+    if itinerary is None:
+        return {}
+    version = session.get("itinerary_version", 0)
+    if known_version == version:
+        return {"itinerary_version": version}
+    patch_from, patch = session.get("itinerary_patch") or (None, None)
+    if known_version is not None and known_version == patch_from and len(orjson.dumps(patch)) < len(orjson.dumps(itinerary)):
+        return {"itinerary_version": version, "itinerary_patch": patch}
+    return {"itinerary_version": version, "itinerary": itinerary}
+
+
+def _prefetch_key(place_types, radius_m):
+    return tuple(place_types or ()), radius_m
+
+
+def _start_prefetch(sid, session):
+    """
+    Speculatively run both possible step-4 searches (cuisines picked or 'none')
+    and warm the travel-time matrix for their likely stops.
+    """
+    hotel = session["hotel"]
+    prefs = session["prefs"]
+    radius_m = int(prefs["max_distance_km"] * 1000)
+
+    for place_types in (None, ITINERARY_TYPE_MAP[prefs["itinerary_type"]]):
+        async def job(place_types=place_types):
+            places = await search_nearby_places_async(
+                hotel["latitude"], hotel["longitude"],
+                place_types=place_types, keywords=None, radius=radius_m
+            )
+            likely = rank_places(places, hotel["latitude"], hotel["longitude"],
+                                 max_distance_km=prefs["max_distance_km"])
+            await prefetch_matrix_async(hotel["latitude"], hotel["longitude"], likely, mode=prefs["travel_mode"])
+            return places
+
+        prefetcher.start(sid, _prefetch_key(place_types, radius_m), job)
+
+
+async def _search_places(sid, hotel, place_types, keywords, radius_m):
+    """Step-4 search, reusing the session's prefetched result when there is one."""
+    places = await prefetcher.take(sid, _prefetch_key(place_types, radius_m))
+    if places is None:
+        return await search_nearby_places_async(
+            hotel["latitude"],
+            hotel["longitude"],
+            place_types=place_types,
+            keywords=keywords,
+            radius=radius_m
+        )
+    return apply_keywords(places, keywords)
+
+
+def _stops(session):
+    """Stops of the current itinerary in visiting order (hotel excluded)."""
+    itinerary = session["itinerary"] or {}
+    return [p for p in itinerary.get("ordered_places", []) if p.get("id") != "hotel"]
 
-def _regenerate(session):
-    return generate_itinerary(
-        session["hotel"]["latitude"],
-        session["hotel"]["longitude"],
-        session["places"],
-        mode=session["prefs"]["travel_mode"]
-    )
+
+def _remove_place(session, place_id):
+    for key, pool in session["places"].items():
+        session["places"][key] = [p for p in pool if p.place_id != place_id]
+
+
+def _prefer_keywords(found, keywords):
+    """Order each category of a search result so the user's cuisine keywords come first."""
+    if not keywords:
+        return found
+    return {key: KeywordMatcher(pool).rank(keywords) for key, pool in found.items()}
+
+
+def _place_count(session):
+    return sum(len(pool) for pool in session["places"].values())
+
+
+def _add_places(session, found, top_k, freed=0):
+    """
+    Add the best `top_k` places from a search result that the session doesn't
+    have yet, keeping the session within SESSION_MAX_PLACES once the caller
+    has removed `freed` places. Returns how many were added.
+    """
+    known = {p.place_id for pool in session["places"].values() for p in pool}
+    fresh = {key: [p for p in pool if p.place_id not in known] for key, pool in found.items()}
+    top_k = min(top_k, SESSION_MAX_PLACES + freed - len(known))
+    best = rank_places(fresh, session["hotel"]["latitude"], session["hotel"]["longitude"],
+                       top_k=top_k, max_distance_km=session["prefs"]["max_distance_km"])
+    for key, pool in best.items():
+        session["places"].setdefault(key, []).extend(pool)
+    return sum(len(pool) for pool in best.values())
 
 
 @app.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    print(req)
+async def chat(req: ChatRequest):
+    return await _chat_turn(req)
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    The /chat conversation as server-sent events. Long turns emit progress
+    events as each stage finishes ("places", "candidates", "stops", "legs");
+    every turn ends with a "reply" event carrying the ChatResponse.
+    """
+    if req.session_id and not await get_session_async(req.session_id):
+        raise HTTPException(400, "Invalid session_id")
+    started = time.perf_counter()
+    queue = asyncio.Queue()
+
+    async def emit(event, data):
+        await queue.put((event, data))
+
+    async def run_turn():
+        try:
+            response = await _chat_turn(req, emit)
+            await queue.put(("reply", response.model_dump()))
+        except HTTPException as e:
+            await queue.put(("error", {"status_code": e.status_code, "detail": e.detail}))
+        finally:
+            await queue.put(None)
+
+    async def events():
+        turn = asyncio.create_task(run_turn())
+        first = True
+        try:
+            while (item := await queue.get()) is not None:
+                event, data = item
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                if first:
+                    _record_first_event(elapsed_ms)
+                    first = False
+                yield f"event: {event}\ndata: {orjson.dumps({**data, 'elapsed_ms': elapsed_ms}).decode()}\n\n"
+        finally:
+            # Client went away mid-turn
+            if not turn.done():
+                turn.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# Time from request to first streamed event
+_stream_stats = {"streams": 0, "ttfe_ms_total": 0.0, "ttfe_ms_max": 0.0}
+
+
+def _record_first_event(elapsed_ms):
+    _stream_stats["streams"] += 1
+    _stream_stats["ttfe_ms_total"] += elapsed_ms
+    _stream_stats["ttfe_ms_max"] = max(_stream_stats["ttfe_ms_max"], elapsed_ms)
+
+
+@app.get("/chat/stream/stats")
+async def chat_stream_stats():
+    streams = _stream_stats["streams"]
+    return {
+        "streams": streams,
+        "ttfe_ms_avg": round(_stream_stats["ttfe_ms_total"] / streams, 1) if streams else 0.0,
+        "ttfe_ms_max": _stream_stats["ttfe_ms_max"],
+    }
+
+
+async def _chat_turn(req: ChatRequest, emit=None):
+    """
+    Handle one conversation turn. `emit(event, data)`, when given, receives
+    progress events from the long-running steps.
+    """
+    started = time.perf_counter()
+    logger.debug("chat turn", extra={"session_id": req.session_id, "chat_message": req.message})
     # 1. Initialize session
     if not req.session_id:
-        sid = new_session()
+        sid = await new_session_async()
+        CHAT_STEP_LATENCY.observe(time.perf_counter() - started, step="start")
         return ChatResponse(
             session_id=sid,
             reply="Welcome! What type of itinerary would you like? (activities / tourist / foodie / custom)",
@@ -53,9 +320,10 @@ def chat(req: ChatRequest):
         )
 
     sid = req.session_id
-    session = get_session(sid)
+    session = await get_session_async(sid)
     if not session:
         raise HTTPException(400, "Invalid session_id")
+    step_name = CHAT_STEPS.get(session["step"], "edit")
 
     # Wrap conversation handling to catch errors and preserve session state
     try:
@@ -67,13 +335,14 @@ def chat(req: ChatRequest):
                 return ChatResponse(
                     session_id=sid,
                     reply="Here's your current itinerary:",
-                    itinerary=session["itinerary"]
+                    **_itinerary_fields(session, req.known_version)
                 )
             return ChatResponse(session_id=sid, reply="No itinerary yet. Let's finish setup first.")
 
         if text in {"start over", "reset"}:
-            clear_session(sid)
-            sid = new_session()
+            await clear_session_async(sid)
+            prefetcher.discard(sid)
+            sid = await new_session_async()
             return ChatResponse(session_id=sid, reply="Alright, let's start again. What type of itinerary?")
 
         # 3. Step-by-step preference collection
@@ -124,7 +393,7 @@ def chat(req: ChatRequest):
 
         # Step 3: hotel_address → geocode → probe cuisines
         if step == 3:
-            hotel_info = geocode_address(req.message)
+            hotel_info = await geocode_address_async(req.message)
             if not hotel_info:
                 return ChatResponse(session_id=sid,
                                     reply="Could not geocode that. Try another address.")
@@ -132,7 +401,7 @@ def chat(req: ChatRequest):
 
             # probe available cuisines
             radius_m = int(session["prefs"]["max_distance_km"] * 1000)
-            options = get_available_cuisines(
+            options = await get_available_cuisines_async(
                 hotel_info["latitude"],
                 hotel_info["longitude"],
                 radius=radius_m
@@ -141,6 +410,10 @@ def chat(req: ChatRequest):
             session["prefs"]["available_cuisines"] = options
             session["step"] = 4
 
+            # start step 4's searches while the user picks cuisines
+            if PREFETCH_ENABLED:
+                _start_prefetch(sid, session)
+
             return ChatResponse(
                 session_id=sid,
                 reply=(
@@ -182,33 +455,35 @@ def chat(req: ChatRequest):
             # Otherwise use the itinerary type mapping
             if session["prefs"]["food_keywords"]:
                 # Search for restaurants with the selected cuisine keywords
-                places = search_nearby_places(
-                    hotel["latitude"],
-                    hotel["longitude"],
+                places = await _search_places(
+                    sid,
+                    hotel,
                     place_types=None,  # Let it default to restaurants
                     keywords=session["prefs"]["food_keywords"],
-                    radius=radius_m
+                    radius_m=radius_m
                 )
             else:
                 # Use itinerary type mapping (for non-food focused itineraries)
                 place_types = ITINERARY_TYPE_MAP[session["prefs"]["itinerary_type"]]
-                places = search_nearby_places(
-                    hotel["latitude"],
-                    hotel["longitude"],
+                places = await _search_places(
+                    sid,
+                    hotel,
                     place_types=place_types,
                     keywords=None,
-                    radius=radius_m
+                    radius_m=radius_m
                 )
+            prefetcher.discard(sid)
+            await _emit(emit, "places", {key: len(pool) for key, pool in places.items()})
+
+            # keep only the best candidates for routing
+            places = rank_places(places, hotel["latitude"], hotel["longitude"],
+                                 top_k=min(ITINERARY_TOP_K, SESSION_MAX_PLACES),
+                                 max_distance_km=session["prefs"]["max_distance_km"])
             session["places"] = places
+            await _emit(emit, "candidates", places_to_dicts(places))
 
             # 2) generate route
-            itinerary = generate_itinerary(
-                hotel["latitude"],
-                hotel["longitude"],
-                places,
-                mode=session["prefs"]["travel_mode"]
-            )
-            session["itinerary"] = itinerary
+            _set_itinerary(session, await _route(hotel, places, session["prefs"]["travel_mode"], emit))
 
             # After generating itinerary, ask about changes
             session["step"] = 5  # now in "post-itinerary" mode
@@ -221,7 +496,7 @@ def chat(req: ChatRequest):
                       "4. Change travel mode (e.g., 'let's drive instead')\n"
                       "5. Or say 'no changes' if you're happy with it",
                 options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                itinerary=itinerary
+                **_itinerary_fields(session, req.known_version)
             )
 
         # 4. Post-itinerary intent handlers (remove/add/change)
@@ -233,7 +508,7 @@ def chat(req: ChatRequest):
                 return ChatResponse(
                     session_id=sid,
                     reply="Great! Your itinerary is ready. You can view it anytime by saying 'show itinerary'.",
-                    itinerary=session["itinerary"]
+                    **_itinerary_fields(session, req.known_version)
                 )
 
             # 1) Show itinerary
@@ -242,27 +517,28 @@ def chat(req: ChatRequest):
                     session_id=sid,
                     reply="Here's your current itinerary. Would you like to make any changes?",
                     options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                    itinerary=session["itinerary"]
+                    **_itinerary_fields(session, req.known_version)
                 )
 
             # 2) Remove Nth stop
             m = re.match(r"remove (\d+)(?:st|nd|rd|th) stop", text)
             if m:
                 idx = int(m.group(1)) - 1
-                if 0 <= idx < len(session["places"]):
-                    session["places"].pop(idx)
-                    session["itinerary"] = _regenerate(session)
+                stops = _stops(session)
+                if 0 <= idx < len(stops):
+                    _remove_place(session, stops[idx]["place_id"])
+                    _set_itinerary(session, await _regenerate(session, emit))
                     return ChatResponse(
                         session_id=sid,
                         reply=f"Removed stop #{idx+1}. Would you like to make any other changes?",
                         options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                        itinerary=session["itinerary"]
+                        **_itinerary_fields(session, req.known_version)
                     )
                 else:
                     return ChatResponse(
                         session_id=sid,
                         reply="Invalid stop number. Please try again with a valid stop number.",
-                        itinerary=session["itinerary"]
+                        **_itinerary_fields(session, req.known_version)
                     )
 
             # 3) Replace a stop
@@ -271,72 +547,82 @@ def chat(req: ChatRequest):
             if m:
                 idx = int(m.group(1)) - 1
                 new_type = m.group(2)
-                
-                if 0 <= idx < len(session["places"]):
+                stops = _stops(session)
+
+                if 0 <= idx < len(stops):
                     # Search for a new place of the specified type
-                    new_places = search_nearby_places(
+                    new_places = await search_nearby_places_async(
                         session["hotel"]["latitude"],
                         session["hotel"]["longitude"],
                         place_types=[new_type],
-                        keywords=session["prefs"]["food_keywords"],
-                        radius=int(session["prefs"]["max_distance_km"] * 1000),
-                        exclude_place_ids=[p["place_id"] for p in session["places"]]  # Exclude existing places
+                        keywords=None,
+                        radius=int(session["prefs"]["max_distance_km"] * 1000)
                     )
-                    
-                    if new_places:
-                        # Replace the old place with the first new place found
-                        session["places"][idx] = new_places[0]
-                        session["itinerary"] = _regenerate(session)
+                    new_places = _prefer_keywords(new_places, session["prefs"]["food_keywords"])
+
+                    # Replace the old place with the best new place found (existing places excluded)
+                    if _add_places(session, new_places, top_k=1, freed=1):
+                        _remove_place(session, stops[idx]["place_id"])
+                        _set_itinerary(session, await _regenerate(session, emit))
                         return ChatResponse(
                             session_id=sid,
                             reply=f"Replaced stop #{idx+1} with a new {new_type}. Would you like to make any other changes?",
                             options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                            itinerary=session["itinerary"]
+                            **_itinerary_fields(session, req.known_version)
                         )
                     else:
                         return ChatResponse(
                             session_id=sid,
                             reply=f"Sorry, I couldn't find any {new_type} to replace that stop. Would you like to try a different type?",
                             options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                            itinerary=session["itinerary"]
+                            **_itinerary_fields(session, req.known_version)
                         )
                 else:
                     return ChatResponse(
                         session_id=sid,
                         reply="Invalid stop number. Please try again with a valid stop number.",
-                        itinerary=session["itinerary"]
+                        **_itinerary_fields(session, req.known_version)
                     )
 
             # 4) Add more of a category
             m = re.match(r"add more (\w+)", text)
             if m:
                 category = m.group(1)
-                new_places = search_nearby_places(
+                if _place_count(session) >= SESSION_MAX_PLACES:
+                    return ChatResponse(
+                        session_id=sid,
+                        reply=f"Your itinerary already has the maximum of {SESSION_MAX_PLACES} places. "
+                              "Remove or replace a stop to make room.",
+                        options=["no changes", "remove a stop", "replace a stop", "change travel mode"],
+                        **_itinerary_fields(session, req.known_version)
+                    )
+                new_places = await search_nearby_places_async(
                     session["hotel"]["latitude"],
                     session["hotel"]["longitude"],
                     place_types=[category],
-                    keywords=session["prefs"]["food_keywords"],
+                    keywords=None,
                     radius=int(session["prefs"]["max_distance_km"] * 1000)
                 )
-                session["places"].extend(new_places)
-                session["itinerary"] = _regenerate(session)
+                new_places = _prefer_keywords(new_places, session["prefs"]["food_keywords"])
+                _add_places(session, new_places, top_k=ADD_MORE_TOP_K)
+                _set_itinerary(session, await _regenerate(session, emit))
                 return ChatResponse(
                     session_id=sid,
                     reply=f"Added more {category}. Would you like to make any other changes?",
                     options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                    itinerary=session["itinerary"]
+                    **_itinerary_fields(session, req.known_version)
                 )
 
             # 5) Change travel mode
             if text.startswith("let's ") and " instead" in text:
                 new_mode = text.split()[1]
                 session["prefs"]["travel_mode"] = new_mode
-                session["itinerary"] = _regenerate(session)
+                _set_itinerary(session, await _regenerate(session, emit))
                 return ChatResponse(
                     session_id=sid,
                     reply=f"Switched to {new_mode}. Would you like to make any other changes?",
                     options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                    itinerary=session["itinerary"]
+                    **_itinerary_fields(session, req.known_version)
                 )
 
             # If no specific change command is recognized, ask again
@@ -349,16 +635,21 @@ def chat(req: ChatRequest):
                       "4. Change travel mode (e.g., 'let's drive instead')\n"
                       "5. Or say 'no changes' if you're happy with it",
                 options=["no changes", "remove a stop", "replace a stop", "add more places", "change travel mode"],
-                itinerary=session["itinerary"]
+                **_itinerary_fields(session, req.known_version)
             )
 
-    except Exception as e:
+    except Exception:
         # Log the error and return a friendly fallback without resetting session
-        print(f"Error in chat endpoint: {e}")
+        logger.exception("chat turn failed", extra={"session_id": sid, "step": step_name})
         return ChatResponse(
             session_id=sid,
             reply="Sorry, something went wrong. Let's try again."
         )
+    finally:
+        # Persist this turn's changes (skipped when the session was just reset)
+        if sid == req.session_id:
+            await save_session_async(sid, session)
+        CHAT_STEP_LATENCY.observe(time.perf_counter() - started, step=step_name)
 
     # Default fallback if no branch is matched within try
     return ChatResponse(
@@ -367,48 +658,228 @@ def chat(req: ChatRequest):
     )
 
 @app.get("/geocode")
-def geocode(hotel_address: str = Query(..., description="Hotel name or address")):
-    result = geocode_address(hotel_address)
-    print(result)
+async def geocode(hotel_address: str = Query(..., description="Hotel name or address")):
+    result = await geocode_address_async(hotel_address)
     if result:
         return result
     else:
         return {"error": "Could not geocode address"}
     
-@app.get("/places")
-def get_nearby_places(hotel_address: str, time_str: str = Query(None, description="Time in HH:MM (24-hour format)")):
-    hotel_info = geocode_address(hotel_address)
-    if not hotel_info:
-        return {"error": "Could not geocode address"}
-
-    lat = hotel_info['latitude']
-    lng = hotel_info['longitude']
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"geocode": geocode_cache.stats(), "places": place_cache.stats(), "legs": leg_cache.stats(),
+            "cuisines": cuisine_catalog.stats(), "prefetch": prefetcher.stats(),
+            "singleflight": upstream_flights.stats(), "scheduler": scheduler.stats(), "routes": route_geometry.stats(),
+            "responses": response_cache.stats(),
+            "poi_index": poi_index().stats() if PLACES_BACKEND != "google" else None}
+
+@registry.on_collect
+def _collect_stats():
+    for name, stats, ratio_key, size_key in (
+        ("geocode", geocode_cache.stats(), "hit_ratio", "entries"),
+        ("places", place_cache.stats(), "hit_ratio", "entries"),
+        ("legs", leg_cache.stats(), "hit_ratio", "entries"),
+        ("routes", route_geometry.stats(), "hit_ratio", "entries"),
+        ("responses", response_cache.stats(), "hit_ratio", "entries"),
+        ("cuisines", cuisine_catalog.stats(), "hit_ratio", "areas"),
+        ("prefetch", prefetcher.stats(), "hit_ratio", None),
+    ):
+        CACHE_HIT_RATIO.set(stats[ratio_key], cache=name)
+        if size_key:
+            CACHE_ENTRIES.set(stats[size_key], cache=name)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the server's metrics."""
+    ACTIVE_SESSIONS.set((await session_stats_async())["sessions"])
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/sessions/stats")
+async def sessions_stats():
+    return await session_stats_async()
+
+def _etag_matches(if_none_match, etag):
+    return bool(if_none_match) and (if_none_match.strip() == "*" or
+                                    etag in (t.strip().removeprefix("W/") for t in if_none_match.split(",")))
+
+@app.get("/sessions/{session_id}/itinerary")
+async def session_itinerary(session_id: str, if_none_match: Optional[str] = Header(None)):
+    """
+    The session's current itinerary, tagged with its version as the ETag;
+    a client revalidating with If-None-Match gets 304 until it changes.
+    """
+    session = await get_session_async(session_id)
+    if not session:
+        raise HTTPException(404, "Unknown session_id")
+    if session["itinerary"] is None:
+        raise HTTPException(404, "No itinerary yet")
+    version = session.get("itinerary_version", 0)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse({"itinerary_version": version, "itinerary": session["itinerary"]}, headers=headers)
+
+@app.get("/routes/{route_id}/geometry")
+async def get_route_geometry(route_id: str,
+                             zoom: float = Query(None, ge=0, le=22, description="Map zoom; picks the level of about one pixel"),
+                             tolerance_m: float = Query(None, gt=0, description="Largest acceptable deviation in meters"),
+                             if_none_match: Optional[str] = Header(None)):
+    """
+    Encoded path of each leg of an itinerary's route (itinerary["route"]["id"])
+    at the coarsest precomputed level within `tolerance_m`, or the level that
+    suits map `zoom`; the finest level when neither is given. Route ids are
+    content hashes, so responses never change and may be cached.
+    """
+    found = route_geometry.get(route_id, tolerance_m=tolerance_m, zoom=zoom)
+    if found is None:
+        raise HTTPException(404, "Unknown or expired route")
+    level, legs = found
+    etag = f'"{route_id}-{level}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400, immutable"}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse({"route_id": route_id, "level_m": level, "legs": legs}, headers=headers)
+
+def _parse_start(time_str, day):
+    """
+    (time, weekday) from the query parameters, the weekday resolved (default
+    today) so it can be part of the cache key; (None, None) without a time.
+    Raises ValueError for a malformed time.
+    """
+    if not time_str:
+        return None, None
+    t = datetime.strptime(time_str, "%H:%M").time()
+    return t, google_weekday(datetime.now()) if day is None else day
+
+
+def _time_bucket(t):
+    """`t` rounded down to the response cache's bucket, for cache keys only."""
+    if t is None:
+        return None
+    return t.replace(minute=t.minute - t.minute % RESPONSE_CACHE_TIME_BUCKET_MIN)
+
+
+def _computed_at(t, day):
+    """
+    The start a response was computed for. Times in one bucket share a cached
+    body, so a hit may report a nearby time rather than the one requested.
+    """
+    return {"time": t.strftime("%H:%M"), "day": day}
+
+
+def _route_ids(content):
+    """Route ids referenced by an /itinerary or /itinerary/multiday response."""
+    itinerary = content.get("itinerary") or {}
+    plans = [plan["itinerary"] for plan in itinerary["days"]] if "days" in itinerary else [itinerary]
+    return [plan["route"]["id"] for plan in plans if "route" in plan]
+
+
+async def _cached_json(key, compute, bypass):
+    """
+    Serve a GET response through the response cache. `compute` returns
+    (content, cacheable); the rendered body is what gets cached, and is
+    dropped once a route geometry it refers to has left the route store.
+    X-Cache says HIT, STALE, MISS or BYPASS and Age how old the served body is.
+    """
+    async def render():
+        content, cacheable = await compute()
+        route_ids = _route_ids(content)
+        valid = (lambda: all(map(route_geometry.contains, route_ids))) if route_ids else None
+        return _dump_json(content), cacheable, valid
+
+    body, status, age = await response_cache.get(key, render, bypass=bypass)
+    return Response(body, media_type="application/json", headers={"X-Cache": status, "Age": str(int(age))})
 
+@app.get("/places")
+async def get_nearby_places(hotel_address: str, time_str: str = Query(None, description="Time in HH:MM (24-hour format)"),
+                            day: int = Query(None, ge=0, le=6, description="Day of week, 0=Sunday (default today)"),
+                            no_cache: bool = Query(False, description="Recompute instead of serving a cached response")):
     # Parse the time string if provided
-    target_time = None
-    if time_str:
-        try:
-            target_time = datetime.strptime(time_str, "%H:%M").time()
-        except ValueError:
-            return {"error": "Invalid time format. Use HH:MM, e.g., 14:30."}
-
-    places = search_nearby_places(lat, lng, target_time=target_time)
-
-    return {"hotel": hotel_info, "places": places}
+    try:
+        target_time, target_day = _parse_start(time_str, day)
+    except ValueError:
+        return {"error": "Invalid time format. Use HH:MM, e.g., 14:30."}
+
+    async def compute():
+        hotel_info = await geocode_address_async(hotel_address)
+        if not hotel_info:
+            return {"error": "Could not geocode address"}, False
+
+        lat = hotel_info['latitude']
+        lng = hotel_info['longitude']
+        # A search with failed queries is served but not cached, so the next request retries it
+        places, complete = await search_nearby_places_checked_async(lat, lng, target_time=target_time,
+                                                                    target_day=target_day)
+        content = {"hotel": hotel_info, "places": places_to_dicts(places)}
+        if target_time is not None:
+            content["at"] = _computed_at(target_time, target_day)
+        return content, complete
+
+    key = ("places", normalize_address(hotel_address), _time_bucket(target_time), target_day)
+    return await _cached_json(key, compute, no_cache)
 
 @app.get("/itinerary")
-def get_itinerary(hotel_address: str):
-    hotel_info = geocode_address(hotel_address)
-    if not hotel_info:
-        return {"error": "Could not geocode address"}
-
-    lat = hotel_info['latitude']
-    lng = hotel_info['longitude']
-    places = search_nearby_places(lat, lng)
-
-    itinerary = generate_itinerary(lat, lng, places, mode="walking")
-
-    return {
-        "hotel": hotel_info,
-        "itinerary": itinerary
-    }
+async def get_itinerary(hotel_address: str, time_str: str = Query(None, description="Start time in HH:MM (24-hour format)"),
+                        day: int = Query(None, ge=0, le=6, description="Day of week, 0=Sunday (default today)"),
+                        no_cache: bool = Query(False, description="Recompute instead of serving a cached response")):
+    # Parse the start time if provided, to check each stop is open on arrival
+    try:
+        start_time, start_day = _parse_start(time_str, day)
+    except ValueError:
+        return {"error": "Invalid time format. Use HH:MM, e.g., 14:30."}
+
+    async def compute():
+        hotel_info = await geocode_address_async(hotel_address)
+        if not hotel_info:
+            return {"error": "Could not geocode address"}, False
+
+        lat = hotel_info['latitude']
+        lng = hotel_info['longitude']
+        places, complete = await search_nearby_places_checked_async(lat, lng, with_hours=start_time is not None)
+        places = rank_places(places, lat, lng)
+
+        itinerary = await generate_itinerary_async(lat, lng, places, mode="walking", start_time=start_time,
+                                                   start_day=start_day)
+        content = {"hotel": hotel_info, "itinerary": itinerary}
+        if start_time is not None:
+            content["at"] = _computed_at(start_time, start_day)
+        return content, complete and "error" not in itinerary
+
+    key = ("itinerary", normalize_address(hotel_address), "walking", _time_bucket(start_time), start_day)
+    return await _cached_json(key, compute, no_cache)
+
+@app.get("/itinerary/multiday")
+async def get_multiday_itinerary(hotel_address: str,
+                                 days: int = Query(2, ge=1, le=MULTIDAY_MAX_DAYS),
+                                 stops_per_day: int = Query(MULTIDAY_STOPS_PER_DAY, ge=1, le=25),
+                                 mode: str = Query("walking", pattern="^(walking|driving|transit|bicycling)$"),
+                                 time_str: str = Query(None, description="Daily start time in HH:MM (24-hour format)"),
+                                 day: int = Query(None, ge=0, le=6, description="First day of week, 0=Sunday (default today)"),
+                                 no_cache: bool = Query(False, description="Recompute instead of serving a cached response")):
+    try:
+        start_time, start_day = _parse_start(time_str, day)
+    except ValueError:
+        return {"error": "Invalid time format. Use HH:MM, e.g., 14:30."}
+
+    async def compute():
+        hotel_info = await geocode_address_async(hotel_address)
+        if not hotel_info:
+            return {"error": "Could not geocode address"}, False
+
+        lat = hotel_info['latitude']
+        lng = hotel_info['longitude']
+        places, complete = await search_nearby_places_checked_async(lat, lng, with_hours=start_time is not None)
+        places = rank_places(places, lat, lng, top_k=days * stops_per_day)
+
+        itinerary = await plan_multiday_async(lat, lng, places, days, mode=mode, stops_per_day=stops_per_day,
+                                              start_time=start_time, start_day=start_day)
+        content = {"hotel": hotel_info, "itinerary": itinerary}
+        if start_time is not None:
+            content["at"] = _computed_at(start_time, start_day)
+        return content, complete and "error" not in itinerary
+
+    key = ("multiday", normalize_address(hotel_address), mode, days, stops_per_day, _time_bucket(start_time),
+           start_day)
+    return await _cached_json(key, compute, no_cache)
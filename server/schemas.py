@@ -1,13 +1,28 @@
 # server/schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, model_serializer
 from typing import Optional, List
 
 class ChatRequest(BaseModel):
     session_id: Optional[str] = None
     message: str
+    # Itinerary version the client already holds; enables compact itinerary responses
+    known_version: Optional[int] = None
 
 class ChatResponse(BaseModel):
     session_id: str
     reply: str
     itinerary: Optional[dict] = None
-    options: Optional[List[str]] = None
\ No newline at end of file
+    # Version of the session itinerary this response reflects, and a JSON Patch
+    # (RFC 6902) from the client's known_version when sent instead of `itinerary`
+    itinerary_version: Optional[int] = None
+    itinerary_patch: Optional[List[dict]] = None
+    options: Optional[List[str]] = None
+
+    @model_serializer(mode="wrap")
+    def _omit_unversioned(self, handler):
+        # Left out rather than null when unset, so the fields predating them keep their wire shape
+        data = handler(self)
+        for name in ("itinerary_version", "itinerary_patch"):
+            if data.get(name) is None:
+                data.pop(name, None)
+        return data
@@ -0,0 +1,77 @@
+# server/services/cuisine_catalog.py
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from config import CUISINE_CATALOG_TTL_S, CUISINE_CATALOG_MAX_AREAS, CUISINE_RADIUS_BUCKET_M
+from services.place_cache import geohash_encode, precision_for_radius
+
+# Only filter out the most basic generic types
+EXCLUDE_TYPES = {'establishment', 'point_of_interest', 'food', 'restaurant'}
+
+
+def area_key(lat, lng, radius):
+    """
+    Hotels in the same geohash cell (as fine as the search tiles) with similar
+    radii share a catalog.
+    """
+    bucket = max(1, round(radius / CUISINE_RADIUS_BUCKET_M)) * CUISINE_RADIUS_BUCKET_M
+    return geohash_encode(lat, lng, precision_for_radius(bucket)), bucket
+
+
+def count_types(places):
+    """Type counts over a sample of raw searchNearby places."""
+    counts = Counter()
+    for place in places:
+        counts.update(t for t in set(place.get('types', [])) if t not in EXCLUDE_TYPES)
+    return counts
+
+
+def cuisine_options(counts):
+    """Readable options, most common first; a fallback when nothing was found."""
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    # Convert underscores to spaces and title case
+    options = [place_type.replace('_', ' ').title() for place_type, _ in ranked]
+    return options or ['Any Restaurant']
+
+
+class CuisineCatalog:
+    """LRU of per-area type counts with a TTL."""
+
+    def __init__(self, max_areas=CUISINE_CATALOG_MAX_AREAS, ttl_s=CUISINE_CATALOG_TTL_S):
+        self.max_areas = max_areas
+        self.ttl_s = ttl_s
+        self._areas = OrderedDict()  # area key -> (expires_at, Counter)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0}
+
+    def get(self, lat, lng, radius):
+        key = area_key(lat, lng, radius)
+        with self._lock:
+            entry = self._areas.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._areas.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, lat, lng, radius, counts):
+        key = area_key(lat, lng, radius)
+        with self._lock:
+            self._areas[key] = (time.time() + self.ttl_s, counts)
+            self._areas.move_to_end(key)
+            while len(self._areas) > self.max_areas:
+                self._areas.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["areas"] = len(self._areas)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Shared process-wide catalog
+cuisine_catalog = CuisineCatalog()
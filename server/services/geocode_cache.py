@@ -0,0 +1,145 @@
+# server/services/geocode_cache.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from config import (
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_MAX_ENTRIES,
+    GEOCODE_CACHE_TTL_S,
+    GEOCODE_CACHE_NEGATIVE_TTL_S,
+)
+
+# Returned by GeocodeCache.get when nothing usable is cached
+# (a cached negative result is returned as None instead).
+MISS = object()
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_address(address):
+    """
+    Canonical cache key for an address: case-folded, punctuation stripped,
+    whitespace collapsed. "Hotel Ritz,  Paris" and "hotel ritz paris" share a key.
+    """
+    text = unicodedata.normalize("NFKC", address or "").casefold()
+    text = _PUNCT_RE.sub(" ", text)
+    return " ".join(text.split())
+
+
+class GeocodeCache:
+    """
+    Two-tier geocode cache: an in-process LRU backed by a SQLite table.
+    Successful lookups live for `ttl_s`; "no result" lookups are cached as
+    None for the much shorter `negative_ttl_s`.
+    """
+
+    def __init__(self, path=GEOCODE_CACHE_PATH, max_entries=GEOCODE_CACHE_MAX_ENTRIES,
+                 ttl_s=GEOCODE_CACHE_TTL_S, negative_ttl_s=GEOCODE_CACHE_NEGATIVE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self._lru = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = self._open(path) if path else None
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "negative_hits": 0, "misses": 0, "expired": 0}
+
+    @staticmethod
+    def _open(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS geocode ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT,"
+            " expires_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def get(self, address):
+        """
+        Look up an address. Returns the cached result (None for a cached
+        negative result) or MISS.
+        """
+        key = normalize_address(address)
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._lru.move_to_end(key)
+                    self._count_hit("memory_hits", entry[1])
+                    return entry[1]
+                del self._lru[key]
+                self._counters["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM geocode WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0]) if row[0] is not None else None
+                        self._remember(key, row[1], value)
+                        self._count_hit("disk_hits", value)
+                        return value
+                    self._db.execute("DELETE FROM geocode WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._counters["expired"] += 1
+
+            self._counters["misses"] += 1
+            return MISS
+
+    def put(self, address, value):
+        """
+        Store a geocode result. `value=None` records a negative result.
+        """
+        key = normalize_address(address)
+        ttl = self.ttl_s if value is not None else self.negative_ttl_s
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocode (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value) if value is not None else None, expires_at),
+                )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM geocode")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._lru)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        counters["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return counters
+
+    def _remember(self, key, expires_at, value):
+        self._lru[key] = (expires_at, value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _count_hit(self, tier, value):
+        self._counters[tier] += 1
+        if value is None:
+            self._counters["negative_hits"] += 1
+
+
+# Shared process-wide cache instance
+geocode_cache = GeocodeCache()
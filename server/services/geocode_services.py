@@ -1,33 +1,59 @@
-import os
-import googlemaps
-from dotenv import load_dotenv
+from services.geocode_cache import geocode_cache, MISS
+from services.google_client import call, call_async, GEOCODE_URL
+from services.logs import get_logger
 
-# Load environment variables
-load_dotenv()
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+logger = get_logger("geocode")
+
+
+def _parse_geocode(geocode_result):
+    location = geocode_result[0]['geometry']['location']
+    place_id = geocode_result[0]['place_id']
+    formatted_address = geocode_result[0]['formatted_address']
+
+    return {
+        'formatted_address': formatted_address,
+        'latitude': location['lat'],
+        'longitude': location['lng'],
+        'place_id': place_id
+    }
 
-# Initialize Google Maps client
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
 
 def geocode_address(address):
     """
     Takes an address string and returns lat/lng and place_id.
+    Results (including "not found") are served from the geocode cache when possible.
     """
+    cached = geocode_cache.get(address)
+    if cached is not MISS:
+        return cached
+
     try:
-        geocode_result = gmaps.geocode(address)
-        if not geocode_result:
-            return None  # No results found
-
-        location = geocode_result[0]['geometry']['location']
-        place_id = geocode_result[0]['place_id']
-        formatted_address = geocode_result[0]['formatted_address']
-
-        return {
-            'formatted_address': formatted_address,
-            'latitude': location['lat'],
-            'longitude': location['lng'],
-            'place_id': place_id
-        }
+        geocode_result = call("geocoding", "GET", GEOCODE_URL, params={"address": address}).get("results", [])
     except Exception as e:
-        print(f"Error in geocoding: {e}")
-        return None
\ No newline at end of file
+        # Upstream errors are transient, so they are not cached
+        logger.warning("geocoding failed: %r", e)
+        return None
+    return _store(address, geocode_result)
+
+
+async def geocode_address_async(address):
+    """
+    Async variant of geocode_address.
+    """
+    cached = geocode_cache.get(address)
+    if cached is not MISS:
+        return cached
+
+    try:
+        data = await call_async("geocoding", "GET", GEOCODE_URL, params={"address": address})
+        geocode_result = data.get("results", [])
+    except Exception as e:
+        logger.warning("geocoding failed: %r", e)
+        return None
+    return _store(address, geocode_result)
+
+
+def _store(address, geocode_result):
+    result = _parse_geocode(geocode_result) if geocode_result else None  # None: no results found
+    geocode_cache.put(address, result)
+    return result
@@ -0,0 +1,249 @@
+# server/services/google_client.py
+"""
+Single entry point for every Google Maps Platform call.
+
+Holds one lazily created, connection-pooled httpx client per flavour (sync and
+async), negotiating HTTP/2 when the optional `h2` package is installed. Services
+describe a request (api name, method, url, params/body) and get parsed JSON back
+or an UpstreamError. Every request goes through the per-API rate-limit
+scheduler and is retried with backoff on 429 / 5xx / OVER_QUERY_LIMIT.
+"""
+import asyncio
+import contextvars
+import importlib.util
+import os
+import threading
+import time
+from json import dumps
+
+import httpx
+
+from config import (
+    GOOGLE_MAPS_BASE_URL,
+    PLACES_API_BASE_URL,
+    UPSTREAM_TIMEOUT_S,
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE,
+    UPSTREAM_KEEPALIVE_EXPIRY_S,
+    UPSTREAM_MAX_RETRIES,
+)
+from services.metrics import UPSTREAM_ERRORS, UPSTREAM_LATENCY, UPSTREAM_RETRIES
+from services.scheduler import scheduler, backoff_delay
+from services.singleflight import upstream_flights
+
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+
+GEOCODE_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/geocode/json"
+DIRECTIONS_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/directions/json"
+DISTANCE_MATRIX_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/distancematrix/json"
+PLACES_NEARBY_LEGACY_URL = f"{GOOGLE_MAPS_BASE_URL}/maps/api/place/nearbysearch/json"
+PLACES_SEARCH_NEARBY_URL = f"{PLACES_API_BASE_URL}/v1/places:searchNearby"
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Web-service "status" values that are not errors
+_OK_STATUSES = {"OK", "ZERO_RESULTS"}
+# Map legacy web-service error statuses onto HTTP-like codes
+_STATUS_CODES = {"OVER_QUERY_LIMIT": 429, "OVER_DAILY_LIMIT": 429, "UNKNOWN_ERROR": 500, "REQUEST_DENIED": 403}
+# Worth retrying after a backoff
+_RETRY_HTTP_STATUSES = {429, 500, 502, 503, 504}
+_RETRY_STATUSES = {"OVER_QUERY_LIMIT", "UNKNOWN_ERROR"}
+# Legacy error bodies are tiny; larger 200 responses are results and skip the status peek
+_ERROR_BODY_MAX_BYTES = 2048
+
+
+class UpstreamError(Exception):
+    """
+    A Google API call failed. `status_code` is the HTTP status, or an
+    HTTP-like code derived from the response's "status" field.
+    """
+
+    def __init__(self, api, status_code, message=""):
+        super().__init__(f"{api} upstream error {status_code}: {message}")
+        self.api = api
+        self.status_code = status_code
+
+
+# Priority class of the upstream calls made in the current context:
+# "interactive" (a user is waiting), "background" (prefetch and other
+# speculative work) or "batch" (offline jobs); see services/scheduler.py
+REQUEST_PRIORITY = contextvars.ContextVar("request_priority", default="interactive")
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def _client_kwargs():
+    return {
+        "http2": HTTP2_AVAILABLE,
+        "timeout": UPSTREAM_TIMEOUT_S,
+        "limits": httpx.Limits(
+            max_connections=UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY_S,
+        ),
+    }
+
+
+def get_client():
+    """Shared sync client, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**_client_kwargs())
+    return _client
+
+
+def get_async_client():
+    """Shared async client, created on first use inside the running event loop."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(**_client_kwargs())
+    return _async_client
+
+
+async def aclose():
+    """Close both pooled clients (called on app shutdown)."""
+    global _client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _client is not None:
+        await asyncio.to_thread(_client.close)
+        _client = None
+
+
+def _prepare(url, params, headers):
+    """Attach the API key the way each API family expects it."""
+    headers = dict(headers or {})
+    if url.startswith(PLACES_SEARCH_NEARBY_URL):
+        headers["X-Goog-Api-Key"] = GOOGLE_MAPS_API_KEY or ""
+    else:
+        params = dict(params or {})
+        params["key"] = GOOGLE_MAPS_API_KEY or ""
+    return params, headers
+
+
+def _flight_key(method, url, params, json, headers):
+    """Normalized identity of a request, so identical concurrent calls share one flight."""
+    return (
+        method.upper(),
+        url,
+        tuple(sorted((k, str(v)) for k, v in (params or {}).items())),
+        dumps(json, sort_keys=True) if json is not None else None,
+        tuple(sorted((headers or {}).items())),
+    )
+
+
+def _parse(api, response):
+    if response.status_code != 200:
+        UPSTREAM_ERRORS.inc(api=api, status=response.status_code)
+        raise UpstreamError(api, response.status_code, response.text[:200])
+    data = response.json()
+    status = data.get("status") if isinstance(data, dict) else None
+    if status is not None and status not in _OK_STATUSES:
+        UPSTREAM_ERRORS.inc(api=api, status=status)
+        raise UpstreamError(api, _STATUS_CODES.get(status, 400), data.get("error_message", status))
+    return data
+
+
+def _transport_error(api, e):
+    UPSTREAM_ERRORS.inc(api=api, status="timeout" if isinstance(e, httpx.TimeoutException) else "transport")
+
+
+def _retry_reason(response):
+    """Why a response should be retried, or None."""
+    if response.status_code in _RETRY_HTTP_STATUSES:
+        return str(response.status_code)
+    if response.status_code == 200 and len(response.content) <= _ERROR_BODY_MAX_BYTES:
+        try:
+            status = response.json().get("status")
+        except (ValueError, AttributeError):
+            return None
+        if status in _RETRY_STATUSES:
+            return status
+    return None
+
+
+def _retry_delay(api, attempt, reason, response=None):
+    delay = backoff_delay(attempt)
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        delay = max(delay, float(retry_after))
+    if reason in ("429", "OVER_QUERY_LIMIT"):
+        # Quota pushback applies to every caller of this API, not just this one
+        scheduler.penalize(api, delay)
+    UPSTREAM_RETRIES.inc(api=api, reason=reason)
+    return delay
+
+
+def _send(api, method, url, params, json, headers, cost):
+    priority = REQUEST_PRIORITY.get()
+    attempts = UPSTREAM_MAX_RETRIES.get(priority, 0) + 1
+    for attempt in range(attempts):
+        scheduler.acquire_sync(api, priority, cost)
+        started = time.perf_counter()
+        try:
+            response = get_client().request(method, url, params=params, json=json, headers=headers)
+        except httpx.HTTPError as e:
+            _transport_error(api, e)
+            if isinstance(e, httpx.TimeoutException) or attempt == attempts - 1:
+                raise
+            time.sleep(_retry_delay(api, attempt, "transport"))
+            continue
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, api=api)
+        reason = _retry_reason(response)
+        if reason is None or attempt == attempts - 1:
+            return response
+        time.sleep(_retry_delay(api, attempt, reason, response))
+
+
+async def _send_async(api, method, url, params, json, headers, cost):
+    priority = REQUEST_PRIORITY.get()
+    attempts = UPSTREAM_MAX_RETRIES.get(priority, 0) + 1
+    for attempt in range(attempts):
+        await scheduler.acquire(api, priority, cost)
+        started = time.perf_counter()
+        try:
+            response = await get_async_client().request(method, url, params=params, json=json, headers=headers)
+        except httpx.HTTPError as e:
+            _transport_error(api, e)
+            # A timeout has already used up the caller's patience
+            if isinstance(e, httpx.TimeoutException) or attempt == attempts - 1:
+                raise
+            await asyncio.sleep(_retry_delay(api, attempt, "transport"))
+            continue
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - started, api=api)
+        reason = _retry_reason(response)
+        if reason is None or attempt == attempts - 1:
+            return response
+        await asyncio.sleep(_retry_delay(api, attempt, reason, response))
+
+
+def call(api, method, url, params=None, json=None, headers=None, cost=1):
+    """
+    Blocking upstream call. Returns parsed JSON or raises UpstreamError.
+    `cost` is the number of rate-limit tokens the call takes (Distance Matrix
+    elements). Identical concurrent calls share one request; each caller
+    parses its own copy of the response.
+    """
+    key = _flight_key(method, url, params, json, headers)
+    params, headers = _prepare(url, params, headers)
+    response = upstream_flights.do(key, lambda: _send(api, method, url, params, json, headers, cost))
+    return _parse(api, response)
+
+
+async def call_async(api, method, url, params=None, json=None, headers=None, cost=1):
+    """
+    Async upstream call. Returns parsed JSON or raises UpstreamError.
+    Queued calls are released by priority (REQUEST_PRIORITY); identical
+    concurrent calls share one request.
+    """
+    key = _flight_key(method, url, params, json, headers)
+    params, headers = _prepare(url, params, headers)
+    response = await upstream_flights.do_async(key, lambda: _send_async(api, method, url, params, json, headers, cost))
+    return _parse(api, response)
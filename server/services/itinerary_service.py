@@ -1,82 +1,355 @@
-import os
-import googlemaps
-from dotenv import load_dotenv
+import asyncio
+import math
+from datetime import datetime
+from config import STOP_DWELL_MINUTES, MAX_ITINERARY_STOPS, DISTANCE_MATRIX_MAX_ELEMENTS, DIRECTIONS_MAX_WAYPOINTS
+from services.google_client import call, call_async, DIRECTIONS_URL, DISTANCE_MATRIX_URL
+from services.route_optimizer import solve_tour
+from services.leg_cache import leg_cache
+from services.route_geometry import leg_path, route_geometry
+from services.opening_hours import open_mask, arrival_minutes, week_minute, google_weekday, MINUTES_PER_DAY
+from services.logs import get_logger
 
-# Load environment variables
-load_dotenv()
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+logger = get_logger("itinerary")
 
-def generate_itinerary(lat, lng, places, mode="walking"):
-    """
-    Given a starting hotel location and places data, generate an itinerary using Directions API.
-    The last stop will always be the starting location (hotel).
-    """
-    waypoints = []
+# Rough travel speeds (m/s) used when the Distance Matrix is unavailable
+FALLBACK_SPEEDS = {"walking": 1.3, "bicycling": 4.0, "transit": 6.0, "driving": 9.0}
 
+
+def _select_places(places):
     # Extract restaurants and attractions from places dict
     restaurant_places = places.get('restaurant_places', [])
     attraction_places = places.get('attraction_places', [])
-    
-    # Combine restaurants and attractions (limit to, e.g., top 5)
-    combined_places = (restaurant_places + attraction_places)[:5]
-    
-    # Add places to waypoints
-    for place in combined_places:
-        waypoints.append(f"{place['latitude']},{place['longitude']}")
-
-    if not waypoints:
+
+    combined_places = restaurant_places + attraction_places
+    if len(combined_places) > MAX_ITINERARY_STOPS:
+        logger.info("itinerary limited to %d of %d places", MAX_ITINERARY_STOPS, len(combined_places))
+    return combined_places[:MAX_ITINERARY_STOPS]
+
+
+def _points(lat, lng, combined_places):
+    # Matrix index 0 is the hotel, i + 1 is combined_places[i]
+    return [f"{lat},{lng}"] + [f"{place.latitude},{place.longitude}" for place in combined_places]
+
+
+def _matrix_blocks(origins, destinations):
+    """
+    Split origins x destinations into request blocks within the per-request limits.
+    Yields (origin_indices, destination_indices).
+    """
+    if not origins or not destinations:
+        return
+    o_size = min(25, len(origins))
+    d_size = max(1, min(25, len(destinations), DISTANCE_MATRIX_MAX_ELEMENTS // o_size))
+    for o in range(0, len(origins), o_size):
+        for d in range(0, len(destinations), d_size):
+            yield origins[o:o + o_size], destinations[d:d + d_size]
+
+
+def _cached_matrix(points, mode):
+    """
+    Travel-time matrix pre-filled from the leg cache, plus the request blocks
+    that cover what is still missing. Rows missing most of their elements are
+    fetched whole; the remaining gaps (e.g. the column of one newly added stop)
+    are fetched as one narrower block.
+    """
+    n = len(points)
+    matrix = [[None] * n for _ in range(n)]
+    missing = {}
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                matrix[i][j] = 0
+                continue
+            value = leg_cache.get("matrix", mode, points[i], points[j])
+            if value is None:
+                missing.setdefault(i, []).append(j)
+            else:
+                matrix[i][j] = value
+    if not missing:
+        return matrix, []
+
+    all_destinations = sorted({j for dests in missing.values() for j in dests})
+    full_rows = [i for i, dests in missing.items() if len(dests) * 2 >= len(all_destinations)]
+    sparse_rows = [i for i in missing if i not in full_rows]
+    blocks = list(_matrix_blocks(full_rows, all_destinations))
+    if sparse_rows:
+        sparse_destinations = sorted({j for i in sparse_rows for j in missing[i]})
+        blocks.extend(_matrix_blocks(sparse_rows, sparse_destinations))
+    return matrix, blocks
+
+
+def _matrix_params(points, origins, destinations, mode):
+    return {
+        "origins": "|".join(points[i] for i in origins),
+        "destinations": "|".join(points[i] for i in destinations),
+        "mode": mode,
+    }
+
+
+def _fill_matrix(matrix, points, origins, destinations, data, mode):
+    for oi, row in zip(origins, data.get("rows", [])):
+        for di, element in zip(destinations, row.get("elements", [])):
+            if element.get("status") == "OK":
+                matrix[oi][di] = element["duration"]["value"]
+                leg_cache.put("matrix", mode, points[oi], points[di], matrix[oi][di])
+
+
+def _fallback_matrix(matrix, points, mode):
+    # Fill anything the Distance Matrix could not answer with a straight-line estimate
+    coords = [tuple(map(float, p.split(","))) for p in points]
+    speed = FALLBACK_SPEEDS.get(mode, FALLBACK_SPEEDS["walking"])
+    for i, row in enumerate(matrix):
+        for j, value in enumerate(row):
+            if value is None:
+                row[j] = 0 if i == j else _straight_line_m(coords[i], coords[j]) * 1.3 / speed
+    return matrix
+
+
+def _straight_line_m(a, b):
+    p1, p2 = math.radians(a[0]), math.radians(b[0])
+    h = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(b[1] - a[1]) / 2) ** 2
+    return 2 * 6371000 * math.asin(min(1.0, math.sqrt(h)))
+
+
+def fetch_duration_matrix(points, mode="walking"):
+    """
+    Travel-time matrix (seconds) between all points. Only elements missing from
+    the leg cache are fetched, in Distance Matrix blocks. Elements the API could
+    not answer fall back to a straight-line estimate.
+    """
+    matrix, blocks = _cached_matrix(points, mode)
+    for origins, destinations in blocks:
+        try:
+            data = call("distance_matrix", "GET", DISTANCE_MATRIX_URL,
+                        params=_matrix_params(points, origins, destinations, mode),
+                        cost=len(origins) * len(destinations))
+            _fill_matrix(matrix, points, origins, destinations, data, mode)
+        except Exception as e:
+            logger.warning("distance matrix failed: %r", e)
+    return _fallback_matrix(matrix, points, mode)
+
+
+async def fetch_duration_matrix_async(points, mode="walking"):
+    """
+    Async variant of fetch_duration_matrix; all blocks are requested concurrently.
+    """
+    matrix, blocks = _cached_matrix(points, mode)
+    results = await asyncio.gather(
+        *(call_async("distance_matrix", "GET", DISTANCE_MATRIX_URL,
+                     params=_matrix_params(points, origins, destinations, mode),
+                     cost=len(origins) * len(destinations))
+          for origins, destinations in blocks),
+        return_exceptions=True)
+    for (origins, destinations), data in zip(blocks, results):
+        if isinstance(data, Exception):
+            logger.warning("distance matrix failed: %r", data)
+        else:
+            _fill_matrix(matrix, points, origins, destinations, data, mode)
+    return _fallback_matrix(matrix, points, mode)
+
+
+async def prefetch_matrix_async(lat, lng, places, mode="walking"):
+    """Warm the leg cache with the travel-time matrix generate_itinerary will need for `places`."""
+    combined_places = _select_places(places)
+    if combined_places:
+        await fetch_duration_matrix_async(_points(lat, lng, combined_places), mode)
+
+
+def _directions_requests(route_points, mode):
+    """
+    Directions params for the already-ordered loop, split so that no request
+    exceeds the waypoint limit. Consecutive requests share their end points.
+    """
+    step = DIRECTIONS_MAX_WAYPOINTS + 1
+    for start in range(0, len(route_points) - 1, step):
+        chunk = route_points[start:start + step + 1]
+        params = {"origin": chunk[0], "destination": chunk[-1], "mode": mode}
+        if len(chunk) > 2:
+            params["waypoints"] = "|".join(chunk[1:-1])
+        yield params
+
+
+def _cached_legs(route_points, mode):
+    """
+    Legs of the ordered loop taken from the leg cache (None where missing), and
+    the (start, end) index runs of consecutive missing legs.
+    """
+    legs = [leg_cache.get("leg", mode, a, b) for a, b in zip(route_points, route_points[1:])]
+    runs, start = [], None
+    for i, leg in enumerate(legs + [True]):
+        if leg is None and start is None:
+            start = i
+        elif leg is not None and start is not None:
+            runs.append((start, i))
+            start = None
+    return legs, runs
+
+
+def _route_legs(directions_result):
+    routes = directions_result.get("routes", [])
+    if not routes:
+        raise LookupError("No route found")
+    route = routes[0]
+    return [{
+        "start_address": leg['start_address'],
+        "end_address": leg['end_address'],
+        "distance": leg['distance'],
+        "duration": leg['duration'],
+        "summary": route.get('summary', ''),
+        "path": leg_path(leg),
+    } for leg in route.get('legs', [])]
+
+
+def _store_legs(legs, route_points, start, fetched, mode):
+    for offset, leg in enumerate(fetched):
+        i = start + offset
+        legs[i] = leg
+        leg_cache.put("leg", mode, route_points[i], route_points[i + 1], leg)
+
+
+def generate_itinerary(lat, lng, places, mode="walking", time_budget_s=None, start_time=None, start_day=None):
+    """
+    Given a starting hotel location and places data, generate an itinerary.
+    Stops are ordered locally from a Distance Matrix (see route_optimizer), then
+    Directions is called for the ordered loop to get leg details. Legs already in
+    the leg cache are reused, so an edited itinerary only fetches the legs that changed.
+    With `start_time` (and optionally `start_day`, Google weekday), each stop is
+    annotated with its arrival time and whether it is open then.
+    The last stop will always be the starting location (hotel).
+    """
+    combined_places = _select_places(places)
+    if not combined_places:
         return {"error": "No places to generate an itinerary"}
 
+    points = _points(lat, lng, combined_places)
+    tour = solve_tour(fetch_duration_matrix(points, mode), time_budget_s)
+    route_points = [points[0]] + [points[i] for i in tour["order"]] + [points[0]]
+    legs, runs = _cached_legs(route_points, mode)
     try:
-        # Get directions with waypoints
-        directions_result = gmaps.directions(
-            origin=f"{lat},{lng}",
-            destination=f"{lat},{lng}",  # loop back to hotel
-            waypoints=waypoints,
-            optimize_waypoints=True,
-            mode=mode
-        )
-
-        if not directions_result:
-            return {"error": "No route found"}
-
-        route = directions_result[0]
-        ordered_places = []
-        order = route.get('waypoint_order', list(range(len(waypoints))))
-
-        # Add places in the optimized order
-        for idx in order:
-            place = combined_places[idx]
-            ordered_places.append(place)
-
-        # Add the hotel as the last stop
-        hotel_place = {
-            'id': 'hotel',
-            'name': 'Hotel',
-            'address': route['legs'][-1]['end_address'],
-            'latitude': lat,
-            'longitude': lng,
-            'rating': None
-        }
-        ordered_places.append(hotel_place)
-
-        # Get legs information
-        legs = []
-        for i, leg in enumerate(route.get('legs', [])):
-            legs.append({
-                "start_address": leg['start_address'],
-                "end_address": leg['end_address'],
-                "distance": leg['distance']['text'],
-                "duration": leg['duration']['text'],
-            })
-
-        return {
-            "ordered_places": ordered_places,
-            "summary": route.get('summary', ''),
-            "legs": legs
-        }
+        for start, end in runs:
+            fetched = []
+            for params in _directions_requests(route_points[start:end + 1], mode):
+                fetched.extend(_route_legs(call("directions", "GET", DIRECTIONS_URL, params=params)))
+            _store_legs(legs, route_points, start, fetched, mode)
+    except LookupError:
+        return {"error": "No route found"}
+    except Exception:
+        logger.exception("itinerary generation failed")
+        return {"error": "Failed to generate itinerary"}
+    return _build_itinerary(lat, lng, combined_places, tour, legs, start_time, start_day)
+
+
+async def generate_itinerary_async(lat, lng, places, mode="walking", time_budget_s=None, start_time=None, start_day=None):
+    """
+    Async variant of generate_itinerary; missing leg runs are fetched concurrently.
+    """
+    async for stage, data in iter_itinerary_async(lat, lng, places, mode, time_budget_s, start_time, start_day):
+        if stage == "itinerary":
+            return data
 
-    except Exception as e:
-        print(f"Error generating itinerary: {e}")
-        return {"error": "Failed to generate itinerary"}
\ No newline at end of file
+
+async def iter_itinerary_async(lat, lng, places, mode="walking", time_budget_s=None, start_time=None, start_day=None):
+    """
+    generate_itinerary_async in stages, for callers that show progress. Yields
+    ("stops", {"ordered_places", "optimizer"}) as soon as the stop order is
+    solved, then ("itinerary", itinerary) once the legs are in.
+    """
+    combined_places = _select_places(places)
+    if not combined_places:
+        yield "itinerary", {"error": "No places to generate an itinerary"}
+        return
+
+    points = _points(lat, lng, combined_places)
+    cost = await fetch_duration_matrix_async(points, mode)
+    # Local search can use its whole time budget; keep the event loop serving meanwhile
+    tour = await asyncio.to_thread(solve_tour, cost, time_budget_s)
+    yield "stops", {
+        "ordered_places": [combined_places[idx - 1].to_dict() for idx in tour["order"]],
+        "optimizer": {"method": tour["method"], "objective_s": round(tour["objective"])},
+    }
+
+    route_points = [points[0]] + [points[i] for i in tour["order"]] + [points[0]]
+    legs, runs = _cached_legs(route_points, mode)
+
+    async def fetch_run(start, end):
+        responses = await asyncio.gather(*(call_async("directions", "GET", DIRECTIONS_URL, params=params)
+                                           for params in _directions_requests(route_points[start:end + 1], mode)))
+        return [leg for response in responses for leg in _route_legs(response)]
+
+    try:
+        fetched_runs = await asyncio.gather(*(fetch_run(start, end) for start, end in runs))
+    except LookupError:
+        yield "itinerary", {"error": "No route found"}
+        return
+    except Exception:
+        logger.exception("itinerary generation failed")
+        yield "itinerary", {"error": "Failed to generate itinerary"}
+        return
+    for (start, _), fetched in zip(runs, fetched_runs):
+        _store_legs(legs, route_points, start, fetched, mode)
+    yield "itinerary", _build_itinerary(lat, lng, combined_places, tour, legs, start_time, start_day)
+
+
+def _check_arrivals(ordered_places, route_legs, start_time, start_day):
+    """
+    Annotate copies of the stops with their estimated arrival time and whether
+    they are open then (None when a place has no hours data), in one batched check.
+    """
+    day = google_weekday(datetime.now()) if start_day is None else start_day
+    arrivals = arrival_minutes(week_minute(day, start_time),
+                               [leg['duration']['value'] for leg in route_legs[:len(ordered_places)]],
+                               STOP_DWELL_MINUTES)
+    is_open = open_mask([place.get('open_intervals') for place in ordered_places], arrivals)
+    annotated = []
+    for place, minute, open_then in zip(ordered_places, arrivals.tolist(), is_open.tolist()):
+        annotated.append({
+            **place,
+            'arrival': f"{minute % MINUTES_PER_DAY // 60:02d}:{minute % 60:02d}",
+            'open_at_arrival': open_then if place.get('open_intervals') is not None else None,
+        })
+    return annotated
+
+
+def _build_itinerary(lat, lng, combined_places, tour, route_legs, start_time=None, start_day=None):
+    # Add places in the optimized order
+    ordered_places = [combined_places[idx - 1].to_dict() for idx in tour["order"]]
+    if start_time is not None:
+        ordered_places = _check_arrivals(ordered_places, route_legs, start_time, start_day)
+
+    # Add the hotel as the last stop
+    hotel_place = {
+        'id': 'hotel',
+        'name': 'Hotel',
+        'address': route_legs[-1]['end_address'],
+        'latitude': lat,
+        'longitude': lng,
+        'rating': None
+    }
+    ordered_places.append(hotel_place)
+
+    # Get legs information
+    legs = []
+    for leg in route_legs:
+        legs.append({
+            "start_address": leg['start_address'],
+            "end_address": leg['end_address'],
+            "distance": leg['distance']['text'],
+            "duration": leg['duration']['text'],
+            "distance_m": leg['distance']['value'],
+            "duration_s": leg['duration']['value'],
+        })
+
+    summaries = list(dict.fromkeys(leg['summary'] for leg in route_legs if leg.get('summary')))
+    # Legs cached before paths were kept have none and are drawn straight
+    stops = [(lat, lng)] + [(place['latitude'], place['longitude']) for place in ordered_places]
+    route_id = route_geometry.put([leg.get('path') for leg in route_legs], stops)
+    return {
+        "ordered_places": ordered_places,
+        "summary": " / ".join(summaries),
+        "legs": legs,
+        "route": {"id": route_id, "levels_m": list(route_geometry.levels_m)},
+        "optimizer": {
+            "method": tour["method"],
+            "objective_s": round(tour["objective"]),
+        }
+    }
@@ -0,0 +1,56 @@
+# server/services/json_patch.py
+"""
+JSON Patch (RFC 6902) diffs between two JSON-like values, using only the
+"add", "remove" and "replace" operations. Lists are diffed by trimming the
+common prefix and suffix and pairing up the changed middle, which keeps the
+patch small for the usual itinerary edits (one stop removed, added or
+swapped, legs around it re-timed).
+"""
+
+
+def _pointer(path):
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in path)
+
+
+def _diff(old, new, path, ops):
+    if old == new:
+        return
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path + [key])})
+        for key, value in new.items():
+            if key in old:
+                _diff(old[key], value, path + [key], ops)
+            else:
+                ops.append({"op": "add", "path": _pointer(path + [key]), "value": value})
+    elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        _diff_list(old, new, path, ops)
+    else:
+        ops.append({"op": "replace", "path": _pointer(path), "value": new})
+
+
+def _diff_list(old, new, path, ops):
+    start = 0
+    while start < len(old) and start < len(new) and old[start] == new[start]:
+        start += 1
+    end = 0
+    while end < len(old) - start and end < len(new) - start and old[-1 - end] == new[-1 - end]:
+        end += 1
+    old_mid, new_mid = old[start:len(old) - end], new[start:len(new) - end]
+    paired = min(len(old_mid), len(new_mid))
+    for i in range(paired):
+        _diff(old_mid[i], new_mid[i], path + [start + i], ops)
+    # Indexes shift as ops apply in order: removing at one position drops each surplus element in turn
+    for _ in range(len(old_mid) - paired):
+        ops.append({"op": "remove", "path": _pointer(path + [start + paired])})
+    for i in range(paired, len(new_mid)):
+        ops.append({"op": "add", "path": _pointer(path + [start + i]), "value": new_mid[i]})
+
+
+def diff(old, new):
+    """Operations turning `old` into `new` when applied in order."""
+    ops = []
+    _diff(old, new, [], ops)
+    return ops
+
@@ -0,0 +1,111 @@
+# server/services/keyword_matcher.py
+import re
+from collections import deque
+from dataclasses import replace
+
+_NON_WORD_RE = re.compile(r"[^\w\s]")
+
+# Score contributed by each kind of keyword hit
+TYPE_MATCH_SCORE = 3     # keyword equals a place type ("italian restaurant" ~ italian_restaurant)
+TOKEN_MATCH_SCORE = 2    # every keyword token is a name or type token
+SUBSTRING_MATCH_SCORE = 1  # keyword occurs inside the name/types text ("sushi" in "sushiya")
+
+
+def normalize_text(text):
+    """Lowercase, underscores and punctuation to spaces, whitespace collapsed."""
+    text = _NON_WORD_RE.sub(" ", (text or "").lower().replace("_", " "))
+    return " ".join(text.split())
+
+
+class AhoCorasick:
+    """Multi-pattern substring search: one scan of a text finds every pattern in it."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [set()]
+        for idx, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                node = nxt
+            self._out[node].add(idx)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+
+    def search(self, text):
+        """Indices of the patterns that occur in `text`."""
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found |= self._out[node]
+        return found
+
+
+class KeywordMatcher:
+    """
+    Keyword matcher built once per candidate set: an inverted index over
+    normalized name tokens, type tokens and whole types, plus an Aho-Corasick
+    scan for keywords that only occur as substrings.
+    """
+
+    def __init__(self, places):
+        self.places = list(places)
+        self._token_index = {}  # name/type token -> set of place indices
+        self._type_index = {}   # normalized type ("italian restaurant") -> set of place indices
+        self._texts = []
+        for idx, place in enumerate(self.places):
+            types = [normalize_text(t) for t in place.types]
+            name = normalize_text(place.name)
+            for t in types:
+                self._type_index.setdefault(t, set()).add(idx)
+            for token in set(name.split()).union(*(t.split() for t in types)):
+                self._token_index.setdefault(token, set()).add(idx)
+            self._texts.append(" | ".join([name] + types))
+
+    def scores(self, keywords):
+        """Match score per place (0 = no keyword matched), computed in one pass."""
+        normalized = [kw for kw in dict.fromkeys(normalize_text(k) for k in keywords) if kw]
+        scores = [0] * len(self.places)
+        if not normalized:
+            return scores
+
+        for kw in normalized:
+            for idx in self._type_index.get(kw, ()):
+                scores[idx] += TYPE_MATCH_SCORE
+            postings = [self._token_index.get(token, set()) for token in kw.split()]
+            for idx in set.intersection(*postings):
+                scores[idx] += TOKEN_MATCH_SCORE
+
+        automaton = AhoCorasick(normalized)
+        for idx, text in enumerate(self._texts):
+            scores[idx] += SUBSTRING_MATCH_SCORE * len(automaton.search(text))
+        return scores
+
+    def rank(self, keywords):
+        """All places, best keyword match first, as copies carrying `keyword_score`."""
+        scored = [replace(place, keyword_score=score) for place, score in zip(self.places, self.scores(keywords))]
+        return sorted(scored, key=lambda p: p.keyword_score, reverse=True)
+
+    def filter(self, keywords):
+        """Only the places matching at least one keyword, best match first."""
+        return [place for place in self.rank(keywords) if place.keyword_score > 0]
@@ -0,0 +1,76 @@
+# server/services/leg_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    LEG_CACHE_MAX_ENTRIES,
+    LEG_CACHE_TTL_S,
+    LEG_CACHE_TRANSIT_BUCKET_S,
+    LEG_CACHE_COORD_DECIMALS,
+)
+
+
+def quantize(point):
+    """'lat,lng' string -> rounded (lat, lng) tuple used in cache keys."""
+    lat, lng = point.split(",")
+    return round(float(lat), LEG_CACHE_COORD_DECIMALS), round(float(lng), LEG_CACHE_COORD_DECIMALS)
+
+
+class LegCache:
+    """
+    LRU of origin -> destination travel data per travel mode, with a
+    mode-specific TTL. Two kinds of entries share it:
+      "matrix": Distance Matrix duration in seconds
+      "leg":    a Directions leg (addresses, distance, duration, summary)
+    """
+
+    def __init__(self, max_entries=LEG_CACHE_MAX_ENTRIES, ttl_s=LEG_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evicted": 0}
+
+    def _key(self, kind, mode, origin, destination):
+        bucket = int(time.time() // LEG_CACHE_TRANSIT_BUCKET_S) if mode == "transit" else None
+        return kind, mode, bucket, quantize(origin), quantize(destination)
+
+    def get(self, kind, mode, origin, destination):
+        key = self._key(kind, mode, origin, destination)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, kind, mode, origin, destination, value):
+        key = self._key(kind, mode, origin, destination)
+        expires_at = time.time() + self.ttl_s.get(mode, min(self.ttl_s.values()))
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Shared process-wide cache instance
+leg_cache = LegCache()
@@ -0,0 +1,78 @@
+# server/services/logs.py
+"""
+Logging setup: one stderr handler, JSON or plain text lines, gated by
+LOG_LEVEL. Records below WARNING are sampled at LOG_SAMPLE_RATE so debug
+output from hot paths can stay on under load; warnings and errors are always
+kept. Structured fields go in `extra=`, e.g.
+logger.info("search done", extra={"places": 12}).
+"""
+import json
+import logging
+import random
+import sys
+import time
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_SAMPLE_RATE
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def _extra_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = (f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} "
+                f"{record.name}: {record.getMessage()}")
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every WARNING and above, and a `rate` fraction of everything else."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT, sample_rate=LOG_SAMPLE_RATE):
+    """Install the handler on the "localloop" logger tree (idempotent)."""
+    root = logging.getLogger("localloop")
+    root.setLevel(level.upper())
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler.addFilter(SamplingFilter(sample_rate))
+    root.addHandler(handler)
+    return root
+
+
+def get_logger(name):
+    """Logger under the "localloop" tree, e.g. get_logger("places")."""
+    return logging.getLogger(f"localloop.{name}")
@@ -0,0 +1,167 @@
+# server/services/metrics.py
+"""
+Minimal Prometheus instrumentation: counters, gauges and histograms with
+labels, rendered in the text exposition format by GET /metrics. Gauges that
+mirror cache and session stats are refreshed when /metrics is scraped.
+"""
+import bisect
+import math
+import threading
+
+# Upstream calls take tens of ms to seconds; chat turns up to several seconds
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS_S):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # per-bucket (non-cumulative) counts, plus +Inf, sum and count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _render_samples(self, items):
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS_S):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def on_collect(self, fn):
+        """Register `fn()` to refresh gauges right before each scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+UPSTREAM_LATENCY = registry.histogram(
+    "localloop_upstream_request_seconds", "Google API request latency", ["api"])
+UPSTREAM_ERRORS = registry.counter(
+    "localloop_upstream_errors_total", "Failed Google API calls", ["api", "status"])
+UPSTREAM_RETRIES = registry.counter(
+    "localloop_upstream_retries_total", "Google API calls retried after backoff", ["api", "reason"])
+UPSTREAM_QUEUE_DEPTH = registry.gauge(
+    "localloop_upstream_queue_depth", "Calls waiting for a rate-limit token", ["api", "priority"])
+UPSTREAM_QUEUE_WAIT = registry.histogram(
+    "localloop_upstream_queue_wait_seconds", "Time spent waiting for a rate-limit token", ["api", "priority"])
+CHAT_STEP_LATENCY = registry.histogram(
+    "localloop_chat_step_seconds", "Latency of /chat turns by conversation step", ["step"])
+HTTP_LATENCY = registry.histogram(
+    "localloop_http_request_seconds", "HTTP request latency by route", ["method", "route", "status"])
+CACHE_HIT_RATIO = registry.gauge(
+    "localloop_cache_hit_ratio", "Hit ratio since start per cache", ["cache"])
+CACHE_ENTRIES = registry.gauge(
+    "localloop_cache_entries", "Entries held per cache", ["cache"])
+ACTIVE_SESSIONS = registry.gauge(
+    "localloop_active_sessions", "Sessions in the session store")
@@ -0,0 +1,137 @@
+# server/services/multiday.py
+import asyncio
+import math
+from datetime import datetime
+
+import numpy as np
+
+from config import MULTIDAY_KMEANS_ITERATIONS
+from services.itinerary_service import generate_itinerary_async
+from services.opening_hours import google_weekday
+from services.ranking import EARTH_RADIUS_KM
+
+
+def _project_km(lat, lng, lats, lngs):
+    """Equirectangular x/y in km around the hotel; accurate enough at city scale."""
+    x = np.radians(lngs - lng) * math.cos(math.radians(lat)) * EARTH_RADIUS_KM
+    y = np.radians(lats - lat) * EARTH_RADIUS_KM
+    return np.column_stack([x, y])
+
+
+def _init_centers(xy, k, rng):
+    """k-means++ seeding."""
+    centers = [xy[rng.integers(len(xy))]]
+    for _ in range(1, k):
+        d2 = np.min(((xy[:, None, :] - np.array(centers)[None, :, :]) ** 2).sum(axis=2), axis=1)
+        total = d2.sum()
+        idx = rng.choice(len(xy), p=d2 / total) if total > 0 else rng.integers(len(xy))
+        centers.append(xy[idx])
+    return np.array(centers)
+
+
+def _assign(dist, capacity):
+    """
+    Capacity-constrained assignment: points with the most to lose from not
+    getting their nearest center (largest regret) choose first, each taking its
+    nearest center that still has room.
+    """
+    n, k = dist.shape
+    order_by_center = np.argsort(dist, axis=1)
+    if k > 1:
+        sorted_d = np.take_along_axis(dist, order_by_center, axis=1)
+        regret = sorted_d[:, 1] - sorted_d[:, 0]
+    else:
+        regret = np.zeros(n)
+    labels = np.empty(n, dtype=np.int64)
+    room = np.full(k, capacity)
+    for i in np.argsort(-regret, kind="stable"):
+        for c in order_by_center[i]:
+            if room[c]:
+                labels[i] = c
+                room[c] -= 1
+                break
+    return labels
+
+
+def cluster_places(places, lat, lng, days, capacity=None, iterations=MULTIDAY_KMEANS_ITERATIONS, seed=0):
+    """
+    Split places into `days` spatial groups of at most `capacity` places each
+    (default: an even split) with capacity-constrained k-means on projected
+    lat/lng. Returns (groups, iterations_run); groups are lists of places,
+    largest first, and empty groups are dropped.
+    """
+    if not places:
+        return [], 0
+    k = max(1, min(days, len(places)))
+    capacity = max(capacity or 0, math.ceil(len(places) / k))
+    xy = _project_km(lat, lng,
+                     np.array([p.latitude for p in places], dtype=float),
+                     np.array([p.longitude for p in places], dtype=float))
+
+    rng = np.random.default_rng(seed)
+    centers = _init_centers(xy, k, rng)
+    labels = None
+    run = 0
+    for run in range(1, iterations + 1):
+        dist = np.sqrt(((xy[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2))
+        new_labels = _assign(dist, capacity)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for c in range(k):
+            members = xy[labels == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+
+    groups = [[places[i] for i in np.flatnonzero(labels == c)] for c in range(k)]
+    return sorted((g for g in groups if g), key=len, reverse=True), run
+
+
+async def plan_multiday_async(lat, lng, places, days, mode="walking", stops_per_day=None,
+                              start_time=None, start_day=None):
+    """
+    Multi-day itinerary: the candidates in `places` ({"restaurant_places",
+    "attraction_places"}) are clustered into day-sized groups, and each group is
+    routed as its own hotel-to-hotel loop. Days are routed concurrently, their
+    tours solved in worker threads, so the work grows with the number of days
+    rather than the square of the stop count and the event loop keeps serving.
+    Day d (0-based) starts on weekday start_day + d for opening-hours checks.
+    """
+    restaurant_ids = {id(p) for p in places.get("restaurant_places", [])}
+    candidates = places.get("restaurant_places", []) + places.get("attraction_places", [])
+    if not candidates:
+        return {"error": "No places to generate an itinerary"}
+
+    groups, iterations = await asyncio.to_thread(cluster_places, candidates, lat, lng, days, capacity=stops_per_day)
+    if start_day is None and start_time is not None:
+        start_day = google_weekday(datetime.now())
+
+    def day_places(group):
+        return {
+            "restaurant_places": [p for p in group if id(p) in restaurant_ids],
+            "attraction_places": [p for p in group if id(p) not in restaurant_ids],
+        }
+
+    itineraries = await asyncio.gather(*(
+        generate_itinerary_async(lat, lng, day_places(group), mode=mode, start_time=start_time,
+                                 start_day=None if start_day is None else (start_day + d) % 7)
+        for d, group in enumerate(groups)
+    ))
+
+    day_plans = []
+    for d, itinerary in enumerate(itineraries):
+        plan = {"day": d + 1, "stops": len(groups[d]), "itinerary": itinerary}
+        if start_day is not None:
+            plan["weekday"] = (start_day + d) % 7
+        day_plans.append(plan)
+    routed = [it for it in itineraries if "legs" in it]
+    return {
+        "days": day_plans,
+        "summary": {
+            "days": len(day_plans),
+            "stops": sum(len(g) for g in groups),
+            "distance_m": sum(leg["distance_m"] for it in routed for leg in it["legs"]),
+            "duration_s": sum(leg["duration_s"] for it in routed for leg in it["legs"]),
+        },
+        "clustering": {"method": "capacity-kmeans", "iterations": iterations},
+    }
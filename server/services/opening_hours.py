@@ -0,0 +1,85 @@
+# server/services/opening_hours.py
+import numpy as np
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+
+def google_weekday(dt):
+    """Google day numbering: 0=Sunday, 1=Monday, ..."""
+    return (dt.weekday() + 1) % 7
+
+
+def week_minute(day, t):
+    """Minute of the week (Sunday 00:00 = 0) for a Google weekday and a time."""
+    return day * MINUTES_PER_DAY + t.hour * 60 + t.minute
+
+
+def compile_hours(regular_opening_hours):
+    """
+    Compile Places `regularOpeningHours` into sorted, merged [start, end)
+    week-minute intervals. Overnight periods and periods wrapping past Saturday
+    are split; a period without a close time means open 24/7.
+    Returns None when the place has no hours data.
+    """
+    periods = (regular_opening_hours or {}).get('periods')
+    if not periods:
+        return None
+
+    intervals = []
+    for period in periods:
+        open_info = period.get('open', {})
+        close_info = period.get('close')
+        start = open_info.get('day', 0) * MINUTES_PER_DAY + open_info.get('hour', 0) * 60 + open_info.get('minute', 0)
+        if not close_info:
+            return [[0, MINUTES_PER_WEEK]]
+        end = close_info.get('day', 0) * MINUTES_PER_DAY + close_info.get('hour', 0) * 60 + close_info.get('minute', 0)
+        if end <= start:
+            # Closes after the week wraps (e.g. Saturday 18:00 -> Sunday 02:00)
+            intervals.append([start, MINUTES_PER_WEEK])
+            if end > 0:
+                intervals.append([0, end])
+        else:
+            intervals.append([start, end])
+
+    intervals.sort()
+    merged = [intervals[0]]
+    for start, end in intervals[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _interval_array(hours_list):
+    """Stack per-place intervals into an (N, K, 2) array padded with empty intervals."""
+    k = max((len(h) for h in hours_list if h), default=1)
+    arr = np.zeros((len(hours_list), k, 2), dtype=np.int32)
+    for i, hours in enumerate(hours_list):
+        if hours:
+            arr[i, :len(hours)] = hours
+    return arr
+
+
+def open_mask(hours_list, minutes):
+    """
+    Vectorized "is open" check. `hours_list` holds compiled intervals per place
+    (None = unknown, treated as closed); `minutes` is one week-minute for all
+    places or an array with one week-minute per place.
+    """
+    if not hours_list:
+        return np.zeros(0, dtype=bool)
+    arr = _interval_array(hours_list)
+    t = np.broadcast_to(np.asarray(minutes, dtype=np.int64) % MINUTES_PER_WEEK, (len(hours_list),))[:, None]
+    return ((arr[:, :, 0] <= t) & (t < arr[:, :, 1])).any(axis=1)
+
+
+def arrival_minutes(start_minute, leg_durations_s, dwell_minutes):
+    """
+    Week-minute of arrival at each stop: the start time plus cumulative leg
+    durations plus the time spent at each earlier stop.
+    """
+    travel = np.cumsum(np.asarray(leg_durations_s, dtype=np.int64)) // 60
+    dwell = np.arange(len(travel), dtype=np.int64) * dwell_minutes
+    return (start_minute + travel + dwell) % MINUTES_PER_WEEK
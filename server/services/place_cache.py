@@ -0,0 +1,385 @@
+# server/services/place_cache.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from config import PLACE_CACHE_MAX_TILES, PLACE_CACHE_TTL_S, PLACE_TILE_MAX_RADIUS_M
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371000.0
+
+# (max search radius in meters, geohash precision). Each radius bucket gets
+# tiles somewhat smaller than the search circle, so a search touches ~4-25
+# tiles and one overlapping earlier searches only fetches the tiles it lacks.
+# Precision 7 cells are ~153 x 153 m, precision 6 ~1.2 x 0.6 km, 5 ~4.9 x 4.9 km.
+RADIUS_BUCKETS = [(300, 7), (2400, 6), (19000, 5)]
+MIN_PRECISION = 4
+# Query circles remembered per partly covered tile; older ones are dropped
+TILE_MAX_COVERAGES = 4
+
+
+def geohash_encode(lat, lng, precision):
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash):
+    """(lat_min, lat_max, lng_min, lng_max) of a geohash cell."""
+    lat_lo, lat_hi, lng_lo, lng_hi = -90.0, 90.0, -180.0, 180.0
+    even = True
+    for c in geohash:
+        cd = _BASE32.index(c)
+        for mask in (16, 8, 4, 2, 1):
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if cd & mask:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if cd & mask:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def precision_for_radius(radius):
+    for max_radius, precision in RADIUS_BUCKETS:
+        if radius <= max_radius:
+            return precision
+    return MIN_PRECISION
+
+
+def covering_tiles(lat, lng, radius, precision):
+    """Geohash cells of `precision` that intersect the circle."""
+    lat_lo, lat_hi, lng_lo, lng_hi = geohash_bounds(geohash_encode(lat, lng, precision))
+    cell_h, cell_w = lat_hi - lat_lo, lng_hi - lng_lo
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+
+    tiles = []
+    # Walk the cell centers over the circle's bounding box
+    n_up, n_down = math.ceil((lat + dlat - lat_hi) / cell_h), math.ceil((lat_lo - (lat - dlat)) / cell_h)
+    n_right, n_left = math.ceil((lng + dlng - lng_hi) / cell_w), math.ceil((lng_lo - (lng - dlng)) / cell_w)
+    for i in range(-max(n_down, 0), max(n_up, 0) + 1):
+        c_lat = (lat_lo + lat_hi) / 2 + i * cell_h
+        if not -90 < c_lat < 90:
+            continue
+        for j in range(-max(n_left, 0), max(n_right, 0) + 1):
+            c_lng = (lng_lo + lng_hi) / 2 + j * cell_w
+            c_lng = (c_lng + 180) % 360 - 180
+            cell = (c_lat - cell_h / 2, c_lat + cell_h / 2, c_lng - cell_w / 2, c_lng + cell_w / 2)
+            if bounds_intersect_circle(cell, lat, lng, radius):
+                tiles.append(geohash_encode(c_lat, c_lng, precision))
+    return tiles
+
+
+def circle_contains_bounds(circle, bounds):
+    """Whether a (lat, lng, radius) circle holds a whole (lat_min, lat_max, lng_min, lng_max) box."""
+    lat, lng, radius = circle
+    lat_lo, lat_hi, lng_lo, lng_hi = bounds
+    return all(haversine_m(lat, lng, la, ln) <= radius for la in (lat_lo, lat_hi) for ln in (lng_lo, lng_hi))
+
+
+def circle_contains_circle(outer, inner):
+    """Whether the (lat, lng, radius) circle `outer` holds all of `inner`."""
+    return haversine_m(outer[0], outer[1], inner[0], inner[1]) + inner[2] <= outer[2]
+
+
+def intersect_bounds(a, b):
+    """Overlap of two (lat_min, lat_max, lng_min, lng_max) boxes; None when they don't meet."""
+    lat_lo, lat_hi = max(a[0], b[0]), min(a[1], b[1])
+    lng_lo, lng_hi = max(a[2], b[2]), min(a[3], b[3])
+    if lat_lo > lat_hi or lng_lo > lng_hi:
+        return None
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+# Rim points per circle when outlining the part of a box inside a circle
+RIM_SAMPLES = 72
+
+
+def clip_outline(bounds, circle):
+    """
+    Outline of the part of a (lat_min, lat_max, lng_min, lng_max) box inside
+    the (lat, lng, radius) circle, as (lat, lng) points: the box corners inside
+    the circle, the points where the box edges cross its rim and the rim in
+    between, worked out on a local flat projection. Between two rim points
+    the shape bulges past the outline by at most `bulge` meters.
+    Returns (points, bulge); no points when the two don't meet.
+    """
+    lat, lng, radius = circle
+    m_lat = EARTH_RADIUS_M * math.pi / 180
+    m_lng = m_lat * math.cos(math.radians(lat))
+    x_lo, x_hi = (bounds[2] - lng) * m_lng, (bounds[3] - lng) * m_lng
+    y_lo, y_hi = (bounds[0] - lat) * m_lat, (bounds[1] - lat) * m_lat
+
+    points = [(x, y) for x in (x_lo, x_hi) for y in (y_lo, y_hi) if math.hypot(x, y) <= radius]
+    for edge, vertical in ((x_lo, True), (x_hi, True), (y_lo, False), (y_hi, False)):
+        if abs(edge) > radius:
+            continue
+        half = math.sqrt(radius ** 2 - edge ** 2)
+        for along in (-half, half):
+            x, y = (edge, along) if vertical else (along, edge)
+            if x_lo <= x <= x_hi and y_lo <= y <= y_hi:
+                points.append((x, y))
+    for i in range(RIM_SAMPLES):
+        a = 2 * math.pi * i / RIM_SAMPLES
+        x, y = radius * math.cos(a), radius * math.sin(a)
+        if x_lo <= x <= x_hi and y_lo <= y <= y_hi:
+            points.append((x, y))
+    bulge = radius * (1 - math.cos(math.pi / RIM_SAMPLES))
+    return [(lat + y / m_lat, lng + x / m_lng) for x, y in points], bulge
+
+
+def region_query_circle(bounds, circle):
+    """A circle covering the part of a (lat_min, lat_max, lng_min, lng_max) box inside the circle."""
+    points, bulge = clip_outline(bounds, circle)
+    if not points:
+        return bounds_query_circle(bounds)
+    c_lat = (min(p[0] for p in points) + max(p[0] for p in points)) / 2
+    c_lng = (min(p[1] for p in points) + max(p[1] for p in points)) / 2
+    reach = max(haversine_m(c_lat, c_lng, la, ln) for la, ln in points) + bulge + 1
+    return c_lat, c_lng, min(math.ceil(reach), PLACE_TILE_MAX_RADIUS_M)
+
+
+def circle_contains_clip(outer, bounds, circle):
+    """Whether the (lat, lng, radius) circle `outer` holds all of the box's part inside `circle`."""
+    points, bulge = clip_outline(bounds, circle)
+    return all(haversine_m(outer[0], outer[1], la, ln) + bulge <= outer[2] for la, ln in points)
+
+
+def union_bounds(boxes):
+    """Smallest (lat_min, lat_max, lng_min, lng_max) box holding all `boxes`."""
+    return (min(b[0] for b in boxes), max(b[1] for b in boxes),
+            min(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def bounds_intersect_circle(bounds, lat, lng, radius):
+    """Whether a (lat_min, lat_max, lng_min, lng_max) box reaches into the circle."""
+    lat_lo, lat_hi, lng_lo, lng_hi = bounds
+    # Closest point of the box to the circle center
+    near_lat = min(max(lat, lat_lo), lat_hi)
+    near_lng = min(max(lng, lng_lo), lng_hi)
+    return haversine_m(lat, lng, near_lat, near_lng) <= radius
+
+
+def circle_bounds(lat, lng, radius):
+    """The (lat_min, lat_max, lng_min, lng_max) bounding box of a circle."""
+    dlat = math.degrees(radius / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
+
+
+def bounds_query_circle(bounds):
+    """Center and radius of the smallest circle covering a (lat_min, lat_max, lng_min, lng_max) box."""
+    lat_lo, lat_hi, lng_lo, lng_hi = bounds
+    c_lat, c_lng = (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+    radius = max(haversine_m(c_lat, c_lng, la, ln) for la in (lat_lo, lat_hi) for ln in (lng_lo, lng_hi))
+    return c_lat, c_lng, min(math.ceil(radius), PLACE_TILE_MAX_RADIUS_M)
+
+
+def split_bounds(bounds):
+    """The four quadrants of a box. Their covering circles overlap, so together they cover the box."""
+    lat_lo, lat_hi, lng_lo, lng_hi = bounds
+    lat_mid, lng_mid = (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+    return [(la_lo, la_hi, ln_lo, ln_hi)
+            for la_lo, la_hi in ((lat_lo, lat_mid), (lat_mid, lat_hi))
+            for ln_lo, ln_hi in ((lng_lo, lng_mid), (lng_mid, lng_hi))]
+
+
+def clip_to_circle(places, lat, lng, radius):
+    """Dedupe raw searchNearby places by id and keep only those inside the circle."""
+    seen = set()
+    clipped = []
+    for place in places:
+        pid = place.get('id')
+        if pid in seen:
+            continue
+        seen.add(pid)
+        loc = place.get('location', {})
+        if haversine_m(lat, lng, loc.get('latitude', 0), loc.get('longitude', 0)) <= radius:
+            clipped.append(place)
+    return clipped
+
+
+class PlaceTileCache:
+    """
+    Size-bounded LRU of raw searchNearby places, keyed by
+    (geohash tile, place-type set, radius bucket, with opening hours).
+
+    Tiles are only stored from queries that came back below the result
+    maximum, i.e. returned every place in their circle. A tile entry holds the
+    places of such queries inside the tile, plus the query circles they came
+    from; it answers a later search when one of those circles holds the part
+    of the tile the search reaches (or the whole tile). Searches whose queries
+    came back full are kept whole, keyed by their exact circle, so repeating
+    one needs no upstream call either.
+    """
+
+    def __init__(self, max_tiles=PLACE_CACHE_MAX_TILES, ttl_s=PLACE_CACHE_TTL_S):
+        self.max_tiles = max_tiles
+        self.ttl_s = ttl_s
+        # tile key -> (expires_at, places, covering query circles or None for the whole tile);
+        # circle key -> (expires_at, places)
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"tile_hits": 0, "tile_misses": 0, "full_hits": 0, "partial_hits": 0, "lookups": 0,
+                          "evicted": 0, "fetch_calls": 0, "subdivisions": 0, "budget_exhausted": 0}
+
+    @staticmethod
+    def _key(tile, included_types, with_hours):
+        return tile, tuple(sorted(set(included_types or []))), len(tile), with_hours
+
+    @staticmethod
+    def _circle_key(lat, lng, radius, included_types, with_hours):
+        return "circle", round(lat, 5), round(lng, 5), round(radius), tuple(sorted(set(included_types or []))), with_hours
+
+    def _get(self, key, now):
+        entry = self._tiles.get(key)
+        if entry is None or entry[0] <= now:
+            return None
+        self._tiles.move_to_end(key)
+        return entry
+
+    def _put(self, key, entry):
+        self._tiles[key] = entry
+        self._tiles.move_to_end(key)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+            self._counters["evicted"] += 1
+
+    @staticmethod
+    def _covers(coverage, tile, circle):
+        """Whether a tile entry holds every place of the tile inside the search circle."""
+        if coverage is None:
+            return True
+        return any(circle_contains_circle(q, circle) or circle_contains_clip(q, geohash_bounds(tile), circle)
+                   for q in coverage)
+
+    def lookup(self, lat, lng, radius, included_types, with_hours=False):
+        """
+        Split a search into cached places and the tiles that still need fetching.
+        Returns (cached_places, missing_tiles).
+        """
+        circle = (lat, lng, radius)
+        # Entries fetched with opening hours also satisfy requests without them
+        hours_options = (with_hours,) if with_hours else (False, True)
+        now = time.time()
+        with self._lock:
+            self._counters["lookups"] += 1
+            for hours in hours_options:
+                entry = self._get(self._circle_key(lat, lng, radius, included_types, hours), now)
+                if entry is not None:
+                    self._counters["full_hits"] += 1
+                    return list(entry[1]), []
+
+            tiles = covering_tiles(lat, lng, radius, precision_for_radius(radius))
+            cached, missing = [], []
+            for tile in tiles:
+                for hours in hours_options:
+                    entry = self._get(self._key(tile, included_types, hours), now)
+                    if entry is not None and self._covers(entry[2], tile, circle):
+                        cached.extend(entry[1])
+                        break
+                else:
+                    missing.append(tile)
+            self._counters["tile_hits"] += len(tiles) - len(missing)
+            self._counters["tile_misses"] += len(missing)
+            if not missing:
+                self._counters["full_hits"] += 1
+            elif len(missing) < len(tiles):
+                self._counters["partial_hits"] += 1
+        return cached, missing
+
+    def store(self, query_circle, precision, included_types, with_hours, places):
+        """
+        Cache the places of a query that returned everything inside
+        `query_circle`, on every tile of `precision` the circle reaches.
+        """
+        by_tile = {}
+        for place in places:
+            loc = place.get('location', {})
+            by_tile.setdefault(geohash_encode(loc.get('latitude', 0), loc.get('longitude', 0), precision), []).append(place)
+        now = time.time()
+        with self._lock:
+            for tile in covering_tiles(*query_circle, precision):
+                key = self._key(tile, included_types, with_hours)
+                whole = circle_contains_bounds(query_circle, geohash_bounds(tile))
+                entry = self._get(key, now)
+                if entry is None:
+                    self._put(key, (now + self.ttl_s, by_tile.get(tile, []), None if whole else (query_circle,)))
+                    continue
+                # Merge into the live entry; it keeps its expiry, so no place outlives the TTL
+                expires_at, cached, coverage = entry
+                merged = {p.get('id'): p for p in cached}
+                for place in by_tile.get(tile, []):
+                    merged.setdefault(place.get('id'), place)
+                if not whole and coverage is not None:
+                    coverage = (coverage + (query_circle,))[-TILE_MAX_COVERAGES:]
+                else:
+                    coverage = None
+                self._put(key, (expires_at, list(merged.values()), coverage))
+
+    def store_search(self, lat, lng, radius, included_types, with_hours, places):
+        """Cache all places found for a search circle, for repeats of exactly that search."""
+        with self._lock:
+            self._put(self._circle_key(lat, lng, radius, included_types, with_hours), (time.time() + self.ttl_s, places))
+
+    def record_fetch(self, calls, subdivisions, budget_exhausted):
+        """Count the upstream work behind one search's fetch."""
+        with self._lock:
+            self._counters["fetch_calls"] += calls
+            self._counters["subdivisions"] += subdivisions
+            self._counters["budget_exhausted"] += bool(budget_exhausted)
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._tiles)
+        # Only searches answered without any upstream call count as hits
+        counters["hit_ratio"] = round(counters["full_hits"] / counters["lookups"], 4) if counters["lookups"] else 0.0
+        return counters
+
+
+# Shared process-wide cache instance
+place_cache = PlaceTileCache()
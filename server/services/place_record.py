@@ -0,0 +1,112 @@
+# server/services/place_record.py
+"""
+Compact in-memory record for a candidate place. Search results, ranked pools,
+prefetched results and session candidate lists hold Place objects instead of
+dicts: a slotted instance has no per-object __dict__ or repeated key strings,
+and the `types` tuples and `open_intervals` are shared between places that
+have the same ones. Places become dicts again only at the response boundary
+(to_dict) and when a session is serialized.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+# Distinct type lists and opening-hours shapes are few (a few hundred in a
+# city); past this many new ones are kept unshared rather than growing the table.
+SHARED_VALUES_MAX = 20000
+
+_shared = {}
+
+
+def _share(value):
+    if len(_shared) >= SHARED_VALUES_MAX:
+        return _shared.get(value, value)
+    return _shared.setdefault(value, value)
+
+
+def intern_types(types):
+    """Canonical tuple of interned type strings, shared by every place with the same types."""
+    return _share(tuple(sys.intern(t) for t in types))
+
+
+def intern_intervals(intervals):
+    """Canonical tuple of (start, end) week-minute intervals; None stays None (hours unknown)."""
+    if intervals is None:
+        return None
+    return _share(tuple((int(start), int(end)) for start, end in intervals))
+
+
+@dataclass(slots=True)
+class Place:
+    # Field order is the order of the keys in to_dict()
+    name: str
+    address: str
+    latitude: float
+    longitude: float
+    rating: float
+    types: Tuple[str, ...]
+    place_id: str
+    open_intervals: Optional[Tuple[Tuple[int, int], ...]] = None
+    keyword_score: Optional[int] = None   # set by KeywordMatcher.rank
+    distance_km: Optional[float] = None   # set by rank_places
+
+    @classmethod
+    def from_search(cls, place):
+        """From a raw searchNearby place (with `openIntervals` compiled, if any)."""
+        location = place.get('location', {})
+        return cls(
+            name=place.get('displayName', {}).get('text', ''),
+            address=place.get('formattedAddress', ''),
+            latitude=location.get('latitude', 0),
+            longitude=location.get('longitude', 0),
+            rating=place.get('rating', 0),
+            types=intern_types(place.get('types', [])),
+            place_id=place.get('id', ''),
+            open_intervals=intern_intervals(place.get('openIntervals')),
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict, e.g. for a session read back from SQLite."""
+        return cls(
+            name=data.get('name', ''),
+            address=data.get('address', ''),
+            latitude=data.get('latitude', 0),
+            longitude=data.get('longitude', 0),
+            rating=data.get('rating', 0),
+            types=intern_types(data.get('types', [])),
+            place_id=data.get('place_id', ''),
+            open_intervals=intern_intervals(data.get('open_intervals')),
+            keyword_score=data.get('keyword_score'),
+            distance_km=data.get('distance_km'),
+        )
+
+    def to_dict(self):
+        """JSON-ready dict; unknown opening hours and the ranking annotations are left out when unset."""
+        data = {
+            'name': self.name,
+            'address': self.address,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'rating': self.rating,
+            'types': list(self.types),
+            'place_id': self.place_id,
+        }
+        # None means the hours are unknown; an empty list means never open
+        if self.open_intervals is not None:
+            data['open_intervals'] = [list(i) for i in self.open_intervals]
+        if self.keyword_score is not None:
+            data['keyword_score'] = self.keyword_score
+        if self.distance_km is not None:
+            data['distance_km'] = self.distance_km
+        return data
+
+
+def places_to_dicts(places):
+    """A {"restaurant_places": [...], ...} result with its places as dicts, for responses."""
+    return {key: [p.to_dict() for p in pool] for key, pool in places.items()}
+
+
+def places_from_dicts(places):
+    """Inverse of places_to_dicts."""
+    return {key: [Place.from_dict(p) for p in pool] for key, pool in places.items()}
@@ -1,30 +1,55 @@
-import os
-import googlemaps
-import requests
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from datetime import datetime
-from dotenv import load_dotenv
+import math
 import re
+import unicodedata
+from config import (
+    PLACES_QUERY_TIMEOUT_S, PLACES_FANOUT_WORKERS, PLACE_TILE_RESULT_COUNT, PLACE_QUERY_COVER_RADIUS_M,
+    PLACE_SEARCH_MAX_CALLS, PLACES_BACKEND, HYBRID_DUPLICATE_RADIUS_M, SEARCH_MAX_RESULTS, CUISINE_SAMPLE_SIZE,
+)
+from services.google_client import call, call_async, PLACES_SEARCH_NEARBY_URL
+from services.cuisine_catalog import cuisine_catalog, count_types, cuisine_options
+from services.place_cache import (
+    place_cache, bounds_intersect_circle, bounds_query_circle, circle_bounds, clip_to_circle, geohash_bounds,
+    haversine_m, intersect_bounds, precision_for_radius, region_query_circle, split_bounds, union_bounds,
+)
+from services.keyword_matcher import KeywordMatcher
+from services.poi_index import poi_index
+from services.place_record import Place
+from services.opening_hours import compile_hours, open_mask, google_weekday, week_minute
+from services.logs import get_logger
 
-# Load environment variables
-load_dotenv()
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
+logger = get_logger("places")
 
-def get_place_details(lat, lng, included_types="", max_result_count=10, radius=3000):
-    """
-    Find list of places near a given location.
+# Fields every searchNearby call needs; opening hours are only requested when filtering by time
+BASE_FIELDS = ['displayName', 'rating', 'location', 'formattedAddress', 'types', 'id']
+HOURS_FIELDS = ['regularOpeningHours']
 
-    """
-    print(f"Calling Google Places API with types: {included_types}, radius: {radius}")
-    
-    place_details = requests.post(
-        'https://places.googleapis.com/v1/places:searchNearby',
-        headers={
+# Worker pool for the sync search path's concurrent queries
+_executor = ThreadPoolExecutor(max_workers=PLACES_FANOUT_WORKERS, thread_name_prefix="places")
+# Separate pool for the queries of one search, which are submitted from inside _executor tasks
+_tile_executor = ThreadPoolExecutor(max_workers=PLACES_FANOUT_WORKERS, thread_name_prefix="place-tiles")
+
+ATTRACTION_TYPES = [
+    "tourist_attraction", "museum", "park", "zoo", "amusement_park", "aquarium",
+    "art_gallery", "bowling_alley", "casino", "church", "city_hall", "courthouse",
+    "embassy", "hindu_temple", "library", "mosque", "night_club"
+]
+
+
+def _field_mask(with_hours=False):
+    fields = BASE_FIELDS + (HOURS_FIELDS if with_hours else [])
+    return ','.join(f'places.{f}' for f in fields)
+
+
+def _search_nearby_request(lat, lng, included_types, max_result_count, radius, with_hours):
+    return {
+        "headers": {
             'Content-Type': 'application/json',
-            'X-Goog-Api-Key': GOOGLE_MAPS_API_KEY,
-            'X-Goog-FieldMask': 'places.displayName,places.rating,places.location,places.formattedAddress,places.types,places.id,places.regularOpeningHours'
+            'X-Goog-FieldMask': _field_mask(with_hours)
         },
-        json={
+        "json": {
             "includedTypes": included_types,
             "maxResultCount": max_result_count,
             "locationRestriction": {
@@ -36,195 +61,402 @@ def get_place_details(lat, lng, included_types="", max_result_count=10, radius=3
                     "radius": radius
                 }
             }
-        })
-    
-    print(f"API response status: {place_details.status_code}")
-    
-    # Check if the request was successful
-    if place_details.status_code == 200:
-        response_data = place_details.json()
-        print(f"API response data keys: {response_data.keys()}")
-        if 'places' in response_data:
-            print(f"Found {len(response_data['places'])} places in API response")
-        return response_data
-    else:
-        print(f"Error: {place_details.status_code} - {place_details.text}")
-        return {"results": []}
-
-
-def search_nearby_places(lat, lng, place_types=None, keywords=None, radius=5000, min_rating=3.0, target_time=None):
+        }
+    }
+
+
+def _fetch_circle(query_circle, included_types, with_hours):
+    c_lat, c_lng, c_radius = query_circle
+    response_data = call("places", "POST", PLACES_SEARCH_NEARBY_URL,
+                         **_search_nearby_request(c_lat, c_lng, included_types, PLACE_TILE_RESULT_COUNT, c_radius, with_hours))
+    return _compile_hours(response_data.get('places', []))
+
+
+async def _fetch_circle_async(query_circle, included_types, with_hours):
+    c_lat, c_lng, c_radius = query_circle
+    response_data = await call_async("places", "POST", PLACES_SEARCH_NEARBY_URL,
+                                     **_search_nearby_request(c_lat, c_lng, included_types, PLACE_TILE_RESULT_COUNT, c_radius, with_hours))
+    return _compile_hours(response_data.get('places', []))
+
+
+def search_call_budget(radius):
     """
-    Search for nearby restaurants and attractions within a radius (meters).
-    Filters results by minimum rating.
+    Upstream calls one search may spend: a single call up to
+    PLACE_QUERY_COVER_RADIUS_M, plus whole four-quadrant splits for about one
+    call per cover-sized area of the circle beyond that.
+    """
+    if radius <= PLACE_QUERY_COVER_RADIUS_M:
+        return 1
+    area_ratio = (radius / PLACE_QUERY_COVER_RADIUS_M) ** 2
+    return min(PLACE_SEARCH_MAX_CALLS, 1 + 4 * math.ceil(area_ratio / 4))
+
+
+class _SearchFetch:
+    """
+    Adaptive fetch of the places a search lacks from the tile cache, run in
+    rounds. Only the box around the missing tiles (within the circle's box) is
+    queried; when that box is about as large as the search, the search circle
+    itself is, so a cold search gets at least what one direct call would. A
+    query that comes back full (PLACE_TILE_RESULT_COUNT places) likely holds
+    more than the upstream returned; when its circle is larger than one query
+    covers (PLACE_QUERY_COVER_RADIUS_M), its box is split into four
+    overlapping quadrant circles for the next round. Only quadrants reaching
+    into the search circle are queried, and no split goes over the call budget
+    (search_call_budget). A full partial query that is not split is followed
+    by a query of the whole search circle, since its best places need not be
+    the search's. Results are merged, deduped by place id.
+    """
+
+    def __init__(self, circle, missing_tiles, included_types, cached):
+        self.circle = circle
+        self.included_types = included_types
+        self.cached = cached
+        search_box = circle_bounds(*circle)
+        region = intersect_bounds(union_bounds([geohash_bounds(tile) for tile in missing_tiles]), search_box)
+        query_circle = region_query_circle(region, circle) if region is not None else circle
+        self.partial = query_circle[2] < circle[2]
+        if not self.partial:
+            region, query_circle = search_box, circle
+        self.budget = search_call_budget(query_circle[2])
+        self.calls = 0
+        self.subdivisions = 0
+        self.budget_exhausted = False
+        self.saturated = False
+        self.found = {}  # place id -> place
+        self.complete = []  # (query circle, places) of queries that returned everything in their circle
+        self.failed = 0
+        self.pending = [(region, query_circle)]
+
+    def next_round(self):
+        regions, self.pending = self.pending, []
+        self.calls += len(regions)
+        return regions
+
+    def add(self, region, query_circle, places):
+        for place in places:
+            self.found.setdefault(place.get('id'), place)
+        if len(places) < PLACE_TILE_RESULT_COUNT:
+            self.complete.append((query_circle, places))
+            return
+        if query_circle[2] > PLACE_QUERY_COVER_RADIUS_M:
+            quadrants = [q for q in split_bounds(region) if bounds_intersect_circle(q, *self.circle)]
+            if self.calls + len(self.pending) + len(quadrants) <= self.budget:
+                self.subdivisions += 1
+                self.pending.extend((quadrant, bounds_query_circle(quadrant)) for quadrant in quadrants)
+                return
+            self.budget_exhausted = True
+        self.saturated = True
+        if self.partial:
+            self.partial = False
+            self.pending.append((circle_bounds(*self.circle), self.circle))
+
+    def fail(self, query_circle, error):
+        logger.warning("place query failed: %r", error, extra={"types": self.included_types, "circle": query_circle})
+        self.failed += 1
+
+    def finish(self, with_hours):
+        """
+        Cache what the queries found and return (all places found, whether
+        every query succeeded). Complete queries go to the tiles they reach.
+        When some query came back full the search's places may be only the
+        best of more, so they are cached for repeats of this exact search
+        only; after a failed query nothing beyond the complete queries is.
+        """
+        place_cache.record_fetch(self.calls, self.subdivisions, self.budget_exhausted)
+        precision = precision_for_radius(self.circle[2])
+        for query_circle, places in self.complete:
+            place_cache.store(query_circle, precision, self.included_types, with_hours, places)
+        places = list(self.found.values())
+        if self.saturated and not self.failed:
+            place_cache.store_search(*self.circle, self.included_types, with_hours, self.cached + places)
+        logger.debug("places fetched", extra={"types": self.included_types, "calls": self.calls,
+                                              "subdivisions": self.subdivisions, "complete": len(self.complete),
+                                              "budget_exhausted": self.budget_exhausted})
+        return places, not self.failed
+
+
+def _fetch_search(circle, missing_tiles, included_types, with_hours, cached):
+    fetch = _SearchFetch(circle, missing_tiles, included_types, cached)
+    while fetch.pending:
+        regions = fetch.next_round()
+        futures = [_tile_executor.submit(_fetch_circle, query_circle, included_types, with_hours)
+                   for _, query_circle in regions]
+        for (region, query_circle), future in zip(regions, futures):
+            try:
+                fetch.add(region, query_circle, future.result())
+            except Exception as e:
+                fetch.fail(query_circle, e)
+    return fetch.finish(with_hours)
+
+
+async def _fetch_search_async(circle, missing_tiles, included_types, with_hours, cached):
+    fetch = _SearchFetch(circle, missing_tiles, included_types, cached)
+    while fetch.pending:
+        regions = fetch.next_round()
+        results = await asyncio.gather(*(_fetch_circle_async(query_circle, included_types, with_hours)
+                                         for _, query_circle in regions),
+                                       return_exceptions=True)
+        for (region, query_circle), result in zip(regions, results):
+            if isinstance(result, Exception):
+                fetch.fail(query_circle, result)
+            else:
+                fetch.add(region, query_circle, result)
+    return fetch.finish(with_hours)
+
+
+def _top_rated(places, max_result_count):
+    return sorted(places, key=lambda p: p.get('rating', 0), reverse=True)[:max_result_count]
+
+
+def _local_places(lat, lng, radius, included_types, max_result_count, with_hours):
+    """
+    Places from the offline POI index, per PLACES_BACKEND. Returns
+    (places, done); `done` means the search needs no Google calls.
+    """
+    if PLACES_BACKEND == "google":
+        return [], False
+    places = poi_index().search(lat, lng, radius, included_types, limit=max_result_count, with_hours=with_hours)
+    done = PLACES_BACKEND == "offline" or len(places) >= max_result_count
+    if not done:
+        logger.debug("topping up offline places", extra={"types": included_types, "local": len(places)})
+    return places, done
+
+
+def _name_key(place):
+    """Place name folded for matching across sources: no accents, case or punctuation."""
+    name = unicodedata.normalize('NFKD', place.get('displayName', {}).get('text', ''))
+    name = ''.join(c for c in name if not unicodedata.combining(c))
+    return re.sub(r'[\W_]+', '', name.casefold())
+
+
+def _merge_local(local, places):
+    """
+    Local index places topped up with Google ones. A local place that Google
+    also returned (same name key within HYBRID_DUPLICATE_RADIUS_M) is replaced
+    by the Google record, which has the real rating and opening hours.
+    """
+    if not local:
+        return places
+    by_name = {}
+    for place in places:
+        by_name.setdefault(_name_key(place), []).append(place.get('location', {}))
+    by_name.pop('', None)
+    kept = []
+    for place in local:
+        loc = place.get('location', {})
+        if not any(haversine_m(loc.get('latitude', 0), loc.get('longitude', 0),
+                               other.get('latitude', 0), other.get('longitude', 0)) <= HYBRID_DUPLICATE_RADIUS_M
+                   for other in by_name.get(_name_key(place), [])):
+            kept.append(place)
+    return kept + places
+
+
+def get_place_details(lat, lng, included_types="", max_result_count=10, radius=3000, with_hours=False):
+    """
+    Find list of places near a given location.
+    With an offline backend, answered from the local POI index (see
+    _local_places). Otherwise from the geohash tile cache; only the part of
+    the circle it lacks is queried, subdividing dense areas within the call
+    budget (see _SearchFetch).
+    At most `max_result_count` places are returned, best rated first; the
+    result is marked "degraded" when an upstream query failed, so places may
+    be missing. Opening hours are only part of the field mask when
+    `with_hours` is set.
+    """
+    local, done = _local_places(lat, lng, radius, included_types, max_result_count, with_hours)
+    if done:
+        return {"places": local}
+    places, missing = place_cache.lookup(lat, lng, radius, included_types, with_hours)
+    complete = True
+    if missing:
+        logger.debug("fetching places", extra={"types": included_types, "radius": radius, "missing_tiles": len(missing)})
+        fetched, complete = _fetch_search((lat, lng, radius), missing, included_types, with_hours, places)
+        places.extend(fetched)
+    places = _top_rated(clip_to_circle(_merge_local(local, places), lat, lng, radius), max_result_count)
+    logger.debug("places found", extra={"types": included_types, "count": len(places), "complete": complete})
+    return {"places": places} if complete else {"places": places, "degraded": True}
+
+
+async def get_place_details_async(lat, lng, included_types="", max_result_count=10, radius=3000, with_hours=False):
+    """
+    Async variant of get_place_details.
     """
-    print(f"Searching places at lat={lat}, lng={lng}, radius={radius}, min_rating={min_rating}")
-    print(f"Place types: {place_types}, Keywords: {keywords}")
-    
-    restaurant_places = []
-    attraction_places = []
+    local, done = _local_places(lat, lng, radius, included_types, max_result_count, with_hours)
+    if done:
+        return {"places": local}
+    places, missing = place_cache.lookup(lat, lng, radius, included_types, with_hours)
+    complete = True
+    if missing:
+        logger.debug("fetching places", extra={"types": included_types, "radius": radius, "missing_tiles": len(missing)})
+        fetched, complete = await _fetch_search_async((lat, lng, radius), missing, included_types, with_hours, places)
+        places.extend(fetched)
+    places = _top_rated(clip_to_circle(_merge_local(local, places), lat, lng, radius), max_result_count)
+    logger.debug("places found", extra={"types": included_types, "count": len(places), "complete": complete})
+    return {"places": places} if complete else {"places": places, "degraded": True}
 
+
+def _search_queries(place_types):
+    """
+    Independent searchNearby queries for a search, keyed by result category.
+    """
     # Determine restaurant types (use provided place_types or default to restaurant & cafe)
-    rest_types = place_types if place_types else ["restaurant", "cafe"]
-    print(f"Using restaurant types: {rest_types}")
-    
-    restaurant_results = get_place_details(lat, lng, included_types=rest_types, max_result_count=10, radius=radius)
-    print(f"Raw restaurant results: {len(restaurant_results.get('places', []))} places found")
-    
-    restaurant_places = _filter_places(restaurant_results.get('places', []), min_rating, target_time)
-    print(f"Filtered restaurant places: {len(restaurant_places)}")
+    queries = {"restaurant": place_types if place_types else ["restaurant", "cafe"]}
+    # If no custom place_types provided, fetch attractions
+    if not place_types:
+        queries["attraction"] = ATTRACTION_TYPES
+    return queries
+
+
+def search_nearby_places(lat, lng, place_types=None, keywords=None, radius=5000, min_rating=3.0, target_time=None, target_day=None, with_hours=False):
+    """
+    Search for nearby restaurants and attractions within a radius (meters).
+    Filters results by minimum rating and, with `target_time`, by opening hours
+    on `target_day` (Google weekday, 0=Sunday; default today). `with_hours`
+    fetches opening hours without filtering on them.
+    The restaurant and attraction queries run concurrently on a thread pool.
+    """
+    logger.debug("searching places", extra={"lat": lat, "lng": lng, "radius": radius, "min_rating": min_rating,
+                                            "types": place_types, "keywords": keywords})
+    queries = _search_queries(place_types)
+    with_hours = with_hours or target_time is not None
+
+    futures = {
+        _executor.submit(get_place_details, lat, lng, included_types=types, max_result_count=SEARCH_MAX_RESULTS,
+                         radius=radius, with_hours=with_hours): category
+        for category, types in queries.items()
+    }
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=PLACES_QUERY_TIMEOUT_S):
+            category = futures[future]
+            try:
+                results[category] = _filter_places(future.result().get('places', []), min_rating, target_time, target_day)
+            except Exception as e:
+                logger.warning("%s search failed: %r", category, e)
+    except FuturesTimeoutError:
+        logger.warning("search timed out", extra={"pending": [c for f, c in futures.items() if not f.done()]})
+
+    return _assemble(results, keywords)
+
+
+async def search_nearby_places_async(*args, **kwargs):
+    """
+    Async variant of search_nearby_places. Each query gets its own timeout, and a
+    failed or slow query only empties its own category.
+    """
+    places, _ = await search_nearby_places_checked_async(*args, **kwargs)
+    return places
+
+
+async def search_nearby_places_checked_async(lat, lng, place_types=None, keywords=None, radius=5000, min_rating=3.0, target_time=None, target_day=None, with_hours=False):
+    """
+    search_nearby_places_async, returning (places, complete). `complete` is
+    False when a query failed or timed out, or returned degraded results, so
+    the places are not fit for caching.
+    """
+    logger.debug("searching places", extra={"lat": lat, "lng": lng, "radius": radius, "min_rating": min_rating,
+                                            "types": place_types, "keywords": keywords})
+    queries = _search_queries(place_types)
+    with_hours = with_hours or target_time is not None
+
+    async def run(category, types):
+        try:
+            response = await asyncio.wait_for(
+                get_place_details_async(lat, lng, included_types=types, max_result_count=SEARCH_MAX_RESULTS,
+                                        radius=radius, with_hours=with_hours),
+                PLACES_QUERY_TIMEOUT_S)
+        except Exception as e:
+            logger.warning("%s search failed: %r", category, e)
+            return category, [], False
+        filtered = _filter_places(response.get('places', []), min_rating, target_time, target_day)
+        return category, filtered, not response.get('degraded')
+
+    # gather cancels the queries with the search, e.g. when a prefetch is discarded
+    done = await asyncio.gather(*(run(c, t) for c, t in queries.items()))
+    results = {category: filtered for category, filtered, _ in done}
+
+    return _assemble(results, keywords), all(complete for _, _, complete in done)
+
+
+def _assemble(results, keywords):
+    """
+    Merge filtered per-category results into the restaurant/attraction dict returned to callers.
+    """
+    restaurant_places = results.get("restaurant", [])
+    attraction_places = results.get("attraction", [])
 
     # If keywords provided, filter restaurants by keywords in name or types
     if keywords:
-        print(f"Filtering by keywords: {keywords}")
-        filtered = []
-        for place in restaurant_places:
-            name = place.get('name', '').lower()
-            types = [t.lower() for t in place.get('types', [])]
-            # Print debug info for first few places
-            if len(filtered) < 3:
-                print(f"Place: {name}, Types: {types}")
-            
-            # Check if any keyword matches (more flexible matching)
-            match_found = False
-            for kw in keywords:
-                kw_lower = kw.lower()
-                # Check name contains keyword or keyword contains name parts
-                if (kw_lower in name or 
-                    any(kw_lower in t for t in types) or
-                    any(part in kw_lower for part in name.split() if len(part) > 2)):
-                    filtered.append(place)
-                    match_found = True
-                    break
-            
-            # If no keywords provided or it's a generic restaurant, include it
-            if not match_found and not keywords:
-                filtered.append(place)
-                
-        restaurant_places = filtered
-        print(f"After keyword filtering: {len(restaurant_places)} restaurants")
+        restaurant_places = _filter_by_keywords(restaurant_places, keywords)
 
-    # If no custom place_types provided, fetch attractions
-    if not place_types:
-        attraction_types = [
-            "tourist_attraction", "museum", "park", "zoo", "amusement_park", "aquarium",
-            "art_gallery", "bowling_alley", "casino", "church", "city_hall", "courthouse",
-            "embassy", "hindu_temple", "library", "mosque", "night_club"
-        ]
-        print(f"Fetching attractions with types: {attraction_types}")
-        attraction_results = get_place_details(lat, lng, included_types=attraction_types, max_result_count=10, radius=radius)
-        print(f"Raw attraction results: {len(attraction_results.get('places', []))} places found")
-        attraction_places = _filter_places(attraction_results.get('places', []), min_rating, target_time)
-        print(f"Filtered attraction places: {len(attraction_places)}")
-
-    print(f"Found {len(restaurant_places)} restaurants and {len(attraction_places)} attractions:")
+    logger.debug("search done", extra={"restaurants": len(restaurant_places), "attractions": len(attraction_places)})
     return {"restaurant_places": restaurant_places, "attraction_places": attraction_places}
 
 
+def apply_keywords(places, keywords):
+    """Keyword-filter the restaurants of a search result fetched without keywords."""
+    if not keywords:
+        return places
+    return {**places, "restaurant_places": _filter_by_keywords(places.get("restaurant_places", []), keywords)}
+
+
+def _filter_by_keywords(restaurant_places, keywords):
+    filtered = KeywordMatcher(restaurant_places).filter(keywords)
+    logger.debug("keyword filter", extra={"keywords": keywords, "before": len(restaurant_places), "after": len(filtered)})
+    return filtered
+
 
 def get_available_cuisines(lat, lng, radius=5000):
     """
-    Collect all unique restaurant types from the area as cuisine options.
-    """
-    # Fetch nearby restaurants
-    resp = gmaps.places_nearby(
-        location=(lat, lng),
-        radius=radius,
-        type="restaurant"
-    )
-    results = resp.get("results", [])
-    print(f"Found {len(results)} restaurants for cuisine detection")
-    
-    all_types = set()
-    
-    # Only filter out the most basic generic types
-    exclude_types = {
-        'establishment', 'point_of_interest', 'food', 'restaurant'
-    }
-    
-    for place in results:
-        name = place.get('name', '')
-        place_types = place.get('types', [])
-        
-        print(f"Restaurant: '{name}' -> Types: {place_types}")
-        
-        # Collect all types except the most generic ones
-        for place_type in place_types:
-            if place_type not in exclude_types:
-                all_types.add(place_type)
-    
-    print(f"All unique types found: {sorted(all_types)}")
-    
-    # Convert to readable format
-    cuisine_options = []
-    for place_type in sorted(all_types):
-        # Convert underscores to spaces and title case
-        readable = place_type.replace('_', ' ').title()
-        cuisine_options.append(readable)
-    
-    print(f"Final cuisine options: {cuisine_options}")
-    
-    # If no types found, provide fallback
-    if not cuisine_options:
-        cuisine_options = ['Any Restaurant']
-    
-    return cuisine_options
-
-def _filter_places(places, min_rating, target_time=None):
-    filtered = []
+    Collect restaurant types from the area as cuisine options, most common first.
+    Uses the per-area cuisine catalog when warm; otherwise counts types over the
+    same restaurant fetch step 4 makes, so step 4 finds it in the place cache.
+    """
+    counts = cuisine_catalog.get(lat, lng, radius)
+    if counts is None:
+        sample = get_place_details(lat, lng, included_types=_search_queries(None)["restaurant"],
+                                   max_result_count=CUISINE_SAMPLE_SIZE, radius=radius)
+        counts = count_types(sample.get('places', []))
+        if not sample.get('degraded'):
+            cuisine_catalog.put(lat, lng, radius, counts)
+    return cuisine_options(counts)
+
+
+async def get_available_cuisines_async(lat, lng, radius=5000):
+    """
+    Async variant of get_available_cuisines.
+    """
+    counts = cuisine_catalog.get(lat, lng, radius)
+    if counts is None:
+        sample = await get_place_details_async(lat, lng, included_types=_search_queries(None)["restaurant"],
+                                               max_result_count=CUISINE_SAMPLE_SIZE, radius=radius)
+        counts = count_types(sample.get('places', []))
+        if not sample.get('degraded'):
+            cuisine_catalog.put(lat, lng, radius, counts)
+    return cuisine_options(counts)
+
+
+def _compile_hours(places):
+    """Compile opening hours once, when places are fetched (see opening_hours.compile_hours)."""
     for place in places:
-        rating = place.get('rating', 0)
-        if rating >= min_rating:
-            # Check opening hours if target_time is provided
-            open_now = True
-            if target_time:
-                # Get opening hours from the new API format
-                opening_hours_info = place.get('regularOpeningHours', {})
-                periods = opening_hours_info.get('periods', [])
-                open_now = False  # Default to closed unless we find it open
-
-                # Get current day of week (Google uses 0=Sunday, 1=Monday, etc.)
-                current_weekday = (datetime.now().weekday() + 1) % 7  # Convert to Google's format
-
-                # Check if open at target_time
-                for period in periods:
-                    open_info = period.get('open', {})
-                    close_info = period.get('close', {})
-                    
-                    open_day = open_info.get('day')
-                    open_hour = open_info.get('hour', 0)
-                    open_minute = open_info.get('minute', 0)
-                    
-                    if close_info:  # Some places might be open 24/7
-                        close_hour = close_info.get('hour', 23)
-                        close_minute = close_info.get('minute', 59)
-                    else:
-                        close_hour = 23
-                        close_minute = 59
-
-                    if open_day == current_weekday:
-                        # Convert to minutes for easier comparison
-                        target_minutes = target_time.hour * 60 + target_time.minute
-                        open_minutes = open_hour * 60 + open_minute
-                        close_minutes = close_hour * 60 + close_minute
-                        
-                        # Handle case where closing time is next day (e.g., open until 2 AM)
-                        if close_minutes < open_minutes:
-                            if target_minutes >= open_minutes or target_minutes <= close_minutes:
-                                open_now = True
-                                break
-                        else:
-                            if open_minutes <= target_minutes <= close_minutes:
-                                open_now = True
-                                break
-
-            if open_now:
-                filtered.append({
-                    'name': place.get('displayName', {}).get('text', ''),
-                    'address': place.get('formattedAddress', ''),
-                    'latitude': place.get('location', {}).get('latitude', 0),
-                    'longitude': place.get('location', {}).get('longitude', 0),
-                    'rating': rating,
-                    'types': place.get('types', []),
-                    'place_id': place.get('id', '')
-                })
-    return filtered
\ No newline at end of file
+        if 'regularOpeningHours' in place:
+            place['openIntervals'] = compile_hours(place['regularOpeningHours'])
+    return places
+
+
+def _filter_places(places, min_rating, target_time=None, target_day=None):
+    """
+    Keep places rated at least `min_rating` and, when `target_time` is given,
+    open at that time on `target_day` (Google weekday, default today).
+    Returns the survivors as Place records.
+    """
+    candidates = [place for place in places if place.get('rating', 0) >= min_rating]
+
+    # Check opening hours for the whole candidate set at once
+    if target_time and candidates:
+        day = google_weekday(datetime.now()) if target_day is None else target_day
+        hours = [place.get('openIntervals') or compile_hours(place.get('regularOpeningHours')) for place in candidates]
+        is_open = open_mask(hours, week_minute(day, target_time))
+        candidates = [place for place, open_now in zip(candidates, is_open) if open_now]
+
+    return [Place.from_search(place) for place in candidates]
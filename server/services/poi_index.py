@@ -0,0 +1,242 @@
+# server/services/poi_index.py
+"""
+Offline POI index: a directory of column arrays (.npy) built by
+tools/build_poi_index.py and memory-mapped on load, so opening a city-sized
+extract costs page faults rather than parsing.
+
+Layout, rows sorted by grid cell:
+    meta.json                   version, count, cell size, type vocabulary, bounds
+    lat.npy, lng.npy            float64 coordinates
+    rating.npy                  float32, 0 when unknown
+    types.npy                   uint64 (count, words) bitsets over the type vocabulary
+    hours_offsets.npy           int32 (count + 1); a row's intervals are hours[off[i]:off[i+1]]
+    hours.npy                   int16 (m, 2) compiled week-minute [start, end) intervals
+    cell_keys.npy               int64 sorted keys of the non-empty grid cells
+    cell_starts.npy             int64 (cells + 1) first row of each cell
+    {id,name,address}.npy       uint8 UTF-8 blob, with {field}_offsets.npy int64 (count + 1)
+
+A radius query visits the grid cells under the circle's bounding box (one
+binary search per cell row, since a row's cells are contiguous keys), then
+filters the candidate rows by exact distance and type bitset in NumPy.
+"""
+import json
+import math
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from config import POI_INDEX_CELL_DEG, POI_INDEX_PATH
+
+FORMAT_VERSION = 1
+STRING_FIELDS = ("id", "name", "address")
+EARTH_RADIUS_M = 6371000.0
+
+
+def _cell_rows_cols(lat, lng, cell_deg):
+    return (np.floor((np.asarray(lat) + 90.0) / cell_deg).astype(np.int64),
+            np.floor((np.asarray(lng) + 180.0) / cell_deg).astype(np.int64))
+
+
+def _grid_cols(cell_deg):
+    return math.ceil(360.0 / cell_deg)
+
+
+def _haversine_m(lat, lng, lats, lngs):
+    p1, p2 = math.radians(lat), np.radians(lats)
+    dp, dl = p2 - p1, np.radians(lngs - lng)
+    a = np.sin(dp / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def _pack_strings(values):
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def write_index(records, path, cell_deg=POI_INDEX_CELL_DEG, source=None):
+    """
+    Write records ({"id", "name", "address", "lat", "lng", "rating", "types",
+    "hours"}, hours being compiled intervals or None) as an index directory.
+    The directory is built next to `path` and swapped in at the end.
+    """
+    vocab = sorted({t for r in records for t in r["types"]})
+    type_bit = {t: i for i, t in enumerate(vocab)}
+    words = max(1, math.ceil(len(vocab) / 64))
+
+    lats = np.array([r["lat"] for r in records], dtype=np.float64)
+    lngs = np.array([r["lng"] for r in records], dtype=np.float64)
+    rows, cols = _cell_rows_cols(lats, lngs, cell_deg)
+    keys = rows * _grid_cols(cell_deg) + cols
+    order = np.argsort(keys, kind="stable")
+    records = [records[i] for i in order]
+    keys = keys[order]
+
+    bitsets = [sum(1 << type_bit[t] for t in set(r["types"])) for r in records]
+    types = np.array([[b >> (64 * w) & 0xFFFFFFFFFFFFFFFF for w in range(words)] for b in bitsets],
+                     dtype=np.uint64).reshape(len(records), words)
+    hours_offsets = np.zeros(len(records) + 1, dtype=np.int32)
+    np.cumsum([len(r["hours"] or ()) for r in records], out=hours_offsets[1:])
+    intervals = [interval for r in records for interval in r["hours"] or ()]
+    cell_keys, cell_starts = np.unique(keys, return_index=True)
+
+    columns = {
+        "lat": lats[order],
+        "lng": lngs[order],
+        "rating": np.array([r["rating"] or 0 for r in records], dtype=np.float32),
+        "types": types,
+        "hours_offsets": hours_offsets,
+        "hours": np.array(intervals, dtype=np.int16).reshape(-1, 2),
+        "cell_keys": cell_keys.astype(np.int64),
+        "cell_starts": np.append(cell_starts, len(records)).astype(np.int64),
+    }
+    for field in STRING_FIELDS:
+        columns[field], columns[f"{field}_offsets"] = _pack_strings([r[field] or "" for r in records])
+    meta = {
+        "version": FORMAT_VERSION,
+        "count": len(records),
+        "cell_deg": cell_deg,
+        "types": vocab,
+        "bounds": [float(lats.min()), float(lats.max()), float(lngs.min()), float(lngs.max())] if records else None,
+        "built_at": int(time.time()),
+        "source": source,
+    }
+
+    tmp = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in columns.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), array)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return meta
+
+
+class PoiIndex:
+    """Read-only, memory-mapped POI index answering radius + type queries."""
+
+    def __init__(self, path):
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"No POI index at {path}; build one with tools/build_poi_index.py")
+        with open(meta_path) as f:
+            self.meta = json.load(f)
+        if self.meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"POI index at {path} has format {self.meta['version']}, expected {FORMAT_VERSION}")
+        self.path = path
+        self.cell_deg = self.meta["cell_deg"]
+        self._cols = _grid_cols(self.cell_deg)
+        self._type_bit = {t: i for i, t in enumerate(self.meta["types"])}
+        # Plain ndarray views over the maps: np.memmap indexing is several times slower per element
+        self._arrays = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r").view(np.ndarray)
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+        self._lock = threading.Lock()
+        self._counters = {"queries": 0, "candidates": 0, "matches": 0, "query_s": 0.0}
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def _type_mask(self, included_types):
+        """Bitset for the requested types, or None when any type matches."""
+        if not included_types:
+            return None
+        words = self._arrays["types"].shape[1]
+        mask = np.zeros(words, dtype=np.uint64)
+        for t in included_types:
+            bit = self._type_bit.get(t)
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def _candidate_rows(self, lat, lng, radius):
+        dlat = math.degrees(radius / EARTH_RADIUS_M)
+        dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        (r0, r1), (c0, c1) = (_cell_rows_cols([lat - dlat, lat + dlat], [lng - dlng, lng + dlng], self.cell_deg))
+        cell_keys, cell_starts = self._arrays["cell_keys"], self._arrays["cell_starts"]
+        ranges = []
+        for row in range(r0, r1 + 1):
+            lo, hi = np.searchsorted(cell_keys, [row * self._cols + c0, row * self._cols + c1 + 1])
+            if hi > lo:
+                ranges.append(np.arange(cell_starts[lo], cell_starts[hi]))
+        return np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+
+    def query(self, lat, lng, radius, included_types=None, limit=None):
+        """Row numbers of places within `radius` meters having any of the types, best rated first."""
+        started = time.perf_counter()
+        rows = self._candidate_rows(lat, lng, radius)
+        candidates = len(rows)
+        # Type test first: a bitwise AND is cheaper than the distance
+        mask = self._type_mask(included_types)
+        if mask is not None and len(rows):
+            rows = rows[(self._arrays["types"][rows] & mask).any(axis=1)]
+        if len(rows):
+            rows = rows[_haversine_m(lat, lng, self._arrays["lat"][rows], self._arrays["lng"][rows]) <= radius]
+        rows = rows[np.argsort(-self._arrays["rating"][rows], kind="stable")][:limit]
+        with self._lock:
+            self._counters["queries"] += 1
+            self._counters["candidates"] += candidates
+            self._counters["matches"] += len(rows)
+            self._counters["query_s"] += time.perf_counter() - started
+        return rows
+
+    def _string(self, field, row):
+        offsets = self._arrays[f"{field}_offsets"]
+        return self._arrays[field][offsets[row]:offsets[row + 1]].tobytes().decode("utf-8")
+
+    def _types(self, row):
+        bits = 0
+        for word, value in enumerate(self._arrays["types"][row].tolist()):
+            bits |= value << (64 * word)
+        return [t for i, t in enumerate(self.meta["types"]) if bits >> i & 1]
+
+    def _hours(self, row):
+        start, end = self._arrays["hours_offsets"][row:row + 2].tolist()
+        return self._arrays["hours"][start:end].tolist() if end > start else None
+
+    def place(self, row, with_hours=False):
+        """One row in the raw searchNearby place shape, with hours pre-compiled as `openIntervals`."""
+        place = {
+            "id": self._string("id", row),
+            "displayName": {"text": self._string("name", row)},
+            "formattedAddress": self._string("address", row),
+            "location": {"latitude": self._arrays["lat"][row].item(), "longitude": self._arrays["lng"][row].item()},
+            "rating": round(self._arrays["rating"][row].item(), 2),
+            "types": self._types(row),
+        }
+        if with_hours:
+            place["openIntervals"] = self._hours(row)
+        return place
+
+    def search(self, lat, lng, radius, included_types=None, limit=None, with_hours=False):
+        """Places within the circle having any of `included_types`, best rated first."""
+        return [self.place(row, with_hours) for row in self.query(lat, lng, radius, included_types, limit)]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        queries = counters.pop("query_s")
+        counters["avg_query_us"] = round(queries / counters["queries"] * 1e6, 1) if counters["queries"] else 0.0
+        counters.update(places=len(self), cells=len(self._arrays["cell_keys"]), built_at=self.meta["built_at"])
+        return counters
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def poi_index(path=POI_INDEX_PATH):
+    """Shared index, opened on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = PoiIndex(path)
+    return _index
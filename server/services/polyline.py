@@ -0,0 +1,97 @@
+# server/services/polyline.py
+"""
+Encoded polylines (Google's polyline algorithm, 5 decimal places) and
+Douglas-Peucker simplification in meters, for route geometry.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+# Web Mercator ground resolution at the equator, zoom 0, in meters per 256 px tile pixel
+METERS_PER_PIXEL_Z0 = 2 * math.pi * EARTH_RADIUS_M / 256
+
+
+def _encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def encode(points):
+    """[(lat, lng), ...] -> encoded polyline string."""
+    out, prev_lat, prev_lng = [], 0, 0
+    for lat, lng in points:
+        lat, lng = round(lat * 1e5), round(lng * 1e5)
+        out.append(_encode_value(lat - prev_lat))
+        out.append(_encode_value(lng - prev_lng))
+        prev_lat, prev_lng = lat, lng
+    return "".join(out)
+
+
+def decode(encoded):
+    """Encoded polyline string -> [(lat, lng), ...]."""
+    points, index, lat, lng = [], 0, 0, 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / 1e5, lng / 1e5))
+    return points
+
+
+def simplify(points, tolerance_m):
+    """
+    Douglas-Peucker: the subset of `points` (first and last always kept) such
+    that no dropped point lies farther than `tolerance_m` from the simplified
+    path's segments. Distances are measured on a local equirectangular projection, which
+    is exact enough over a route's extent.
+    """
+    if len(points) <= 2 or tolerance_m <= 0:
+        return list(points)
+    arr = np.asarray(points, dtype=np.float64)
+    lat0 = math.radians(arr[:, 0].mean())
+    xy = np.column_stack([np.radians(arr[:, 1]) * math.cos(lat0), np.radians(arr[:, 0])]) * EARTH_RADIUS_M
+
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = xy[first], xy[last]
+        inner = xy[first + 1:last]
+        ab = b - a
+        length_sq = ab @ ab
+        # Nearest point on the segment a-b, so points overshooting an end or
+        # backtracking along the line count by their distance to that end
+        t = np.clip((inner - a) @ ab / length_sq, 0.0, 1.0) if length_sq > 0 else np.zeros(len(inner))
+        nearest = a + t[:, None] * ab
+        dist = np.hypot(inner[:, 0] - nearest[:, 0], inner[:, 1] - nearest[:, 1])
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return [points[i] for i in np.flatnonzero(keep)]
+
+
+def tolerance_for_zoom(zoom, lat):
+    """Ground size (m) of one screen pixel at a web-map zoom level and latitude."""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
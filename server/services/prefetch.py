@@ -0,0 +1,89 @@
+# server/services/prefetch.py
+import asyncio
+import time
+
+from config import PREFETCH_MAX_CONCURRENCY, PREFETCH_TTL_S
+from services.google_client import REQUEST_PRIORITY
+from services.logs import get_logger
+
+logger = get_logger("prefetch")
+
+
+class Prefetcher:
+    """
+    Speculative work attached to a session: jobs are started in the background
+    at background upstream priority, at most `max_concurrency` at a time, and
+    a later turn `take`s the result (awaiting it if still running) instead of
+    starting from zero. Results nobody takes are counted as wasted.
+    """
+
+    def __init__(self, max_concurrency=PREFETCH_MAX_CONCURRENCY, ttl_s=PREFETCH_TTL_S):
+        self.max_concurrency = max_concurrency
+        self.ttl_s = ttl_s
+        self._jobs = {}  # sid -> {key: (started_at, task)}
+        self._slots = None
+        self._counters = {"started": 0, "hits": 0, "joined": 0, "misses": 0,
+                          "wasted": 0, "cancelled": 0, "failed": 0}
+
+    def start(self, sid, key, job):
+        """Run `job()` (a coroutine function) in the background for a session."""
+        self._expire()
+        jobs = self._jobs.setdefault(sid, {})
+        if key in jobs:
+            return
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        task = asyncio.create_task(self._run(job))
+        # Retrieve failures here so unused failed jobs don't log "never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        jobs[key] = (time.time(), task)
+        self._counters["started"] += 1
+
+    async def _run(self, job):
+        async with self._slots:
+            REQUEST_PRIORITY.set("background")
+            return await job()
+
+    async def take(self, sid, key):
+        """
+        Result of a session's prefetch job, waiting for it if it is still in
+        flight. Returns None when there is no usable job.
+        """
+        entry = self._jobs.get(sid, {}).pop(key, None)
+        if entry is None:
+            self._counters["misses"] += 1
+            return None
+        task = entry[1]
+        self._counters["hits" if task.done() else "joined"] += 1
+        try:
+            return await task
+        except Exception as e:
+            logger.warning("prefetch failed: %r", e)
+            self._counters["failed"] += 1
+            return None
+
+    def discard(self, sid):
+        """Drop a session's remaining jobs once they can no longer be used."""
+        for _, task in self._jobs.pop(sid, {}).values():
+            if task.done():
+                self._counters["wasted"] += 1
+            else:
+                task.cancel()
+                self._counters["cancelled"] += 1
+
+    def stats(self):
+        counters = dict(self._counters)
+        counters["in_flight"] = sum(1 for jobs in self._jobs.values() for _, t in jobs.values() if not t.done())
+        used = counters["hits"] + counters["joined"]
+        counters["hit_ratio"] = round(used / counters["started"], 4) if counters["started"] else 0.0
+        return counters
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_s
+        for sid in [sid for sid, jobs in self._jobs.items()
+                    if all(started < cutoff for started, _ in jobs.values())]:
+            self.discard(sid)
+
+
+# Shared process-wide prefetcher
+prefetcher = Prefetcher()
@@ -0,0 +1,69 @@
+# server/services/ranking.py
+import math
+from dataclasses import replace
+
+import numpy as np
+
+from config import ITINERARY_TOP_K, RANKING_WEIGHTS, RANKING_MAX_CATEGORY_SHARE
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Distances (km) from one point to arrays of points."""
+    p1, p2 = np.radians(lat), np.radians(lats)
+    dp, dl = p2 - p1, np.radians(lngs - lng)
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def rank_places(places, lat, lng, top_k=ITINERARY_TOP_K, max_distance_km=None,
+                weights=None, max_share=RANKING_MAX_CATEGORY_SHARE):
+    """
+    Pick the best `top_k` candidates from a search result
+    ({"restaurant_places": [...], "attraction_places": [...]}) before routing.
+
+    Candidates beyond `max_distance_km` are dropped; the rest are scored on
+    normalized rating, distance from the hotel and `keyword_score` (see
+    KeywordMatcher) using `weights`. No category gets more than
+    ceil(top_k * max_share) stops unless the others run out of candidates.
+    Returns the same dict shape, best first, with `distance_km` on each place.
+    """
+    weights = {**RANKING_WEIGHTS, **(weights or {})}
+    categories = list(places)
+    pool = [(c, place) for c, key in enumerate(categories) for place in places[key]]
+    ranked = {key: [] for key in categories}
+    if not pool or top_k <= 0:
+        return ranked
+
+    cat = np.fromiter((c for c, _ in pool), dtype=np.int32, count=len(pool))
+    lats = np.fromiter((p.latitude for _, p in pool), dtype=np.float64, count=len(pool))
+    lngs = np.fromiter((p.longitude for _, p in pool), dtype=np.float64, count=len(pool))
+    ratings = np.fromiter((p.rating or 0 for _, p in pool), dtype=np.float64, count=len(pool))
+    keyword = np.fromiter((p.keyword_score or 0 for _, p in pool), dtype=np.float64, count=len(pool))
+
+    dist = haversine_km(lat, lng, lats, lngs)
+    in_range = dist <= max_distance_km if max_distance_km else np.ones(len(pool), dtype=bool)
+    reach = max_distance_km or max(float(dist.max()), 1e-9)
+    score = (weights["rating"] * ratings / 5.0
+             - weights["distance"] * dist / reach
+             + weights["keyword"] * keyword / max(float(keyword.max()), 1.0))
+    score = np.where(in_range, score, -np.inf)
+
+    # Rank of each candidate within its own category (0 = best)
+    order = np.lexsort((-score, cat))
+    rank_in_cat = np.empty(len(pool), dtype=np.int64)
+    starts = np.searchsorted(cat[order], np.arange(len(categories)))
+    rank_in_cat[order] = np.arange(len(pool)) - np.repeat(starts, np.bincount(cat, minlength=len(categories)))
+
+    # Best candidates within the category cap first, then fill up from the rest
+    cap = math.ceil(top_k * max_share)
+    by_score = np.argsort(-score, kind="stable")
+    by_score = by_score[np.isfinite(score[by_score])]
+    eligible = rank_in_cat[by_score] < cap
+    chosen = np.concatenate([by_score[eligible], by_score[~eligible]])[:top_k]
+
+    for i in chosen.tolist():
+        c, place = pool[i]
+        ranked[categories[c]].append(replace(place, distance_km=round(float(dist[i]), 3)))
+    return ranked
@@ -0,0 +1,112 @@
+# server/services/response_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_STALE_S, RESPONSE_CACHE_TTL_S
+from services.google_client import REQUEST_PRIORITY
+from services.logs import get_logger
+from services.singleflight import SingleFlight
+
+logger = get_logger("response_cache")
+
+HIT, STALE, MISS, BYPASS = "HIT", "STALE", "MISS", "BYPASS"
+
+
+class ResponseCache:
+    """
+    Rendered response bodies of the read-only GET endpoints (/places,
+    /itinerary, ...), keyed by the normalized request. Within `ttl_s` an entry
+    is served as is. For `stale_s` after that it is still served, and one
+    background refresh per key replaces it; past that a request recomputes.
+    Concurrent misses for a key share one computation. Event-loop only.
+    """
+
+    def __init__(self, ttl_s=RESPONSE_CACHE_TTL_S, stale_s=RESPONSE_CACHE_STALE_S, max_entries=RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_s = ttl_s
+        self.stale_s = stale_s
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (stored_at, body, valid), least recently used first
+        self._refreshing = {}  # key -> asyncio.Task
+        self._flights = SingleFlight()
+        self._counters = {"hits": 0, "stale": 0, "misses": 0, "bypassed": 0, "refreshes": 0,
+                          "refresh_failed": 0, "uncacheable": 0, "evicted": 0, "invalidated": 0}
+
+    async def get(self, key, compute, bypass=False):
+        """
+        Response body for `key` as (body, status, age_s), status being one of
+        HIT, STALE, MISS or BYPASS. `compute` is a coroutine function returning
+        (body, cacheable, valid); error responses should not be cacheable, and
+        `valid` is None or a callable telling whether the body still holds
+        (e.g. the route it refers to is still stored), checked before every
+        hit. `bypass` recomputes even when an entry is fresh, and stores the
+        result.
+        """
+        entry = None if bypass else self._entries.get(key)
+        if entry is not None:
+            stored_at, body, valid = entry
+            age = time.time() - stored_at
+            if valid is not None and not valid():
+                self._counters["invalidated"] += 1
+            elif age < self.ttl_s + self.stale_s:
+                self._entries.move_to_end(key)
+                if age < self.ttl_s:
+                    self._counters["hits"] += 1
+                    return body, HIT, age
+                self._counters["stale"] += 1
+                self._refresh(key, compute)
+                return body, STALE, age
+            del self._entries[key]
+
+        self._counters["bypassed" if bypass else "misses"] += 1
+        body = await self._flights.do_async(key, lambda: self._compute(key, compute))
+        return body, BYPASS if bypass else MISS, 0.0
+
+    async def _compute(self, key, compute):
+        body, cacheable, valid = await compute()
+        if cacheable:
+            self._entries[key] = (time.time(), body, valid)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+        else:
+            self._counters["uncacheable"] += 1
+        return body
+
+    def _refresh(self, key, compute):
+        """Start the background refresh of a stale entry, unless one is already running."""
+        if key in self._refreshing:
+            return
+
+        async def run():
+            REQUEST_PRIORITY.set("background")
+            return await self._flights.do_async(key, lambda: self._compute(key, compute))
+
+        def done(task):
+            self._refreshing.pop(key, None)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                # The stale entry stays and is refreshed again on a later request
+                logger.warning("response refresh failed: %r", task.exception())
+                self._counters["refresh_failed"] += 1
+
+        task = self._refreshing[key] = asyncio.create_task(run())
+        task.add_done_callback(done)
+        self._counters["refreshes"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        counters = dict(self._counters)
+        counters["entries"] = len(self._entries)
+        counters["refreshing"] = len(self._refreshing)
+        lookups = counters["hits"] + counters["stale"] + counters["misses"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["stale"]) / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Shared process-wide cache instance
+response_cache = ResponseCache()
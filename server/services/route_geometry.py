@@ -0,0 +1,122 @@
+# server/services/route_geometry.py
+"""
+Route geometry for itineraries. A Directions leg keeps its path (the step
+polylines joined and simplified to the finest level) in the leg cache, so
+reused legs bring their geometry along. When an itinerary is built, its legs
+are stored here once as a route, with every coarser Douglas-Peucker level
+precomputed and the route id being a hash of the geometry, so identical
+routes share an entry. Clients fetch the level matching their map zoom.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from config import ROUTE_GEOMETRY_LEVELS_M, ROUTE_GEOMETRY_MAX_ENTRIES, ROUTE_GEOMETRY_TTL_S
+from services import polyline
+
+
+def leg_path(directions_leg):
+    """Encoded path of a Directions leg at the finest level; None when it has no step geometry."""
+    points = []
+    for step in directions_leg.get('steps', []):
+        encoded = step.get('polyline', {}).get('points')
+        if not encoded:
+            continue
+        step_points = polyline.decode(encoded)
+        # Consecutive steps share their joining point
+        points.extend(step_points[1:] if points and step_points and step_points[0] == points[-1] else step_points)
+    if len(points) < 2:
+        return None
+    return polyline.encode(polyline.simplify(points, ROUTE_GEOMETRY_LEVELS_M[0]))
+
+
+class RouteGeometryCache:
+    """LRU of route id -> per-level encoded leg paths, with a TTL."""
+
+    def __init__(self, levels_m=ROUTE_GEOMETRY_LEVELS_M, max_entries=ROUTE_GEOMETRY_MAX_ENTRIES,
+                 ttl_s=ROUTE_GEOMETRY_TTL_S):
+        self.levels_m = tuple(sorted(levels_m))
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()  # route_id -> (expires_at, start latitude, {level_m: [encoded leg path, ...]})
+        self._lock = threading.Lock()
+        self._counters = {"stored": 0, "reused": 0, "hits": 0, "misses": 0, "evicted": 0}
+
+    def put(self, leg_paths, stops):
+        """
+        Store a route from its legs' encoded paths, leg i running from
+        stops[i] to stops[i + 1] ((lat, lng) pairs); a leg without a path is
+        drawn as a straight line. Returns the route id.
+        """
+        paths = [path or polyline.encode([a, b]) for path, a, b in zip(leg_paths, stops, stops[1:])]
+        route_id = hashlib.sha1("\n".join(paths).encode()).hexdigest()[:16]
+        with self._lock:
+            if route_id in self._entries:
+                self._entries[route_id] = (time.time() + self.ttl_s, *self._entries[route_id][1:])
+                self._entries.move_to_end(route_id)
+                self._counters["reused"] += 1
+                return route_id
+
+        # Simplify outside the lock; a concurrent put of the same route stores an equal entry
+        decoded = [polyline.decode(path) for path in paths]
+        levels = {self.levels_m[0]: paths}
+        for level in self.levels_m[1:]:
+            levels[level] = [polyline.encode(polyline.simplify(points, level)) for points in decoded]
+        with self._lock:
+            self._entries[route_id] = (time.time() + self.ttl_s, stops[0][0], levels)
+            self._entries.move_to_end(route_id)
+            self._counters["stored"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evicted"] += 1
+        return route_id
+
+    def level_for(self, tolerance_m):
+        """The coarsest level within `tolerance_m`; the finest when None or below every level."""
+        if tolerance_m is None:
+            return self.levels_m[0]
+        return max((level for level in self.levels_m if level <= tolerance_m), default=self.levels_m[0])
+
+    def get(self, route_id, tolerance_m=None, zoom=None):
+        """
+        (level_m, [encoded leg path, ...]) for the route at the level for
+        `tolerance_m`, or for about one screen pixel at map `zoom`; None when
+        the route is unknown or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(route_id)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(route_id)
+                self._counters["hits"] += 1
+                _, lat, levels = entry
+                if tolerance_m is None and zoom is not None:
+                    tolerance_m = polyline.tolerance_for_zoom(zoom, lat)
+                level = self.level_for(tolerance_m)
+                return level, levels[level]
+            if entry is not None:
+                del self._entries[route_id]
+            self._counters["misses"] += 1
+            return None
+
+    def contains(self, route_id):
+        """Whether `route_id` is stored and unexpired; unlike get, neither counted nor refreshed."""
+        with self._lock:
+            entry = self._entries.get(route_id)
+            return entry is not None and entry[0] > time.time()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["entries"] = len(self._entries)
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+# Shared process-wide cache instance
+route_geometry = RouteGeometryCache()
@@ -0,0 +1,128 @@
+# server/services/route_optimizer.py
+import time
+
+from config import HELD_KARP_MAX_STOPS, ROUTE_OPTIMIZER_TIME_BUDGET_S
+
+
+def tour_cost(cost, order):
+    """
+    Cost of the closed tour depot(0) -> order... -> depot(0).
+    `order` holds matrix indices of the stops (1..n).
+    """
+    total, prev = 0, 0
+    for node in order:
+        total += cost[prev][node]
+        prev = node
+    return total + cost[prev][0]
+
+
+def solve_tour(cost, time_budget_s=None):
+    """
+    Order the stops of a closed tour starting and ending at node 0.
+
+    `cost` is a square (possibly asymmetric) matrix, e.g. Distance Matrix
+    durations in seconds. Up to HELD_KARP_MAX_STOPS stops are solved exactly with
+    Held-Karp; larger tours are built nearest-neighbour first and then improved
+    with 2-opt and Or-opt moves until no move helps or `time_budget_s` runs out.
+
+    Returns {"order": [...], "objective": ..., "method": ...}.
+    """
+    n = len(cost) - 1
+    if n <= 0:
+        return {"order": [], "objective": 0, "method": "trivial"}
+    if n <= 2:
+        order = list(range(1, n + 1))
+        if n == 2 and tour_cost(cost, [2, 1]) < tour_cost(cost, order):
+            order = [2, 1]
+        return {"order": order, "objective": tour_cost(cost, order), "method": "trivial"}
+    if n <= HELD_KARP_MAX_STOPS:
+        order = _held_karp(cost, n)
+        return {"order": order, "objective": tour_cost(cost, order), "method": "held-karp"}
+
+    budget = ROUTE_OPTIMIZER_TIME_BUDGET_S if time_budget_s is None else time_budget_s
+    deadline = time.perf_counter() + budget
+    order = _nearest_neighbour(cost, n)
+    order = _local_search(cost, order, deadline)
+    return {"order": order, "objective": tour_cost(cost, order), "method": "2-opt+or-opt"}
+
+
+def _held_karp(cost, n):
+    # dp[mask][j]: cheapest path from the depot through the stops in `mask`, ending at stop j.
+    # Stop j (1-based matrix index) is bit j-1.
+    full = 1 << n
+    inf = float("inf")
+    dp = [[inf] * n for _ in range(full)]
+    parent = [[-1] * n for _ in range(full)]
+    for j in range(n):
+        dp[1 << j][j] = cost[0][j + 1]
+
+    for mask in range(1, full):
+        row = dp[mask]
+        for j in range(n):
+            base = row[j]
+            if base == inf or not (mask >> j) & 1:
+                continue
+            cost_j = cost[j + 1]
+            for k in range(n):
+                if (mask >> k) & 1:
+                    continue
+                nxt = mask | (1 << k)
+                value = base + cost_j[k + 1]
+                if value < dp[nxt][k]:
+                    dp[nxt][k] = value
+                    parent[nxt][k] = j
+
+    last_row = dp[full - 1]
+    last = min(range(n), key=lambda j: last_row[j] + cost[j + 1][0])
+    order, mask = [], full - 1
+    while last != -1:
+        order.append(last + 1)
+        last, mask = parent[mask][last], mask ^ (1 << last)
+    order.reverse()
+    return order
+
+
+def _nearest_neighbour(cost, n):
+    unvisited = set(range(1, n + 1))
+    order, prev = [], 0
+    while unvisited:
+        nxt = min(unvisited, key=lambda j: cost[prev][j])
+        unvisited.remove(nxt)
+        order.append(nxt)
+        prev = nxt
+    return order
+
+
+def _local_search(cost, order, deadline):
+    best = tour_cost(cost, order)
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        n = len(order)
+
+        # 2-opt: reverse order[i:j]. Durations can be asymmetric, so candidates are re-costed in full.
+        for i in range(n - 1):
+            for j in range(i + 2, n + 1):
+                candidate = order[:i] + order[i:j][::-1] + order[j:]
+                value = tour_cost(cost, candidate)
+                if value < best:
+                    order, best, improved = candidate, value, True
+            if time.perf_counter() >= deadline:
+                return order
+
+        # Or-opt: move a segment of 1-3 consecutive stops elsewhere in the tour
+        for seg_len in (1, 2, 3):
+            for i in range(n - seg_len + 1):
+                segment = order[i:i + seg_len]
+                rest = order[:i] + order[i + seg_len:]
+                for pos in range(len(rest) + 1):
+                    if pos == i:
+                        continue
+                    candidate = rest[:pos] + segment + rest[pos:]
+                    value = tour_cost(cost, candidate)
+                    if value < best:
+                        order, best, improved = candidate, value, True
+                        break
+            if time.perf_counter() >= deadline:
+                return order
+    return order
@@ -0,0 +1,185 @@
+# server/services/scheduler.py
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from config import (
+    UPSTREAM_RATE_LIMITS,
+    UPSTREAM_PRIORITY_RESERVE,
+    UPSTREAM_RETRY_BASE_S,
+    UPSTREAM_RETRY_MAX_S,
+)
+from services.metrics import UPSTREAM_QUEUE_DEPTH, UPSTREAM_QUEUE_WAIT
+
+# Priority classes, most urgent first
+PRIORITIES = ("interactive", "background", "batch")
+_RANK = {name: rank for rank, name in enumerate(PRIORITIES)}
+
+
+def backoff_delay(attempt, base_s=UPSTREAM_RETRY_BASE_S, max_s=UPSTREAM_RETRY_MAX_S):
+    """Full-jitter exponential backoff: uniform in [0, min(max_s, base_s * 2**attempt)]."""
+    return random.uniform(0, min(max_s, base_s * 2 ** attempt))
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `burst`. Not thread-safe on its own."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def try_take(self, cost, reserve=0.0):
+        """
+        Take `cost` tokens while leaving at least `reserve` in the bucket.
+        Returns 0 on success, otherwise the seconds until it could succeed.
+        A cost larger than the burst is charged as a full bucket.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        cost = min(cost, self.burst)
+        if self.tokens - cost >= reserve:
+            self.tokens -= cost
+            return 0.0
+        return (cost + reserve - self.tokens) / self.rate
+
+
+class UpstreamScheduler:
+    """
+    Per-API token buckets in front of the Google client. Callers `acquire`
+    before each request; when the bucket is empty they queue, and queued
+    calls are released in priority order (interactive, then background, then
+    batch), FIFO within a class. Lower classes also leave part of the burst
+    (UPSTREAM_PRIORITY_RESERVE) untouched so interactive turns find tokens
+    even while prefetch or batch work is running. APIs without a configured
+    limit are not throttled.
+    """
+
+    def __init__(self, limits=UPSTREAM_RATE_LIMITS, reserve=UPSTREAM_PRIORITY_RESERVE):
+        self._buckets = {api: TokenBucket(rate, burst) for api, (rate, burst) in limits.items()}
+        self._reserve = reserve
+        self._lock = threading.Lock()
+        self._queues = {}       # api -> heap of (rank, seq, cost, priority, future)
+        self._wakeups = {}      # api -> asyncio.Event, set when a waiter is queued
+        self._dispatchers = {}  # api -> asyncio.Task releasing queued waiters
+        self._seq = itertools.count()
+        self._counters = {"immediate": 0, "queued": 0, "penalties": 0}
+
+    def _reserve_for(self, bucket, priority):
+        return bucket.burst * self._reserve.get(priority, 0.0)
+
+    async def acquire(self, api, priority="interactive", cost=1):
+        """Wait for a token (or `cost` tokens) for one call to `api`."""
+        bucket = self._buckets.get(api)
+        if bucket is None:
+            return
+        rank = _RANK.get(priority, len(PRIORITIES))
+        with self._lock:
+            queue = self._queues.setdefault(api, [])
+            # Only jump the queue when nobody at this priority or above is waiting
+            if (not queue or queue[0][0] > rank) and not bucket.try_take(cost, self._reserve_for(bucket, priority)):
+                self._counters["immediate"] += 1
+                UPSTREAM_QUEUE_WAIT.observe(0.0, api=api, priority=priority)
+                return
+            self._counters["queued"] += 1
+
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue, (rank, next(self._seq), cost, priority, future))
+        UPSTREAM_QUEUE_DEPTH.inc(api=api, priority=priority)
+        self._wakeup(api).set()
+        dispatcher = self._dispatchers.get(api)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[api] = asyncio.create_task(self._dispatch(api))
+        try:
+            await future
+        finally:
+            UPSTREAM_QUEUE_WAIT.observe(time.perf_counter() - started, api=api, priority=priority)
+
+    def acquire_sync(self, api, priority="interactive", cost=1):
+        """
+        Blocking acquire for the thread-pool (sync) service path. Sync callers
+        poll the shared bucket rather than joining the async priority queue.
+        """
+        bucket = self._buckets.get(api)
+        if bucket is None:
+            return
+        started = time.perf_counter()
+        UPSTREAM_QUEUE_DEPTH.inc(api=api, priority=priority)
+        try:
+            while True:
+                with self._lock:
+                    wait = bucket.try_take(cost, self._reserve_for(bucket, priority))
+                if not wait:
+                    return
+                time.sleep(wait)
+        finally:
+            UPSTREAM_QUEUE_DEPTH.dec(api=api, priority=priority)
+            UPSTREAM_QUEUE_WAIT.observe(time.perf_counter() - started, api=api, priority=priority)
+
+    def penalize(self, api, delay_s):
+        """Hold every call to `api` for `delay_s` (after a 429 / OVER_QUERY_LIMIT)."""
+        bucket = self._buckets.get(api)
+        if bucket is None:
+            return
+        with self._lock:
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + delay_s)
+            self._counters["penalties"] += 1
+
+    def _wakeup(self, api):
+        event = self._wakeups.get(api)
+        if event is None:
+            event = self._wakeups[api] = asyncio.Event()
+        return event
+
+    async def _dispatch(self, api):
+        bucket = self._buckets[api]
+        queue = self._queues[api]
+        wakeup = self._wakeup(api)
+        while queue:
+            wakeup.clear()
+            rank, _, cost, priority, future = queue[0]
+            if future.cancelled():
+                heapq.heappop(queue)
+                UPSTREAM_QUEUE_DEPTH.dec(api=api, priority=priority)
+                continue
+            with self._lock:
+                wait = bucket.try_take(cost, self._reserve_for(bucket, priority))
+            if wait:
+                # Sleep until tokens are due, or until a more urgent waiter arrives
+                try:
+                    await asyncio.wait_for(wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(queue)
+            UPSTREAM_QUEUE_DEPTH.dec(api=api, priority=priority)
+            future.set_result(None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            now = time.monotonic()
+            stats["apis"] = {
+                api: {
+                    "rate": bucket.rate,
+                    "burst": bucket.burst,
+                    "tokens": round(min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate), 2),
+                    "queued": len(self._queues.get(api, ())),
+                    "paused_s": round(max(0.0, bucket.paused_until - now), 3),
+                }
+                for api, bucket in self._buckets.items()
+            }
+        return stats
+
+
+# Shared process-wide scheduler
+scheduler = UpstreamScheduler()
@@ -0,0 +1,89 @@
+# server/services/singleflight.py
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Collapses concurrent identical calls: while a call for a key is in flight,
+    other callers with the same key wait for its outcome instead of repeating
+    it. Works for blocking callers (threads) and coroutines; the two paths keep
+    separate in-flight tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # key -> concurrent.futures.Future
+        self._tasks = {}   # (event loop id, key) -> [asyncio.Task, waiting callers]
+        self._counters = {"calls": 0, "coalesced": 0, "abandoned": 0}
+
+    def do(self, key, fn):
+        """Run `fn()` once per concurrent `key`; followers get the same result or exception."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self._counters["calls"] += 1
+            else:
+                self._counters["coalesced"] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key, coro_fn):
+        """
+        Await `coro_fn()` once per concurrent `key`. The call runs as its own
+        task, so a caller that is cancelled (e.g. by a timeout) does not cancel
+        it for the others; when the last waiting caller is cancelled, the call
+        is cancelled too.
+        """
+        flight = (id(asyncio.get_running_loop()), key)
+        entry = self._tasks.get(flight)
+        if entry is None:
+            entry = self._tasks[flight] = [asyncio.ensure_future(coro_fn()), 0]  # [task, waiting callers]
+            entry[0].add_done_callback(lambda t: self._forget(flight, entry))
+            # Retrieve failures here so a flight whose callers all left doesn't log "never retrieved"
+            entry[0].add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._counters["calls"] += 1
+        else:
+            self._counters["coalesced"] += 1
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                # Nobody is left to use the result; later callers start a new flight
+                self._forget(flight, entry)
+                task.cancel()
+                self._counters["abandoned"] += 1
+
+    def _forget(self, flight, entry):
+        if self._tasks.get(flight) is entry:
+            del self._tasks[flight]
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            counters["in_flight"] = len(self._calls) + len(self._tasks)
+        total = counters["calls"] + counters["coalesced"]
+        counters["coalesced_ratio"] = round(counters["coalesced"] / total, 4) if total else 0.0
+        return counters
+
+
+# Shared process-wide instance for upstream calls
+upstream_flights = SingleFlight()
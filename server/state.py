@@ -1,23 +1,255 @@
 # server/state.py
-from typing import Dict
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
 from uuid import uuid4
 
+from config import (
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_TTL_S,
+    SESSION_MAX_SESSIONS,
+    SESSION_MAX_BYTES,
+)
+from services.place_record import Place, places_from_dicts
+
+
+def _json_default(value):
+    """Sessions hold Place records in their candidate pools; everything else unknown becomes a string."""
+    return value.to_dict() if isinstance(value, Place) else str(value)
+
+
+def _decode(payload):
+    data = json.loads(payload)
+    if isinstance(data.get("places"), dict):
+        data["places"] = places_from_dicts(data["places"])
+    return data
+
+
+class SessionStore:
+    """
+    Interface for session backends. Sessions are dicts that serialize to JSON
+    (candidate places as Place records, see _json_default); callers must `put`
+    a session back after changing it. `blocking` backends do I/O in their
+    calls, which the async helpers below run in a worker thread.
+    """
+
+    blocking = False
+
+    def get(self, sid: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def put(self, sid: str, data: dict):
+        raise NotImplementedError
+
+    def delete(self, sid: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Process-local store with idle-TTL expiry and LRU eviction by session count
+    and, when `max_bytes` is set, by serialized size. Measuring serializes the
+    whole session on every put, so it is skipped without a byte limit.
+    """
+
+    def __init__(self, ttl_s=SESSION_TTL_S, max_sessions=SESSION_MAX_SESSIONS, max_bytes=SESSION_MAX_BYTES):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # sid -> [last_access, size_bytes, data], least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"evicted_ttl": 0, "evicted_count": 0, "evicted_memory": 0}
+
+    def get(self, sid):
+        with self._lock:
+            self._expire()
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            entry[0] = time.time()
+            self._sessions.move_to_end(sid)
+            return entry[2]
+
+    def put(self, sid, data):
+        size = len(json.dumps(data, default=_json_default)) if self.max_bytes else 0
+        with self._lock:
+            old = self._sessions.pop(sid, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._sessions[sid] = [time.time(), size, data]
+            self._bytes += size
+            self._expire()
+            while len(self._sessions) > self.max_sessions:
+                self._evict("evicted_count")
+            while self.max_bytes and self._bytes > self.max_bytes and len(self._sessions) > 1:
+                self._evict("evicted_memory")
+
+    def delete(self, sid):
+        with self._lock:
+            entry = self._sessions.pop(sid, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            stats = {"backend": "memory", "sessions": len(self._sessions), **self._counters}
+            if self.max_bytes:
+                stats["bytes"] = self._bytes
+            return stats
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_s
+        while self._sessions:
+            sid, entry = next(iter(self._sessions.items()))
+            if entry[0] >= cutoff:
+                break
+            self._evict("evicted_ttl")
+
+    def _evict(self, reason):
+        _, entry = self._sessions.popitem(last=False)
+        self._bytes -= entry[1]
+        self._counters[reason] += 1
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite store in WAL mode, so several uvicorn/gunicorn workers on one host
+    can serve the same session. Expired and over-limit sessions are pruned
+    periodically on write.
+    """
+
+    PRUNE_EVERY = 200  # writes
+    blocking = True
+
+    def __init__(self, path=SESSION_DB_PATH, ttl_s=SESSION_TTL_S, max_sessions=SESSION_MAX_SESSIONS):
+        self.ttl_s = ttl_s
+        self.max_sessions = max_sessions
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counters = {"evicted_ttl": 0, "evicted_count": 0}
+
+    def get(self, sid):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM sessions WHERE sid = ? AND updated_at >= ?",
+                (sid, time.time() - self.ttl_s),
+            ).fetchone()
+        return _decode(row[0]) if row else None
+
+    def put(self, sid, data):
+        payload = json.dumps(data, default=_json_default)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (sid, data, updated_at) VALUES (?, ?, ?)",
+                (sid, payload, time.time()),
+            )
+            self._db.commit()
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+
+    def delete(self, sid):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions WHERE updated_at >= ?",
+                (time.time() - self.ttl_s,),
+            ).fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": size, **self._counters}
+
+    def _prune(self):
+        cur = self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_s,))
+        self._counters["evicted_ttl"] += cur.rowcount
+        cur = self._db.execute(
+            "DELETE FROM sessions WHERE sid IN ("
+            " SELECT sid FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+        self._counters["evicted_count"] += cur.rowcount
+        self._db.commit()
+
+
+_BACKENDS: Dict[str, type] = {"memory": MemorySessionStore, "sqlite": SQLiteSessionStore}
+
 # session_id → session data
-sessions: Dict[str, dict] = {}
+sessions: SessionStore = _BACKENDS[SESSION_BACKEND]()
 
-def new_session() -> str:
-    sid = str(uuid4())
-    sessions[sid] = {
+def _new_session_data() -> dict:
+    return {
         "step": 0,           # which question we last asked
         "prefs": {},         # itinerary_type, food_keywords, travel_mode, max_distance_km
         "hotel": None,       # geocoded hotel info
-        "places": [],        # full list from search
+        "places": [],        # candidate Place records by category, at most SESSION_MAX_PLACES
         "itinerary": None,   # last generated itinerary
+        "itinerary_version": 0,
+        "itinerary_patch": None,  # [from_version, JSON Patch] leading to the current itinerary
     }
+
+def new_session() -> str:
+    sid = str(uuid4())
+    sessions.put(sid, _new_session_data())
     return sid
 
-def get_session(sid: str) -> dict:
+def get_session(sid: str) -> Optional[dict]:
     return sessions.get(sid)
 
+def save_session(sid: str, session: dict):
+    """Write a session back after a turn changed it."""
+    sessions.put(sid, session)
+
 def clear_session(sid: str):
-    sessions.pop(sid, None)
\ No newline at end of file
+    sessions.delete(sid)
+
+def session_stats() -> dict:
+    return sessions.stats()
+
+
+async def _call(method, *args):
+    """Call a session store method from async code, off the event loop for a blocking backend."""
+    if sessions.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+async def new_session_async() -> str:
+    sid = str(uuid4())
+    await _call(sessions.put, sid, _new_session_data())
+    return sid
+
+async def get_session_async(sid: str) -> Optional[dict]:
+    return await _call(sessions.get, sid)
+
+async def save_session_async(sid: str, session: dict):
+    await _call(sessions.put, sid, session)
+
+async def clear_session_async(sid: str):
+    await _call(sessions.delete, sid)
+
+async def session_stats_async() -> dict:
+    return await _call(sessions.stats)
@@ -0,0 +1,9 @@
+# server/tests/conftest.py
+import os
+import sys
+
+# The server modules import each other from the server/ directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the tests off the on-disk caches
+os.environ.setdefault("GEOCODE_CACHE_PATH", "")
+os.environ.setdefault("GOOGLE_MAPS_API_KEY", "test")
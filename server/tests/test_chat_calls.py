@@ -0,0 +1,66 @@
+# server/tests/test_chat_calls.py
+"""
+Upstream calls of a chat session, against the bench/fake_google.py app
+mounted as the upstream transport.
+"""
+from collections import Counter
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from bench.fake_google import FakeGoogle, create_app
+from services import google_client
+from services.place_cache import place_cache
+from services.response_cache import response_cache
+
+RESTAURANT_TYPES = ("restaurant", "cafe")
+
+
+class CountingFake(FakeGoogle):
+    """FakeGoogle that also counts searchNearby calls per type set."""
+
+    def __init__(self):
+        super().__init__()
+        self.searches = Counter()
+
+    def pois(self, lat, lng, radius, types, limit=20):
+        self.searches[tuple(types or ())] += 1
+        return super().pois(lat, lng, radius, types, limit)
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    fake = CountingFake()
+    for cache in (place_cache, response_cache):
+        cache.clear()
+    with TestClient(main.app) as client:
+        monkeypatch.setattr(google_client, "_async_client",
+                            httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(fake))))
+
+        def say(sid, message):
+            response = client.post("/chat", json={"session_id": sid, "message": message})
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        yield fake, say
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_step_4_reuses_the_restaurant_fetch_of_step_3(chat, monkeypatch, prefetch):
+    fake, say = chat
+    monkeypatch.setattr(main, "PREFETCH_ENABLED", prefetch)
+    sid = say(None, "hi")["session_id"]
+    for message in ["tourist", "walking", "1"]:
+        say(sid, message)
+
+    # Step 3: cuisine options from a restaurant sample (a fresh area, so no cuisine catalog hit)
+    options = say(sid, f"Hotel {prefetch}, Paris")["options"]
+    step_3 = fake.searches[RESTAURANT_TYPES]
+    assert step_3 >= 1
+
+    # Step 4: picking a cuisine searches restaurants and attractions, then builds the itinerary
+    reply = say(sid, options[0])
+    assert reply.get("itinerary")
+    assert fake.searches[RESTAURANT_TYPES] == step_3
@@ -0,0 +1,12 @@
+# server/tests/test_chat_response.py
+from schemas import ChatResponse
+
+
+def test_only_the_version_fields_are_left_out_when_unset():
+    data = ChatResponse(session_id="s", reply="Hi").model_dump()
+    # The fields predating itinerary versions keep their nulls on the wire
+    assert data == {"session_id": "s", "reply": "Hi", "itinerary": None, "options": None}
+
+    data = ChatResponse(session_id="s", reply="Unchanged", itinerary_version=3).model_dump(mode="json")
+    assert data == {"session_id": "s", "reply": "Unchanged", "itinerary": None, "itinerary_version": 3,
+                    "options": None}
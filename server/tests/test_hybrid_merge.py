@@ -0,0 +1,16 @@
+# server/tests/test_hybrid_merge.py
+from services.places_service import _merge_local
+
+
+def _place(pid, name, lat, lng):
+    return {"id": pid, "displayName": {"text": name}, "location": {"latitude": lat, "longitude": lng}}
+
+
+def test_local_duplicates_of_google_places_are_dropped():
+    google = [_place("g1", "Café de Flore", 48.8541, 2.3326), _place("g2", "Les Deux Magots", 48.8540, 2.3333)]
+    local = [
+        _place("node/1", "Cafe de  Flore", 48.85413, 2.33265),  # same venue, OSM spelling
+        _place("node/2", "Café de Flore", 48.8600, 2.3400),     # same name, ~900 m away
+        _place("node/3", "", 48.8541, 2.3326),                  # unnamed
+    ]
+    assert [p["id"] for p in _merge_local(local, google)] == ["node/2", "node/3", "g1", "g2"]
@@ -0,0 +1,89 @@
+# server/tests/test_itinerary_async.py
+"""
+The tour solves of the async itinerary paths run off the event loop, so
+other requests are served while they search, and the days of a multi-day
+plan are solved side by side.
+"""
+import asyncio
+import time
+
+import pytest
+
+from services import itinerary_service
+from services.leg_cache import leg_cache
+from services.multiday import plan_multiday_async
+from services.place_record import Place
+
+SOLVE_S = 0.3
+
+
+def _places(n):
+    return {"restaurant_places": [],
+            "attraction_places": [Place.from_dict({"name": f"Stop {i}", "latitude": 48.85 + i / 1000,
+                                                   "longitude": 2.35}) for i in range(n)]}
+
+
+def _slow_solve(cost, time_budget_s=None):
+    # Stands in for a local search spending its whole time budget
+    time.sleep(SOLVE_S)
+    return {"order": list(range(1, len(cost))), "objective": 0, "method": "2-opt"}
+
+
+async def _ticks_during(coro):
+    """(result of `coro`, how often a 10 ms ticker ran meanwhile)."""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    task = asyncio.create_task(ticker())
+    try:
+        return await coro, ticks
+    finally:
+        task.cancel()
+
+
+async def _matrix(points, mode="walking"):
+    return [[0] * len(points) for _ in points]
+
+
+async def _directions(name, method, url, params=None, **kwargs):
+    stops = params.get("waypoints", "").count("|") + 2 if params.get("waypoints") else 1
+    leg = {"start_address": "", "end_address": "", "distance": {"text": "1 km", "value": 1000},
+           "duration": {"text": "1 min", "value": 60}}
+    return {"routes": [{"summary": "", "legs": [dict(leg) for _ in range(stops)]}]}
+
+
+@pytest.fixture
+def slow_solve(monkeypatch):
+    leg_cache.clear()
+    monkeypatch.setattr(itinerary_service, "fetch_duration_matrix_async", _matrix)
+    monkeypatch.setattr(itinerary_service, "call_async", _directions)
+    monkeypatch.setattr(itinerary_service, "solve_tour", _slow_solve)
+
+
+def test_tour_solve_does_not_block_the_event_loop(slow_solve):
+    async def first_stage():
+        async for stage, data in itinerary_service.iter_itinerary_async(48.85, 2.35, _places(5)):
+            return stage, data
+
+    (stage, data), ticks = asyncio.run(_ticks_during(first_stage()))
+    assert stage == "stops" and len(data["ordered_places"]) == 5
+    # A blocked loop would not tick at all until the solve returned
+    assert ticks >= SOLVE_S / 0.01 / 3
+
+
+def test_multiday_solves_its_days_concurrently(slow_solve):
+    days = 3
+    started = time.perf_counter()
+    plan, ticks = asyncio.run(_ticks_during(plan_multiday_async(48.85, 2.35, _places(9), days, stops_per_day=3)))
+    elapsed = time.perf_counter() - started
+
+    # Three stops a day, then back to the hotel
+    assert [len(day["itinerary"]["ordered_places"]) for day in plan["days"]] == [4, 4, 4]
+    # One solve's time rather than one per day, with the loop serving meanwhile
+    assert elapsed < 2 * SOLVE_S
+    assert ticks >= SOLVE_S / 0.01 / 3
@@ -0,0 +1,95 @@
+# server/tests/test_place_recall.py
+"""
+Recall of the tile-cached place search against one direct searchNearby call
+over the same circle, on the synthetic grid of bench/fake_google.py. Both
+keep the best rated places, so the search should return the same ratings
+(places may differ where ratings tie at the cut).
+"""
+import json
+
+import httpx
+import pytest
+
+from bench.fake_google import FakeGoogle
+from config import PLACE_QUERY_COVER_RADIUS_M
+from services import google_client
+from services.place_cache import place_cache
+from services.places_service import get_place_details, search_call_budget
+
+PARIS = (48.8566, 2.3522)
+fake = FakeGoogle()
+queries = []  # radius of every upstream searchNearby call
+
+
+def _handler(request):
+    body = json.loads(request.content)
+    circle = body["locationRestriction"]["circle"]
+    queries.append(circle["radius"])
+    pois = fake.pois(circle["center"]["latitude"], circle["center"]["longitude"], circle["radius"],
+                     body.get("includedTypes"), body.get("maxResultCount", 20))
+    return httpx.Response(200, json={"places": [fake.v1_place(p, "*") for p in pois]})
+
+
+@pytest.fixture(autouse=True)
+def fake_places(monkeypatch):
+    monkeypatch.setattr(google_client, "_client", httpx.Client(transport=httpx.MockTransport(_handler)))
+    place_cache.clear()
+    queries.clear()
+    yield
+    place_cache.clear()
+
+
+def _direct(lat, lng, radius, types):
+    return sorted(p["rating"] for p in fake.pois(lat, lng, radius, types, 20))
+
+
+def _search(lat, lng, radius, types):
+    places = get_place_details(lat, lng, included_types=types, max_result_count=20, radius=radius)["places"]
+    return sorted(p["rating"] for p in places)
+
+
+@pytest.mark.parametrize("radius", [400, 1000, 3000])
+@pytest.mark.parametrize("types", [["museum"], ["restaurant", "cafe"]])
+def test_search_finds_what_a_direct_call_finds(radius, types):
+    direct = _direct(*PARIS, radius, types)
+    assert direct
+    assert _search(*PARIS, radius, types) == direct
+    # Again, now partly or fully from the tile cache
+    assert _search(*PARIS, radius, types) == direct
+
+
+@pytest.mark.parametrize("types", [["museum"], ["restaurant", "cafe"]])
+def test_cached_tiles_keep_recall_of_smaller_searches(types):
+    _search(*PARIS, 3000, types)
+    for lat, lng, radius in [(48.8600, 2.3500, 400), (48.8530, 2.3580, 1000), (48.8566, 2.3522, 250)]:
+        assert _search(lat, lng, radius, types) == _direct(lat, lng, radius, types)
+
+
+@pytest.mark.parametrize("radius", [400, 1000, 3000])
+def test_search_spends_its_call_budget_at_most(radius):
+    before = place_cache.stats()["fetch_calls"]
+    _search(*PARIS, radius, ["restaurant", "cafe"])
+    assert place_cache.stats()["fetch_calls"] - before <= search_call_budget(radius)
+    if radius <= PLACE_QUERY_COVER_RADIUS_M:
+        assert search_call_budget(radius) == 1
+
+
+@pytest.mark.parametrize("radius", [300, 500, 800, 1000, 3000])
+@pytest.mark.parametrize("types", [["museum"], ["restaurant", "cafe"]])
+def test_repeated_search_makes_no_upstream_calls(radius, types):
+    first = _search(*PARIS, radius, types)
+    cold = len(queries)
+    hits = place_cache.stats()["full_hits"]
+    assert cold >= 1
+    for _ in range(4):
+        assert _search(*PARIS, radius, types) == first
+    assert len(queries) == cold
+    assert place_cache.stats()["full_hits"] - hits == 4
+
+
+def test_overlapping_search_queries_only_the_part_it_lacks():
+    _search(*PARIS, 700, ["museum"])
+    queries.clear()
+    lat, lng = PARIS[0] + 0.002, PARIS[1]  # ~220 m north, partly outside the first search
+    assert _search(lat, lng, 500, ["museum"]) == _direct(lat, lng, 500, ["museum"])
+    assert len(queries) == 1 and queries[0] < 500
@@ -0,0 +1,24 @@
+# server/tests/test_polyline.py
+from services import polyline
+
+
+def test_simplify_keeps_a_point_overshooting_the_segment_end():
+    # The middle point runs ~500 m past the end, along the same line
+    points = [(48, 2), (48.0045, 2), (48.0036, 2)]
+    assert polyline.simplify(points, 2) == points
+
+
+def test_simplify_keeps_a_point_backtracking_along_the_line():
+    # The path goes ~740 m east, then comes back ~590 m
+    points = [(48, 2), (48, 2.01), (48, 2.002)]
+    assert polyline.simplify(points, 40) == points
+
+
+def test_simplify_drops_points_close_to_the_segment():
+    points = [(48, 2), (48.0005, 2.00001), (48.001, 2)]
+    assert polyline.simplify(points, 2) == [(48, 2), (48.001, 2)]
+
+
+def test_encode_decode_round_trip():
+    points = [(48.85661, 2.35222), (48.85703, 2.35101), (48.8581, 2.3498)]
+    assert polyline.decode(polyline.encode(points)) == points
@@ -0,0 +1,78 @@
+# server/tests/test_response_cache.py
+"""
+GET response cache: what the start time bucket and the route store do to
+cached /places and /itinerary bodies.
+"""
+from datetime import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services.response_cache import response_cache
+from services.route_geometry import route_geometry
+
+HOTEL = {"latitude": 48.8566, "longitude": 2.3522, "address": "Hotel, Paris"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    response_cache.clear()
+    route_geometry.clear()
+
+    async def geocode(address):
+        return dict(HOTEL)
+
+    monkeypatch.setattr(main, "geocode_address_async", geocode)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_time_bucket_only_affects_the_cache_key(client, monkeypatch):
+    searched_at = []
+
+    async def search(lat, lng, target_time=None, target_day=None, **kwargs):
+        searched_at.append(target_time)
+        return {"restaurant_places": [], "attraction_places": []}, True
+
+    monkeypatch.setattr(main, "search_nearby_places_checked_async", search)
+
+    first = client.get("/places", params={"hotel_address": "Hotel", "time_str": "14:29", "day": 2})
+    assert first.headers["X-Cache"] == "MISS"
+    # Filtered at the requested minute, not at the start of its bucket
+    assert searched_at == [time(14, 29)]
+    assert first.json()["at"] == {"time": "14:29", "day": 2}
+
+    # Same bucket: the same entry, which says the time it was computed for
+    second = client.get("/places", params={"hotel_address": "Hotel", "time_str": "14:16", "day": 2})
+    assert second.headers["X-Cache"] == "HIT"
+    assert searched_at == [time(14, 29)]
+    assert second.json()["at"] == {"time": "14:29", "day": 2}
+
+    third = client.get("/places", params={"hotel_address": "Hotel", "time_str": "14:30", "day": 2})
+    assert third.headers["X-Cache"] == "MISS"
+    assert searched_at == [time(14, 29), time(14, 30)]
+
+
+def test_cached_itinerary_is_dropped_with_its_route(client, monkeypatch):
+    async def search(lat, lng, **kwargs):
+        return {"restaurant_places": [], "attraction_places": []}, True
+
+    async def itinerary(lat, lng, places, **kwargs):
+        stops = [(lat, lng), (lat + 0.001, lng)]
+        return {"legs": [], "route": {"id": route_geometry.put([None], stops), "levels_m": []}}
+
+    monkeypatch.setattr(main, "search_nearby_places_checked_async", search)
+    monkeypatch.setattr(main, "rank_places", lambda places, lat, lng, **kwargs: places)
+    monkeypatch.setattr(main, "generate_itinerary_async", itinerary)
+
+    first = client.get("/itinerary", params={"hotel_address": "Hotel"})
+    route_id = first.json()["itinerary"]["route"]["id"]
+    assert client.get("/itinerary", params={"hotel_address": "Hotel"}).headers["X-Cache"] == "HIT"
+
+    # The route store evicted the geometry: the body would point at a 404
+    route_geometry.clear()
+    assert client.get(f"/routes/{route_id}/geometry").status_code == 404
+    refreshed = client.get("/itinerary", params={"hotel_address": "Hotel"})
+    assert refreshed.headers["X-Cache"] == "MISS"
+    assert client.get(f"/routes/{refreshed.json()['itinerary']['route']['id']}/geometry").status_code == 200
@@ -0,0 +1,41 @@
+# server/tests/test_state.py
+import asyncio
+import threading
+
+import state
+from state import MemorySessionStore, SQLiteSessionStore
+
+
+def test_memory_store_measures_sessions_only_with_a_byte_limit(monkeypatch):
+    dumps = []
+    real_dumps = state.json.dumps
+    monkeypatch.setattr(state.json, "dumps", lambda *args, **kwargs: dumps.append(1) or real_dumps(*args, **kwargs))
+
+    unbounded = MemorySessionStore(max_bytes=0)
+    unbounded.put("a", {"step": 1})
+    assert not dumps and "bytes" not in unbounded.stats()
+
+    bounded = MemorySessionStore(max_bytes=30)
+    bounded.put("a", {"step": 1, "prefs": {}})
+    bounded.put("b", {"step": 2, "prefs": {}})
+    assert len(dumps) == 2
+    assert bounded.stats()["evicted_memory"] == 1 and bounded.get("a") is None
+
+
+def test_sqlite_calls_run_off_the_event_loop(monkeypatch, tmp_path):
+    store = SQLiteSessionStore(path=str(tmp_path / "sessions.sqlite3"))
+    threads = set()
+    real_get = store.get
+    monkeypatch.setattr(store, "get", lambda sid: threads.add(threading.get_ident()) or real_get(sid))
+    monkeypatch.setattr(state, "sessions", store)
+
+    async def turn():
+        sid = await state.new_session_async()
+        session = await state.get_session_async(sid)
+        session["step"] = 2
+        await state.save_session_async(sid, session)
+        return (await state.get_session_async(sid))["step"], threading.get_ident()
+
+    step, loop_thread = asyncio.run(turn())
+    assert step == 2
+    assert threads and loop_thread not in threads
@@ -0,0 +1,120 @@
+# server/tools/bench_session_memory.py
+"""
+Resident bytes per session for the candidate-place pools, before and after
+services/place_record.py: the old per-place dicts (with an uncapped "add
+more") against slotted Place records capped at SESSION_MAX_PLACES.
+
+Raw searchNearby places are built once, outside the measurement, the way the
+tile cache holds them; each session then keeps its own ranked pool of the
+best places, as main.py does after step 4 and after each "add more".
+
+    python -m tools.bench_session_memory --sessions 5000 --add-more 6
+
+Run from the server/ directory.
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+from dataclasses import replace
+
+from config import ADD_MORE_TOP_K, ITINERARY_TOP_K, SESSION_MAX_PLACES
+from services.opening_hours import compile_hours
+from services.place_record import Place
+
+CUISINES = ["italian", "french", "japanese", "thai", "indian", "mexican", "chinese", "greek", "korean", "spanish"]
+ATTRACTIONS = ["museum", "art_gallery", "park", "tourist_attraction", "church", "historical_landmark", "zoo"]
+STREETS = ["Rue de Rivoli", "Boulevard Saint-Germain", "Rue du Bac", "Avenue de l'Opéra", "Rue Oberkampf"]
+
+
+def raw_places(count, seed=0):
+    """A searchNearby-shaped response, parsed from JSON like a real one."""
+    rng = random.Random(seed)
+    places = []
+    for i in range(count):
+        if rng.random() < 0.6:
+            types = ["restaurant", f"{rng.choice(CUISINES)}_restaurant", "food", "point_of_interest", "establishment"]
+        else:
+            types = [rng.choice(ATTRACTIONS), "tourist_attraction", "point_of_interest", "establishment"]
+        place = {
+            "id": f"ChIJ{rng.getrandbits(96):024x}",
+            "displayName": {"text": f"{rng.choice(['Le', 'La', 'Chez', 'Café'])} {rng.choice(STREETS).split()[-1]} {i}"},
+            "formattedAddress": f"{rng.randint(1, 200)} {rng.choice(STREETS)}, 750{rng.randint(1, 20):02d} Paris, France",
+            "location": {"latitude": 48.85 + rng.uniform(-0.03, 0.03), "longitude": 2.35 + rng.uniform(-0.04, 0.04)},
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "types": types,
+        }
+        if rng.random() < 0.7:
+            place["regularOpeningHours"] = {"periods": [
+                {"open": {"day": d, "hour": rng.choice([8, 9, 10, 11]), "minute": 0},
+                 "close": {"day": d, "hour": rng.choice([18, 22, 23]), "minute": 0}} for d in range(1, 7)]}
+        places.append(place)
+    places = json.loads(json.dumps(places))
+    for place in places:
+        if "regularOpeningHours" in place:
+            place["openIntervals"] = compile_hours(place["regularOpeningHours"])
+    return places
+
+
+def pool_before(raw, distances):
+    """The dicts services/places_service._filter_places built, copied by rank_places with distance_km."""
+    return [{
+        'name': place.get('displayName', {}).get('text', ''),
+        'address': place.get('formattedAddress', ''),
+        'latitude': place.get('location', {}).get('latitude', 0),
+        'longitude': place.get('location', {}).get('longitude', 0),
+        'rating': place.get('rating', 0),
+        'types': place.get('types', []),
+        'place_id': place.get('id', ''),
+        'open_intervals': place.get('openIntervals'),
+        'distance_km': distance,
+    } for place, distance in zip(raw, distances)]
+
+
+def pool_after(raw, distances):
+    return [replace(Place.from_search(place), distance_km=distance) for place, distance in zip(raw, distances)]
+
+
+def measure(build, sessions):
+    """(bytes per session, sessions) for `sessions` sessions built by build(i)."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(sessions)]
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return used / sessions, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--add-more", type=int, default=6, help='"add more" turns per session')
+    parser.add_argument("--area-places", type=int, default=400, help="distinct places in the cached area")
+    args = parser.parse_args()
+
+    raw = raw_places(args.area_places)
+    rng = random.Random(1)
+    wanted = ITINERARY_TOP_K + args.add_more * ADD_MORE_TOP_K
+    picks = [rng.sample(range(len(raw)), min(wanted, len(raw))) for _ in range(args.sessions)]
+    distances = [round(rng.uniform(0.1, 5.0), 3) for _ in range(wanted)]
+
+    def session(pool):
+        return {"step": 5, "prefs": {}, "hotel": None, "places": {
+            "restaurant_places": pool[::2], "attraction_places": pool[1::2]}}
+
+    before, _ = measure(lambda i: session(pool_before([raw[j] for j in picks[i]], distances)), args.sessions)
+    capped = min(wanted, SESSION_MAX_PLACES)
+    after, _ = measure(lambda i: session(pool_after([raw[j] for j in picks[i][:capped]], distances)), args.sessions)
+    same, _ = measure(lambda i: session(pool_after([raw[j] for j in picks[i]], distances)), args.sessions)
+
+    print(f"{args.sessions} sessions, {wanted} candidates each before the cap ({capped} after)")
+    print(f"  dicts, uncapped      {before:9.0f} B/session  ({before / wanted:.0f} B/place)")
+    print(f"  Place, uncapped      {same:9.0f} B/session  ({same / wanted:.0f} B/place)")
+    print(f"  Place, capped        {after:9.0f} B/session  -{1 - after / before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+# server/tools/build_poi_index.py
+"""
+Compile a POI extract into the offline index read by services/poi_index.py
+(PLACES_BACKEND=offline or hybrid).
+
+Inputs, by extension:
+  .csv               columns id, name, lat, lng (or latitude/longitude), rating,
+                     types ("restaurant;italian_restaurant"), address, and either
+                     opening_hours (OSM syntax) or hours_json (Places regularOpeningHours)
+  .geojson           Point features whose properties use the CSV column names,
+                     or raw OSM tags (amenity, tourism, cuisine, ...)
+  .json              an Overpass API response ({"elements": [...]})
+  .jsonl / .ndjson   one OSM element per line ({"id", "lat", "lon", "tags"})
+
+OSM tags are mapped to Places types (amenity=restaurant + cuisine=thai ->
+restaurant, thai_restaurant). OSM has no ratings, so places without one get
+--default-rating; keep it at or above the search's minimum rating (3.0) or
+they will be filtered out. Opening hours in OSM syntax are understood for
+the common "Mo-Fr 09:00-18:00; Sa 10:00-14:00" / "24/7" forms; anything else
+is stored as unknown.
+
+    python -m tools.build_poi_index paris.osm.jsonl --out .cache/poi_index
+
+Run from the server/ directory.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+from config import POI_INDEX_CELL_DEG, POI_INDEX_PATH
+from services.opening_hours import compile_hours
+from services.poi_index import write_index
+
+# OSM (key, value) -> Places types
+OSM_TYPES = {
+    ("amenity", "restaurant"): ["restaurant"],
+    ("amenity", "fast_food"): ["restaurant", "fast_food_restaurant"],
+    ("amenity", "food_court"): ["restaurant"],
+    ("amenity", "cafe"): ["cafe"],
+    ("amenity", "ice_cream"): ["cafe", "ice_cream_shop"],
+    ("amenity", "bar"): ["bar"],
+    ("amenity", "pub"): ["bar"],
+    ("amenity", "nightclub"): ["night_club"],
+    ("amenity", "casino"): ["casino"],
+    ("amenity", "library"): ["library"],
+    ("amenity", "townhall"): ["city_hall"],
+    ("amenity", "courthouse"): ["courthouse"],
+    ("amenity", "embassy"): ["embassy"],
+    ("office", "diplomatic"): ["embassy"],
+    ("tourism", "attraction"): ["tourist_attraction"],
+    ("tourism", "museum"): ["museum", "tourist_attraction"],
+    ("tourism", "gallery"): ["art_gallery"],
+    ("tourism", "zoo"): ["zoo", "tourist_attraction"],
+    ("tourism", "aquarium"): ["aquarium", "tourist_attraction"],
+    ("tourism", "theme_park"): ["amusement_park", "tourist_attraction"],
+    ("tourism", "viewpoint"): ["tourist_attraction"],
+    ("leisure", "park"): ["park"],
+    ("leisure", "garden"): ["park"],
+    ("leisure", "bowling_alley"): ["bowling_alley"],
+    ("leisure", "amusement_arcade"): ["amusement_park"],
+    ("leisure", "water_park"): ["amusement_park"],
+}
+RELIGION_TYPES = {"christian": "church", "muslim": "mosque", "hindu": "hindu_temple"}
+FOOD_TYPES = {"restaurant", "cafe", "bar"}
+
+OSM_DAYS = {"Su": 0, "Mo": 1, "Tu": 2, "We": 3, "Th": 4, "Fr": 5, "Sa": 6}
+_RULE = re.compile(r"^((?:(?:Mo|Tu|We|Th|Fr|Sa|Su)(?:-(?:Mo|Tu|We|Th|Fr|Sa|Su))?,?)+)\s+(.+)$")
+_SPAN = re.compile(r"^(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})$")
+
+
+def _osm_days(spec):
+    days = []
+    for part in spec.strip(",").split(","):
+        first, _, last = part.partition("-")
+        start, end = OSM_DAYS[first], OSM_DAYS[last or first]
+        # Mo-Su wraps through the week in Google numbering
+        days.extend((start + i) % 7 for i in range((end - start) % 7 + 1))
+    return days
+
+
+def parse_osm_hours(text):
+    """
+    OSM opening_hours -> Places-style periods, for the common subset: rules of
+    weekdays plus time spans separated by ";", "off" days and "24/7". Later
+    rules override earlier ones for their days, as in OSM. Returns None for
+    anything else.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+    if text == "24/7":
+        return [{"open": {"day": 0, "hour": 0, "minute": 0}}]
+    by_day = {}
+    for rule in filter(None, (r.strip() for r in text.split(";"))):
+        if rule.startswith(("PH", "SH")):
+            continue  # public / school holidays
+        match = _RULE.match(rule)
+        if not match:
+            return None
+        days, times = _osm_days(match.group(1)), match.group(2).strip()
+        spans = []
+        if times != "off":
+            for span in times.split(","):
+                m = _SPAN.match(span.strip())
+                if not m:
+                    return None
+                spans.append(tuple(int(g) for g in m.groups()))
+        for day in days:
+            by_day[day] = spans
+    periods = []
+    for day, spans in by_day.items():
+        for open_h, open_m, close_h, close_m in spans:
+            # "18:00-02:00" and "10:00-24:00" close on a later day
+            close_day = day + (close_h * 60 + close_m <= open_h * 60 + open_m) + close_h // 24
+            periods.append({"open": {"day": day, "hour": open_h, "minute": open_m},
+                            "close": {"day": close_day % 7, "hour": close_h % 24, "minute": close_m}})
+    return periods
+
+
+def osm_types(tags):
+    types = []
+    for (key, value), mapped in OSM_TYPES.items():
+        if tags.get(key) == value:
+            types.extend(mapped)
+    if tags.get("amenity") == "place_of_worship" and tags.get("religion") in RELIGION_TYPES:
+        types.append(RELIGION_TYPES[tags["religion"]])
+    if tags.get("historic"):
+        types.extend(["historical_landmark", "tourist_attraction"])
+    if FOOD_TYPES.intersection(types):
+        types.extend(f"{c.strip().lower()}_restaurant" for c in tags.get("cuisine", "").split(";") if c.strip())
+    return list(dict.fromkeys(types))
+
+
+def osm_address(tags):
+    street = " ".join(filter(None, (tags.get("addr:housenumber"), tags.get("addr:street"))))
+    return ", ".join(filter(None, (street, tags.get("addr:city"))))
+
+
+def _rating(value, default_rating):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default_rating
+
+
+def _hours(props):
+    if props.get("hours_json"):
+        hours = props["hours_json"]
+        return compile_hours(json.loads(hours) if isinstance(hours, str) else hours)
+    return compile_hours({"periods": parse_osm_hours(props.get("opening_hours"))})
+
+
+def _record(props, lat, lng, default_id, default_rating):
+    """A POI from flat properties (CSV columns, GeoJSON properties or OSM tags); None if unusable."""
+    if props.get("types"):
+        types = props["types"]
+        types = [t.strip() for t in re.split(r"[;|,]", types)] if isinstance(types, str) else list(types)
+        types = [t for t in types if t]
+    else:
+        types = osm_types(props)
+    name = props.get("name")
+    if not name or not types or lat is None or lng is None:
+        return None
+    return {
+        "id": str(props.get("id") or default_id),
+        "name": name,
+        "address": props.get("address") or osm_address(props),
+        "lat": float(lat),
+        "lng": float(lng),
+        "rating": _rating(props.get("rating"), default_rating),
+        "types": types,
+        "hours": _hours(props),
+    }
+
+
+def _osm_element(element, default_rating):
+    tags = dict(element.get("tags") or {})
+    # Ways and relations from Overpass "out center" carry a center instead of lat/lon
+    center = element.get("center") or element
+    tags.pop("id", None)
+    osm_id = f"osm:{element.get('type', 'node')}/{element.get('id')}"
+    return _record({**tags, "id": osm_id}, center.get("lat"), center.get("lon"), osm_id, default_rating)
+
+
+def read_records(path, default_rating):
+    """Yield POI records from an extract; rows without a name, types or coordinates are skipped."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="" if ext == ".csv" else None) as f:
+        if ext == ".csv":
+            for i, row in enumerate(csv.DictReader(f)):
+                yield _record(row, row.get("lat") or row.get("latitude"), row.get("lng") or row.get("longitude"),
+                              f"{os.path.basename(path)}:{i}", default_rating)
+        elif ext == ".geojson":
+            for i, feature in enumerate(json.load(f).get("features", [])):
+                geometry = feature.get("geometry") or {}
+                if geometry.get("type") != "Point":
+                    continue
+                lng, lat = geometry["coordinates"][:2]
+                props = feature.get("properties") or {}
+                yield _record(props, lat, lng, feature.get("id") or f"{os.path.basename(path)}:{i}", default_rating)
+        elif ext == ".json":
+            for element in json.load(f).get("elements", []):
+                yield _osm_element(element, default_rating)
+        elif ext in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield _osm_element(json.loads(line), default_rating)
+        else:
+            raise SystemExit(f"{path}: unsupported extract format {ext!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="extract files")
+    parser.add_argument("--out", default=POI_INDEX_PATH, help="index directory (replaced)")
+    parser.add_argument("--default-rating", type=float, default=3.5, help="rating for places without one")
+    parser.add_argument("--cell-deg", type=float, default=POI_INDEX_CELL_DEG, help="grid cell size in degrees")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    records, skipped, seen = [], 0, set()
+    for path in args.inputs:
+        for record in read_records(path, args.default_rating):
+            if record is None or record["id"] in seen:
+                skipped += 1
+                continue
+            seen.add(record["id"])
+            records.append(record)
+    if not records:
+        raise SystemExit("No usable places in the input")
+
+    meta = write_index(records, args.out, cell_deg=args.cell_deg,
+                       source=[os.path.basename(p) for p in args.inputs])
+    with_hours = sum(r["hours"] is not None for r in records)
+    print(f"{meta['count']} places ({with_hours} with hours, {skipped} skipped), {len(meta['types'])} types "
+          f"-> {args.out} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
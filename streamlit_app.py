@@ -8,12 +8,36 @@ API_URL = os.getenv("API_URL", "http://localhost:8000")
 if "session_id" not in st.session_state:
     st.session_state.session_id = None
     st.session_state.history = []
+    st.session_state.itinerary = None
+    st.session_state.itinerary_version = None
+
+def apply_patch(doc, ops):
+    """Apply the server's JSON Patch (add / remove / replace) to `doc` in place; returns the new root."""
+    for op in ops:
+        parts = [p.replace("~1", "/").replace("~0", "~") for p in op["path"].split("/")[1:]]
+        if not parts:
+            doc = op.get("value")
+            continue
+        parent = doc
+        for part in parts[:-1]:
+            parent = parent[int(part)] if isinstance(parent, list) else parent[part]
+        key = int(parts[-1]) if isinstance(parent, list) else parts[-1]
+        if op["op"] == "remove":
+            del parent[key]
+        elif op["op"] == "add" and isinstance(parent, list):
+            parent.insert(key, op["value"])
+        else:
+            parent[key] = op["value"]
+    return doc
 
 # Function to send a message to the backend
 def send_message(message):
     payload = {"message": message}
     if st.session_state.session_id:
         payload["session_id"] = st.session_state.session_id
+    if st.session_state.itinerary_version is not None:
+        # Lets the server skip or patch the itinerary we already have
+        payload["known_version"] = st.session_state.itinerary_version
     try:
         resp = requests.post(f"{API_URL}/chat", json=payload)
         resp.raise_for_status()
@@ -22,14 +46,23 @@ def send_message(message):
         st.error(f"Error communicating with API: {e}")
         return None
 
-    # Update session_id and history
+    # Update session_id, itinerary and history
+    if data.get("session_id") != st.session_state.session_id:
+        st.session_state.itinerary = None
+        st.session_state.itinerary_version = None
     st.session_state.session_id = data.get("session_id", st.session_state.session_id)
+    if data.get("itinerary") is not None:
+        st.session_state.itinerary = data["itinerary"]
+    elif "itinerary_patch" in data:
+        st.session_state.itinerary = apply_patch(st.session_state.itinerary, data["itinerary_patch"])
+    if "itinerary_version" in data:
+        st.session_state.itinerary_version = data["itinerary_version"]
     # Append bot reply
     st.session_state.history.append({
         "sender": "bot",
         "reply": data.get("reply"),
         "options": data.get("options"),
-        "itinerary": data.get("itinerary")
+        "itinerary": st.session_state.itinerary if "itinerary_version" in data else None
     })
     return data
 